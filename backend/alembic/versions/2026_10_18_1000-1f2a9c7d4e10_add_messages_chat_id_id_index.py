@@ -0,0 +1,28 @@
+"""add messages chat_id id index
+
+Revision ID: 1f2a9c7d4e10
+Revises: e2b2f330936a
+Create Date: 2026-10-18 10:00:12.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1f2a9c7d4e10'
+down_revision: Union[str, Sequence[str], None] = 'e2b2f330936a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_messages_chat_id_id', 'messages', ['chat_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_messages_chat_id_id', table_name='messages')
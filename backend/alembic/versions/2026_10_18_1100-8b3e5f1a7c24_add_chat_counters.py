@@ -0,0 +1,58 @@
+"""add chat counters
+
+Revision ID: 8b3e5f1a7c24
+Revises: 1f2a9c7d4e10
+Create Date: 2026-10-18 11:00:41.902117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b3e5f1a7c24'
+down_revision: Union[str, Sequence[str], None] = '1f2a9c7d4e10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chats', sa.Column('last_message_id', sa.BigInteger(), nullable=True))
+    op.add_column('chats', sa.Column('last_message_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('chats', sa.Column('message_count', sa.BigInteger(), server_default='0', nullable=False))
+    op.create_foreign_key('chats_last_message_id_fkey', 'chats', 'messages', ['last_message_id'], ['id'],
+                          ondelete='SET NULL')
+    op.add_column('chat_participants', sa.Column('unread_count', sa.BigInteger(), server_default='0', nullable=False))
+
+    # Заполняем счётчики по уже существующим сообщениям
+    op.execute("""
+        UPDATE chats SET
+            message_count = (SELECT count(*) FROM messages m
+                             WHERE m.chat_id = chats.id AND m.is_deleted = false),
+            last_message_id = (SELECT m.id FROM messages m
+                               WHERE m.chat_id = chats.id AND m.is_deleted = false
+                               ORDER BY m.id DESC LIMIT 1),
+            last_message_at = (SELECT m.created_at FROM messages m
+                               WHERE m.chat_id = chats.id AND m.is_deleted = false
+                               ORDER BY m.id DESC LIMIT 1)
+    """)
+    op.execute("""
+        UPDATE chat_participants cp SET
+            unread_count = (SELECT count(*) FROM messages m
+                            WHERE m.chat_id = cp.chat_id
+                              AND m.id > cp.last_read_message_id
+                              AND m.sender_id != cp.user_id
+                              AND m.is_deleted = false)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('chat_participants', 'unread_count')
+    op.drop_constraint('chats_last_message_id_fkey', 'chats', type_='foreignkey')
+    op.drop_column('chats', 'message_count')
+    op.drop_column('chats', 'last_message_at')
+    op.drop_column('chats', 'last_message_id')
@@ -0,0 +1,28 @@
+"""add read batch user chat index
+
+Revision ID: 5d1c8e2f9a37
+Revises: 8b3e5f1a7c24
+Create Date: 2026-10-18 12:00:27.519384
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d1c8e2f9a37'
+down_revision: Union[str, Sequence[str], None] = '8b3e5f1a7c24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_mrb_user_chat_to', 'message_read_batches', ['user_id', 'chat_id', 'to_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_mrb_user_chat_to', table_name='message_read_batches')
@@ -0,0 +1,36 @@
+"""add read range to read batches
+
+Revision ID: 9e4b7a6c2d15
+Revises: 5d1c8e2f9a37
+Create Date: 2026-10-18 13:00:08.447215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4b7a6c2d15'
+down_revision: Union[str, Sequence[str], None] = '5d1c8e2f9a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Генерируемая колонка заполняется для существующих строк при добавлении
+    op.add_column('message_read_batches', sa.Column(
+        'read_range', postgresql.INT8RANGE(),
+        sa.Computed("int8range(from_id, to_id, '[]')", persisted=True),
+    ))
+    op.create_index('idx_mrb_read_range', 'message_read_batches', ['read_range'], unique=False,
+                    postgresql_using='gist')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_mrb_read_range', table_name='message_read_batches', postgresql_using='gist')
+    op.drop_column('message_read_batches', 'read_range')
@@ -0,0 +1,37 @@
+"""add message search vector
+
+Revision ID: 3c7f1b9d8a42
+Revises: 9e4b7a6c2d15
+Create Date: 2026-10-18 14:00:21.905113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c7f1b9d8a42'
+down_revision: Union[str, Sequence[str], None] = '9e4b7a6c2d15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Добавление хранимой генерируемой колонки переписывает всю таблицу messages
+    # под эксклюзивной блокировкой — на большой таблице запускать в окно обслуживания
+    op.add_column('messages', sa.Column(
+        'search_vector', postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('russian'::regconfig, coalesce(content, ''))", persisted=True),
+    ))
+    op.create_index('idx_messages_search_vector', 'messages', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_messages_search_vector', table_name='messages', postgresql_using='gin')
+    op.drop_column('messages', 'search_vector')
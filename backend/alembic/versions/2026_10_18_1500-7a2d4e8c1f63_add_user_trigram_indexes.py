@@ -0,0 +1,37 @@
+"""add user trigram indexes
+
+Revision ID: 7a2d4e8c1f63
+Revises: 3c7f1b9d8a42
+Create Date: 2026-10-18 15:00:37.214590
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a2d4e8c1f63'
+down_revision: Union[str, Sequence[str], None] = '3c7f1b9d8a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # pg_trgm — доверенное расширение (PostgreSQL 13+), его может создать владелец базы
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('idx_users_username_trgm', 'users', [sa.text('lower(username) gin_trgm_ops')], unique=False,
+                    postgresql_using='gin')
+    op.create_index('idx_users_email_trgm', 'users', [sa.text('lower(email) gin_trgm_ops')], unique=False,
+                    postgresql_using='gin')
+    op.create_index('idx_users_phone_trgm', 'users', ['phone'], unique=False, postgresql_using='gin',
+                    postgresql_ops={'phone': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_users_phone_trgm', table_name='users', postgresql_using='gin')
+    op.drop_index('idx_users_email_trgm', table_name='users', postgresql_using='gin')
+    op.drop_index('idx_users_username_trgm', table_name='users', postgresql_using='gin')
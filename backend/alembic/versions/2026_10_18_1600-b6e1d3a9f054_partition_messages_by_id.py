@@ -0,0 +1,126 @@
+"""partition messages by id
+
+Revision ID: b6e1d3a9f054
+Revises: 7a2d4e8c1f63
+Create Date: 2026-10-18 16:00:12.448301
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.db.partitions import (partition_name, create_partition_sql, create_overflow_partition_sql,
+                                attach_partition_sql)
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e1d3a9f054'
+down_revision: Union[str, Sequence[str], None] = '7a2d4e8c1f63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Внешние ключи на messages(id): (таблица, имя, колонка, ondelete)
+REFERENCING_FKS = [
+    ('files', 'files_message_id_fkey', 'message_id', 'CASCADE'),
+    ('tasks', 'tasks_message_id_fkey', 'message_id', 'SET NULL'),
+    ('chats', 'chats_last_message_id_fkey', 'last_message_id', 'SET NULL'),
+]
+LEGACY_PARTITION = partition_name(0)
+
+
+def _create_messages_table(name: str, pkey_name: str, **kw) -> None:
+    op.create_table(
+        name,
+        sa.Column('id', sa.BigInteger(), server_default=sa.text("nextval('messages_id_seq'::regclass)"),
+                  autoincrement=False, nullable=False),
+        sa.Column('chat_id', sa.BigInteger(), nullable=False),
+        sa.Column('sender_id', sa.BigInteger(), nullable=True),
+        sa.Column('content', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('is_deleted', sa.Boolean(), server_default=sa.text('false'), nullable=False),
+        sa.Column('search_vector', postgresql.TSVECTOR(),
+                  sa.Computed("to_tsvector('russian'::regconfig, coalesce(content, ''))", persisted=True)),
+        sa.ForeignKeyConstraint(['chat_id'], ['chats.id'], name='messages_chat_id_fkey'),
+        sa.ForeignKeyConstraint(['sender_id'], ['users.id'], name='messages_sender_id_fkey'),
+        sa.PrimaryKeyConstraint('id', name=pkey_name),
+        **kw,
+    )
+
+
+def _drop_referencing_fks() -> None:
+    for table, name, _, _ in REFERENCING_FKS:
+        op.drop_constraint(name, table, type_='foreignkey')
+
+
+def _create_referencing_fks() -> None:
+    for table, name, column, ondelete in REFERENCING_FKS:
+        op.create_foreign_key(name, table, 'messages', [column], ['id'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Существующие сообщения не копируются: старая таблица целиком становится секцией
+    # messages_p0 (MINVALUE .. max(id)], новые id идут в секции по MESSAGES_PARTITION_SIZE.
+    # ATTACH один раз читает старую таблицу для проверки границы, но не переписывает её;
+    # всё это время messages заблокирована — запускать в окно обслуживания
+    bind = op.get_bind()
+    op.execute("LOCK TABLE messages IN ACCESS EXCLUSIVE MODE")
+    boundary = bind.execute(sa.text("SELECT coalesce(max(id), 0) + 1 FROM messages")).scalar_one()
+    # ATTACH требует точного совпадения типов колонок, а секционированная messages объявляет
+    # id как BIGINT. Если id был сужен до INTEGER (fec3d54aa35f), старую таблицу придётся
+    # один раз переписать; на базах, где id уже BIGINT, шаг пропускается
+    id_type = bind.execute(sa.text(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = 'messages' AND column_name = 'id'"
+    )).scalar_one()
+    if id_type != 'bigint':
+        op.alter_column('messages', 'id', existing_type=sa.Integer(), type_=sa.BigInteger(),
+                        existing_nullable=False)
+    op.execute("ALTER SEQUENCE messages_id_seq AS bigint")
+
+    _drop_referencing_fks()
+    op.rename_table('messages', LEGACY_PARTITION)
+    op.execute(f"ALTER INDEX messages_pkey RENAME TO {LEGACY_PARTITION}_pkey")
+    op.execute(f"ALTER INDEX idx_messages_chat_id_id RENAME TO {LEGACY_PARTITION}_chat_id_id_idx")
+    op.execute(f"ALTER INDEX idx_messages_search_vector RENAME TO {LEGACY_PARTITION}_search_vector_idx")
+
+    _create_messages_table('messages', 'messages_pkey', postgresql_partition_by='RANGE (id)')
+    op.create_index('idx_messages_chat_id_id', 'messages', ['chat_id', 'id'], unique=False)
+    op.create_index('idx_messages_search_vector', 'messages', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+    # Иначе последовательность удалится вместе со старой секцией
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY messages.id")
+    # Индексы старой таблицы совпадают с индексами messages и подключаются к ним без перестроения
+    op.execute(attach_partition_sql(LEGACY_PARTITION, 0, boundary))
+
+    start = boundary
+    while start < boundary + settings.MESSAGES_PARTITIONS_AHEAD * settings.MESSAGES_PARTITION_SIZE:
+        op.execute(create_partition_sql(start, start + settings.MESSAGES_PARTITION_SIZE))
+        start += settings.MESSAGES_PARTITION_SIZE
+    op.execute(create_overflow_partition_sql(start))
+
+    _create_referencing_fks()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Обратно в одну таблицу — только копированием всех сообщений
+    _drop_referencing_fks()
+    _create_messages_table('messages_unpartitioned', 'messages_unpartitioned_pkey')
+    op.execute(
+        "INSERT INTO messages_unpartitioned (id, chat_id, sender_id, content, created_at, updated_at, is_deleted) "
+        "SELECT id, chat_id, sender_id, content, created_at, updated_at, is_deleted FROM messages"
+    )
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY NONE")
+    op.drop_table('messages')
+    op.rename_table('messages_unpartitioned', 'messages')
+    op.execute("ALTER INDEX messages_unpartitioned_pkey RENAME TO messages_pkey")
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY messages.id")
+    op.create_index('idx_messages_chat_id_id', 'messages', ['chat_id', 'id'], unique=False)
+    op.create_index('idx_messages_search_vector', 'messages', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+    _create_referencing_fks()
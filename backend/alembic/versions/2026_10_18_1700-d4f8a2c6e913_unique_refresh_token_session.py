@@ -0,0 +1,36 @@
+"""unique refresh token session
+
+Revision ID: d4f8a2c6e913
+Revises: b6e1d3a9f054
+Create Date: 2026-10-18 17:00:37.610294
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f8a2c6e913'
+down_revision: Union[str, Sequence[str], None] = 'b6e1d3a9f054'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Дубли сессии могли остаться от гонки DELETE + INSERT — оставляем самый свежий токен
+    op.execute("""
+        DELETE FROM refresh_tokens r
+        USING refresh_tokens newer
+        WHERE newer.user_id = r.user_id
+          AND newer.session_id = r.session_id
+          AND (newer.expires_at, newer.id) > (r.expires_at, r.id)
+    """)
+    op.create_unique_constraint('uq_refresh_tokens_user_session', 'refresh_tokens', ['user_id', 'session_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_refresh_tokens_user_session', 'refresh_tokens', type_='unique')
@@ -0,0 +1,44 @@
+"""hash refresh tokens
+
+Revision ID: 5e9c3b7a1d24
+Revises: d4f8a2c6e913
+Create Date: 2026-10-18 18:00:52.384017
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e9c3b7a1d24'
+down_revision: Union[str, Sequence[str], None] = 'd4f8a2c6e913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Истёкшие токены не переносим — их всё равно удалил бы RefreshTokenReaper
+    op.execute("DELETE FROM refresh_tokens WHERE expires_at < now() OR is_revoked")
+    op.add_column('refresh_tokens', sa.Column('token_hash', sa.LargeBinary(), nullable=True))
+    # Совпадает с security.hash_refresh_token: sha256 от UTF-8 строки токена
+    op.execute("UPDATE refresh_tokens SET token_hash = sha256(convert_to(token, 'UTF8'))")
+    op.alter_column('refresh_tokens', 'token_hash', nullable=False)
+    op.drop_constraint('refresh_tokens_token_key', 'refresh_tokens', type_='unique')
+    op.drop_column('refresh_tokens', 'token')
+    op.create_index('idx_refresh_tokens_expires_at', 'refresh_tokens', ['expires_at'], unique=False)
+    op.create_index('idx_refresh_tokens_revoked', 'refresh_tokens', ['id'], unique=False,
+                    postgresql_where=sa.text('is_revoked'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Сами токены по хешу не восстановить — все сессии придётся открыть заново
+    op.drop_index('idx_refresh_tokens_revoked', table_name='refresh_tokens', postgresql_where=sa.text('is_revoked'))
+    op.drop_index('idx_refresh_tokens_expires_at', table_name='refresh_tokens')
+    op.execute("DELETE FROM refresh_tokens")
+    op.add_column('refresh_tokens', sa.Column('token', sa.String(), nullable=False))
+    op.create_unique_constraint('refresh_tokens_token_key', 'refresh_tokens', ['token'])
+    op.drop_column('refresh_tokens', 'token_hash')
@@ -0,0 +1,30 @@
+"""add file size sha256
+
+Revision ID: 8b1f6d4e2a57
+Revises: 5e9c3b7a1d24
+Create Date: 2026-10-18 19:00:14.275903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1f6d4e2a57'
+down_revision: Union[str, Sequence[str], None] = '5e9c3b7a1d24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('files', sa.Column('size', sa.BigInteger(), nullable=True))
+    op.add_column('files', sa.Column('sha256', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('files', 'sha256')
+    op.drop_column('files', 'size')
@@ -0,0 +1,34 @@
+"""read batches chat range gist
+
+Revision ID: c3a7e5f1b962
+Revises: 8b1f6d4e2a57
+Create Date: 2026-10-18 20:00:41.918362
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a7e5f1b962'
+down_revision: Union[str, Sequence[str], None] = '8b1f6d4e2a57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # btree_gist — доверенное расширение (PostgreSQL 13+), его может создать владелец базы
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.create_index('idx_mrb_chat_read_range', 'message_read_batches', ['chat_id', 'read_range'], unique=False,
+                    postgresql_using='gist')
+    op.drop_index('idx_mrb_read_range', table_name='message_read_batches', postgresql_using='gist')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('idx_mrb_read_range', 'message_read_batches', ['read_range'], unique=False,
+                    postgresql_using='gist')
+    op.drop_index('idx_mrb_chat_read_range', table_name='message_read_batches', postgresql_using='gist')
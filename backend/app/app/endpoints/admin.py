@@ -11,8 +11,22 @@ from sqlalchemy import select, func, update, delete
 
 from app.security.security import require_superuser, decode_jwt_access
 from app.security import security as _sec
+from app.security.password_hasher import password_hasher
+from app.security.token_cache import access_token_cache
 from app.utils.unit_of_work import IUnitOfWork
-from app.utils import get_unit_of_work
+from app.utils import get_unit_of_work, get_read_unit_of_work, manager
+from app.utils.membership_cache import membership_cache, invalidate_members
+from app.utils.read_replicas import read_replicas
+from app.utils.user_search_cache import user_search_cache, invalidate_user_search
+from app.services.message_writer import message_writer
+from app.services.read_batch_compactor import read_batch_compactor
+from app.services.message_partitions import message_partition_maintainer
+from app.services.refresh_token_reaper import refresh_token_reaper
+from app.services.chat import read_range_verify
+from app.services.read_watermarks import read_watermarks
+from app.core.config import settings
+from app.db.database import engine
+from app.db.pool import pool_stats
 from app.db.models import User, Chat, ChatParticipant, Message, ChatType, UserRole
 from app.app.schemas.response import Response
 from app.app.schemas.users import (
@@ -110,6 +124,7 @@ async def admin_patch_user(
             user = res.scalar_one()
         user_for_return = UserSchemaFromBd.model_validate(user)
         await uow.commit()
+        await invalidate_user_search()
         return Response(data=user_for_return)
 
 
@@ -123,12 +138,13 @@ async def admin_set_password(
     data: AdminSetPassword,
     uow: IUnitOfWork = Depends(get_unit_of_work),
 ):
+    validated = _sec.validate_password(data.new_password)
+    # Хешируем до открытия транзакции, чтобы не держать соединение, пока считает bcrypt
+    hashed = await password_hasher.hash(validated)
     async with uow as uow:
         user = await uow.user.get_one(user_id)
         if not user:
             raise UnfoundEntity(detail="Пользователь не найден")
-        validated = _sec.validate_password(data.new_password)
-        hashed = _sec.get_string_hash(validated)
         stmt = update(User).where(User.id == user_id).values(password=hashed)
         await uow.session.execute(stmt)
         await uow.commit()
@@ -153,6 +169,7 @@ async def admin_make_superuser(
         user = res.scalar_one()
         user_for_return = UserSchemaFromBd.model_validate(user)
         await uow.commit()
+        await invalidate_user_search()
         return Response(data=user_for_return)
 
 
@@ -178,6 +195,7 @@ async def admin_revoke_superuser(
         user = res.scalar_one()
         user_for_return = UserSchemaFromBd.model_validate(user)
         await uow.commit()
+        await invalidate_user_search()
         return Response(data=user_for_return)
 
 
@@ -198,6 +216,7 @@ async def admin_soft_delete_user(
         stmt = update(User).where(User.id == user_id).values(is_deleted=True)
         await uow.session.execute(stmt)
         await uow.commit()
+        await invalidate_user_search()
         return Response(data=None)
 
 
@@ -218,6 +237,9 @@ async def admin_hard_delete_user(
         stmt = delete(User).where(User.id == user_id)
         await uow.session.execute(stmt)
         await uow.commit()
+        # Пользователь уходит из всех своих чатов через CASCADE — проще сбросить весь кэш
+        await invalidate_members()
+        await invalidate_user_search()
         return Response(data=None)
 
 
@@ -273,15 +295,9 @@ async def admin_list_chats(
                 for cp, u in cp_res.all()
             ]
 
-            # Число сообщений
-            msg_cnt_stmt = select(func.count(Message.id)).where(
-                Message.chat_id == chat.id, Message.is_deleted == False
-            )
-            msg_cnt = (await uow.session.execute(msg_cnt_stmt)).scalar() or 0
-
             chat_dict = ChatSchemaFromBd.model_validate(chat).model_dump()
             chat_dict["participants"] = participants
-            chat_dict["message_count"] = msg_cnt
+            chat_dict["message_count"] = chat.message_count
             result.append(AdminChatDetailSchema.model_validate(chat_dict))
 
         return Response(data=result)
@@ -317,14 +333,9 @@ async def admin_get_chat(
             for cp, u in cp_res.all()
         ]
 
-        msg_cnt_stmt = select(func.count(Message.id)).where(
-            Message.chat_id == chat_id, Message.is_deleted == False
-        )
-        msg_cnt = (await uow.session.execute(msg_cnt_stmt)).scalar() or 0
-
         chat_dict = ChatSchemaFromBd.model_validate(chat).model_dump()
         chat_dict["participants"] = participants
-        chat_dict["message_count"] = msg_cnt
+        chat_dict["message_count"] = chat.message_count
 
         return Response(data=AdminChatDetailSchema.model_validate(chat_dict))
 
@@ -369,8 +380,7 @@ async def admin_soft_delete_chat(
     uow: IUnitOfWork = Depends(get_unit_of_work),
 ):
     async with uow as uow:
-        chat = await uow.chat.get_one(chat_id)
-        if not chat:
+        if not await uow.chat.exists(chat_id):
             raise UnfoundEntity(detail="Чат не найден")
         stmt = update(Chat).where(Chat.id == chat_id).values(is_deleted=True)
         await uow.session.execute(stmt)
@@ -389,12 +399,12 @@ async def admin_hard_delete_chat(
     uow: IUnitOfWork = Depends(get_unit_of_work),
 ):
     async with uow as uow:
-        chat = await uow.chat.get_one(chat_id)
-        if not chat:
+        if not await uow.chat.exists(chat_id):
             raise UnfoundEntity(detail="Чат не найден")
         stmt = delete(Chat).where(Chat.id == chat_id)
         await uow.session.execute(stmt)
         await uow.commit()
+        await invalidate_members(chat_id)
         return Response(data=None)
 
 
@@ -410,8 +420,7 @@ async def admin_get_participants(
     uow: IUnitOfWork = Depends(get_unit_of_work),
 ):
     async with uow as uow:
-        chat = await uow.chat.get_one(chat_id)
-        if not chat:
+        if not await uow.chat.exists(chat_id):
             raise UnfoundEntity(detail="Чат не найден")
         cp_stmt = (
             select(ChatParticipant, User)
@@ -442,8 +451,7 @@ async def admin_add_participant(
     uow: IUnitOfWork = Depends(get_unit_of_work),
 ):
     async with uow as uow:
-        chat = await uow.chat.get_one(chat_id)
-        if not chat:
+        if not await uow.chat.exists(chat_id):
             raise UnfoundEntity(detail="Чат не найден")
         user = await uow.user.get_one(data.user_id)
         if not user:
@@ -452,7 +460,9 @@ async def admin_add_participant(
         if existing:
             raise DuplicateEntity(detail="Пользователь уже в чате")
         await uow.chat_participant.add_one({"chat_id": chat_id, "user_id": data.user_id, "role": data.role})
+        await uow.chat_participant.refresh_unread_count(chat_id=chat_id, user_id=data.user_id)
         await uow.commit()
+        await invalidate_members(chat_id)
         return Response(data=None)
 
 
@@ -500,6 +510,7 @@ async def admin_remove_participant(
             raise UnfoundEntity(detail="Участник не найден в этом чате")
         await uow.chat_participant.delete(cp.id)
         await uow.commit()
+        await invalidate_members(chat_id)
         return Response(data=None)
 
 
@@ -519,8 +530,7 @@ async def admin_get_messages(
     uow: IUnitOfWork = Depends(get_unit_of_work),
 ):
     async with uow as uow:
-        chat = await uow.chat.get_one(chat_id)
-        if not chat:
+        if not await uow.chat.exists(chat_id):
             raise UnfoundEntity(detail="Чат не найден")
         stmt = select(Message).where(Message.chat_id == chat_id)
         if not include_deleted:
@@ -545,8 +555,12 @@ async def admin_delete_message(
         msg = await uow.message.get_one(message_id)
         if not msg or msg.chat_id != chat_id:
             raise UnfoundEntity(detail="Сообщение не найдено")
-        stmt = update(Message).where(Message.id == message_id).values(is_deleted=True)
-        await uow.session.execute(stmt)
+        if not msg.is_deleted:
+            stmt = update(Message).where(Message.id == message_id).values(is_deleted=True)
+            await uow.session.execute(stmt)
+            await uow.chat.unregister_message(chat_id, message_id)
+            if msg.sender_id:
+                await uow.chat_participant.decrement_unread(chat_id, message_id, msg.sender_id)
         await uow.commit()
         return Response(data=None)
 
@@ -565,6 +579,10 @@ async def admin_hard_delete_message(
         msg = await uow.message.get_one(message_id)
         if not msg or msg.chat_id != chat_id:
             raise UnfoundEntity(detail="Сообщение не найдено")
+        if not msg.is_deleted:
+            await uow.chat.unregister_message(chat_id, message_id)
+            if msg.sender_id:
+                await uow.chat_participant.decrement_unread(chat_id, message_id, msg.sender_id)
         stmt = delete(Message).where(Message.id == message_id)
         await uow.session.execute(stmt)
         await uow.commit()
@@ -581,7 +599,7 @@ async def admin_hard_delete_message(
     name="[Админ] Общая статистика системы",
 )
 async def admin_stats(
-    uow: IUnitOfWork = Depends(get_unit_of_work),
+    uow: IUnitOfWork = Depends(get_read_unit_of_work),
 ):
     async with uow as uow:
         total_users   = (await uow.session.execute(select(func.count(User.id)))).scalar()
@@ -597,9 +615,9 @@ async def admin_stats(
             by_type[ct.value] = cnt
 
         total_messages = (await uow.session.execute(select(func.count(Message.id)))).scalar()
-        active_messages = (await uow.session.execute(
-            select(func.count(Message.id)).where(Message.is_deleted == False)
-        )).scalar()
+        active_messages = int((await uow.session.execute(
+            select(func.coalesce(func.sum(Chat.message_count), 0))
+        )).scalar())
 
         return Response(data={
             "users": {
@@ -620,6 +638,33 @@ async def admin_stats(
         })
 
 
+@admin.get(
+    "/metrics/",
+    response_model=Response[dict],
+    name="[Админ] Метрики воркера",
+)
+async def admin_metrics():
+    return Response(data={
+        "db_pool": pool_stats(engine),
+        "read_replicas": read_replicas.stats(),
+        "websocket": manager.stats(),
+        "membership_cache": membership_cache.stats(),
+        "user_search_cache": user_search_cache.stats(),
+        "message_group_commit": message_writer.stats(),
+        "read_batch_compaction": read_batch_compactor.stats(),
+        "message_partitions": message_partition_maintainer.stats(),
+        "refresh_token_reaper": refresh_token_reaper.stats(),
+        "read_watermarks": read_watermarks.stats(),
+        "password_hashing": password_hasher.stats(),
+        "access_token_cache": access_token_cache.stats(),
+        "read_range_verify": {
+            "enabled": settings.READ_RANGE_VERIFY,
+            "checks": read_range_verify["checks"],
+            "mismatches": read_range_verify["mismatches"],
+        },
+    })
+
+
 # ── Чаты конкретного пользователя ──────────────────────────────────────────
 
 @admin.get(
@@ -662,13 +707,9 @@ async def admin_user_chats(
                 for p, u in all_cp_res.all()
             ]
 
-            msg_cnt = (await uow.session.execute(
-                select(func.count(Message.id)).where(Message.chat_id == chat.id, Message.is_deleted == False)
-            )).scalar() or 0
-
             chat_dict = ChatSchemaFromBd.model_validate(chat).model_dump()
             chat_dict["participants"] = participants
-            chat_dict["message_count"] = msg_cnt
+            chat_dict["message_count"] = chat.message_count
             result.append(AdminChatDetailSchema.model_validate(chat_dict))
 
             return Response(data=result)
\ No newline at end of file
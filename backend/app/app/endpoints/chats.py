@@ -1,6 +1,6 @@
 import json
 import logging
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, status, HTTPException
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, status, HTTPException, Query
 from typing import Dict, Set, List
 
 from app.services import ChatService, MessageService, UserService
@@ -13,8 +13,10 @@ from app.security import security
 from app.db.models import ChatType
 from app.app.schemas.response import Response
 from app.utils.response import get_responses_description_by_codes
-from app.utils import manager, get_unit_of_work
-from app.exceptions import NotAuthenticated, EntityError
+from app.utils import manager, get_unit_of_work, get_read_unit_of_work
+from app.utils.read_replicas import mark_writes
+from app.exceptions import NotAuthenticated, EntityError, InaccessibleEntity, UnprocessableEntity
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +25,15 @@ chats = APIRouter(
     prefix='/chats',
 )
 
+# Размер страницы истории, если клиент включил пагинацию курсором, но не передал limit
+MESSAGES_PAGE_DEFAULT_LIMIT = 50
+
+# Размер страницы поиска по сообщениям по умолчанию
+MESSAGES_SEARCH_DEFAULT_LIMIT = 20
+
+# Максимальная ширина диапазона id для пакетного запроса читателей
+READERS_RANGE_MAX_SIZE = 200
+
 async def get_current_user_ws(websocket: WebSocket):
     token = websocket.query_params.get("token")
     if not token:
@@ -54,11 +65,14 @@ async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     await manager.connect(websocket, user_id)
 
-    uow = await get_unit_of_work()
+    # Соединение живёт долго — сессия на каждый вызов сервиса, а не одна на весь сокет
+    uow = UnitOfWork()
     chat_service = ChatService(uow)
     message_service = MessageService(uow)
 
     try:
+        # Профиль отправителя нужен в каждом событии — читаем его один раз на соединение
+        sender = (await UserService(uow).get_by_id(user_id)).model_dump(mode='json')
         while True:
             try:
                 data = await websocket.receive_text()
@@ -66,13 +80,17 @@ async def websocket_endpoint(websocket: WebSocket):
                 chat_id = int(message_data.get("chat_id"))
                 text = message_data.get("text", "").strip()
 
-                message = await message_service.create_message(chat_id=chat_id, data=text, sender_id=user_id)
-                members_chat = await chat_service.get_members(chat_id, return_id=True)
+                members_chat = await chat_service.get_member_ids(chat_id)
+                if user_id not in members_chat:
+                    raise InaccessibleEntity(detail="Пользователь не состоит в чате")
+                message = await message_service.create_message_for_member(chat_id=chat_id, data=text,
+                                                                           sender_id=user_id)
+                await mark_writes((user_id,))
                 await manager.broadcast(type_of_message=0, message=text, chat_id=chat_id, receivers_id=members_chat,
                                         message_id=message.id, sender_id=user_id,
                                         created_at=message.created_at.isoformat(),
                                         updated_at=message.updated_at.isoformat(),
-                                        sender=message.sender.model_dump(mode='json'))
+                                        sender=sender)
 
 
             except WebSocketDisconnect:
@@ -82,7 +100,9 @@ async def websocket_endpoint(websocket: WebSocket):
                 break
 
     except WebSocketDisconnect:
-        manager.disconnect(websocket, user_id)
+        pass
+    finally:
+        await manager.disconnect(websocket, user_id)
 
 @chats.get(
     '/',
@@ -92,7 +112,7 @@ async def websocket_endpoint(websocket: WebSocket):
 )
 async def get_all_chat_for_user(
         access_token = Depends(security.decode_jwt_access),
-        uow: IUnitOfWork = Depends(get_unit_of_work)
+        uow: IUnitOfWork = Depends(get_read_unit_of_work)
 ):
     user_id = access_token.get("user_id")
     chat_service = ChatService(uow)
@@ -116,21 +136,89 @@ async def get_all_members_for_chat(
     members = await chat_service.get_members_for_member(chat_id=chat_id, member_id=int(access_token.get("user_id")))
     return schemas.Response(data=members)
 
+@chats.get(
+    "/messages/search/",
+    response_model=schemas.Response[List[schemas.MessageSearchResultSchema]],
+    name="Поиск сообщений во всех чатах пользователя",
+    description="Слова объединяются через И, слово* — поиск по префиксу, \"текст в кавычках\" — фраза. "
+                "Результаты от самых релевантных; следующая страница — по next_cursor из paginator. "
+                f"Ранжируются только {settings.MESSAGE_SEARCH_MAX_CANDIDATES} самых новых совпадений, "
+                "более старые не находятся; в этом случае в paginator truncated = true — стоит уточнить запрос.",
+    responses=get_responses_description_by_codes([401])
+)
+async def search_messages(
+        q: str = Query(..., min_length=1, max_length=200),
+        limit: int = Query(MESSAGES_SEARCH_DEFAULT_LIMIT, ge=1, le=100),
+        cursor: str | None = Query(None, description="next_cursor из paginator"),
+        access_token = Depends(security.decode_jwt_access),
+        uow: IUnitOfWork = Depends(get_read_unit_of_work)
+):
+    chat_service = ChatService(uow)
+    messages, paginator = await chat_service.search_messages_for_member(
+        member_id=access_token.get("user_id"), q=q, limit=limit, cursor=cursor,
+    )
+    return schemas.Response(data=messages, paginator=paginator)
+
+
+@chats.get(
+    "/{chat_id}/messages/search/",
+    response_model=schemas.Response[List[schemas.MessageSearchResultSchema]],
+    name="Поиск сообщений в чате",
+    description="Только для участников этого чата. Синтаксис запроса и ограничение "
+                f"в {settings.MESSAGE_SEARCH_MAX_CANDIDATES} самых новых совпадений (truncated в paginator) — "
+                "как у поиска по всем чатам.",
+    responses=get_responses_description_by_codes([401, 403, 404])
+)
+async def search_messages_in_chat(
+        chat_id: int,
+        q: str = Query(..., min_length=1, max_length=200),
+        limit: int = Query(MESSAGES_SEARCH_DEFAULT_LIMIT, ge=1, le=100),
+        cursor: str | None = Query(None, description="next_cursor из paginator"),
+        access_token = Depends(security.decode_jwt_access),
+        uow: IUnitOfWork = Depends(get_read_unit_of_work)
+):
+    chat_service = ChatService(uow)
+    messages, paginator = await chat_service.search_messages_for_member(
+        member_id=access_token.get("user_id"), q=q, chat_id=chat_id, limit=limit, cursor=cursor,
+    )
+    return schemas.Response(data=messages, paginator=paginator)
+
+
 @chats.get(
     "/{chat_id}/messages/",
     response_model=schemas.Response[List[schemas.MessageFromDbSchema]],
     name="Получение всех сообщений чата",
-    description="Только для участников этого чата",
+    description="Только для участников этого чата. "
+                "Если передан limit, cursor, before_id, after_id или around_id — возвращается окно истории "
+                "(keyset-пагинация), курсоры соседних страниц лежат в paginator. Без параметров — вся история.",
     responses=get_responses_description_by_codes([401, 403, 404])
 )
 async def get_all_messages_for_chat(
                                     chat_id: int,
+                                    limit: int | None = Query(None, ge=1, le=200),
+                                    cursor: str | None = Query(None, description="prev_cursor/next_cursor из paginator"),
+                                    before_id: int | None = Query(None, description="Сообщения старше этого id"),
+                                    after_id: int | None = Query(None, description="Сообщения новее этого id"),
+                                    around_id: int | None = Query(None, description="Окно вокруг этого id"),
                                     access_token = Depends(security.decode_jwt_access),
-                                    uow: IUnitOfWork = Depends(get_unit_of_work)
+                                    uow: IUnitOfWork = Depends(get_read_unit_of_work)
 ):
     chat_service = ChatService(uow)
-    messages = await chat_service.get_all_message_for_chat_for_member(chat_id=chat_id, member_id=access_token.get("user_id"))
-    return schemas.Response(data=messages)
+    member_id = access_token.get("user_id")
+    if all(param is None for param in (limit, cursor, before_id, after_id, around_id)):
+        messages = await chat_service.get_all_message_for_chat_for_member(chat_id=chat_id, member_id=member_id)
+        return schemas.Response(data=messages)
+
+    messages, paginator = await chat_service.get_message_window_for_member(
+        chat_id=chat_id,
+        member_id=member_id,
+        limit=limit or MESSAGES_PAGE_DEFAULT_LIMIT,
+        cursor=cursor,
+        before_id=before_id,
+        after_id=after_id,
+        around_id=around_id,
+    )
+    return schemas.Response(data=messages, paginator=paginator)
 
 
 @chats.get(
@@ -214,6 +302,34 @@ async def get_message_readers(
     return schemas.Response(data=readers)
 
 
+@chats.get(
+    "/{chat_id}/messages/readers/",
+    response_model=schemas.Response[List[schemas.MessageReadersSchema]],
+    name="Кто и когда прочитал сообщения из диапазона",
+    description="Читатели для всех сообщений чата с id из [from_id, to_id] одним запросом — "
+                f"для отметок о прочтении на целой странице. Не больше {READERS_RANGE_MAX_SIZE} id за раз.",
+    responses=get_responses_description_by_codes([401, 403, 404])
+)
+async def get_readers_for_range(
+    chat_id: int,
+    from_id: int = Query(..., ge=1),
+    to_id: int = Query(..., ge=1),
+    access_token=Depends(security.decode_jwt_access),
+    uow: IUnitOfWork = Depends(get_unit_of_work),
+):
+    if to_id - from_id >= READERS_RANGE_MAX_SIZE:
+        raise UnprocessableEntity(detail=f"Диапазон не может быть больше {READERS_RANGE_MAX_SIZE} id")
+    user_id = int(access_token.get("user_id"))
+    chat_service = ChatService(uow)
+    readers = await chat_service.get_readers_for_range(
+        chat_id=chat_id,
+        from_id=from_id,
+        to_id=to_id,
+        requester_id=user_id,
+    )
+    return schemas.Response(data=readers)
+
+
 @chats.post(
     "/messages/read_batch/",
     response_model=schemas.Response[None],
@@ -287,9 +403,10 @@ async def add_user_in_chat(
     members_chat = await chat_service.get_members(chat_id, return_id=True)
 
     # Уведомляем всех текущих участников о новом сообщении
-    await manager.broadcast(type_of_message=0, message=text, chat_id=chat_id, receivers_id=members_chat,
-                            message_id=message.id, sender_id=None, created_at=message.created_at.isoformat(),
-                            updated_at=message.updated_at.isoformat(), sender=None)
+    await uow.after_commit(manager.broadcast, type_of_message=0, message=text, chat_id=chat_id,
+                           receivers_id=members_chat, message_id=message.id, sender_id=None,
+                           created_at=message.created_at.isoformat(), updated_at=message.updated_at.isoformat(),
+                           sender=None)
 
     # Отправляем новому участнику WS-сообщение типа 5 — «тебя добавили в чат».
     # Фронт получит его и добавит чат в список без перезагрузки страницы.
@@ -308,7 +425,8 @@ async def add_user_in_chat(
                     return obj.isoformat()
                 return str(obj)
 
-            await manager.broadcast(
+            await uow.after_commit(
+                manager.broadcast,
                 type_of_message=5,
                 message="",
                 chat_id=chat_id,
@@ -340,9 +458,10 @@ async def delete_me_from_chat(
     text = f"Пользователь {username} покинул чат"
     message = await message_service.create_message(chat_id=chat_id, data=text)
     members_chat = await chat_service.get_members(chat_id, return_id=True)
-    await manager.broadcast(type_of_message=0, message=text, chat_id=chat_id, receivers_id=members_chat,
-                            message_id=message.id, sender_id=None, created_at=message.created_at.isoformat(),
-                            updated_at=message.updated_at.isoformat(), sender=None)
+    await uow.after_commit(manager.broadcast, type_of_message=0, message=text, chat_id=chat_id,
+                           receivers_id=members_chat, message_id=message.id, sender_id=None,
+                           created_at=message.created_at.isoformat(), updated_at=message.updated_at.isoformat(),
+                           sender=None)
 
     return schemas.Response(data=None)
 
@@ -385,7 +504,8 @@ async def create_chat(
                 )
                 if chat_data:
                     chat_dict = chat_data.model_dump() if hasattr(chat_data, "model_dump") else dict(chat_data)
-                    await manager.broadcast(
+                    await uow.after_commit(
+                        manager.broadcast,
                         type_of_message=5,
                         message="",
                         chat_id=chat.id,
@@ -1,5 +1,5 @@
 import logging
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
+from fastapi import APIRouter, Request, Depends, HTTPException, status
 from fastapi.responses import FileResponse
 
 from app.services.file import FileService
@@ -10,6 +10,7 @@ from app.security import security
 from app.exceptions import UnfoundEntity
 from app.utils.unit_of_work import UnitOfWork, IUnitOfWork
 from app.utils import get_unit_of_work
+from app.utils.upload import StreamingUpload, UPLOAD_OPENAPI_EXTRA, open_upload
 
 files = APIRouter(
     prefix="/files",
@@ -61,10 +62,11 @@ BLOCKED_EXTENSIONS = {
 }
 
 
-def validate_upload(file: UploadFile) -> None:
+def validate_upload(file: StreamingUpload) -> None:
     """
-    Проверяет загружаемый файл на допустимый тип и размер.
-    Бросает HTTPException 400 при нарушении.
+    Проверяет загружаемый файл на допустимый тип по заголовкам части формы — до того,
+    как прочитано его содержимое. Бросает HTTPException 400/415 при нарушении.
+    Размер проверяется при записи: больше MAX_FILE_SIZE_BYTES — запись прерывается с 413.
     """
     # 1. Проверка расширения
     if file.filename:
@@ -75,7 +77,7 @@ def validate_upload(file: UploadFile) -> None:
                 detail=f"Файлы с расширением '{ext}' запрещены к загрузке.",
             )
 
-    # 2. Проверка MIME-типа (content_type приходит из заголовка запроса)
+    # 2. Проверка MIME-типа (content_type приходит из заголовка части формы)
     content_type = (file.content_type or "").split(";")[0].strip().lower()
     if content_type and content_type not in ALLOWED_MIME_TYPES:
         allowed_list = ", ".join(sorted(set(ALLOWED_MIME_TYPES.values())))
@@ -87,19 +89,6 @@ def validate_upload(file: UploadFile) -> None:
             ),
         )
 
-    # 3. Проверка размера — читаем первые MAX+1 байт, чтобы не грузить всё в память
-    file.file.seek(0, 2)          # перемотка в конец
-    file_size = file.file.tell()  # позиция = размер
-    file.file.seek(0)             # перемотка обратно
-
-    if file_size > MAX_FILE_SIZE_BYTES:
-        max_mb = MAX_FILE_SIZE_BYTES // (1024 * 1024)
-        actual_mb = round(file_size / (1024 * 1024), 2)
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"Размер файла ({actual_mb} МБ) превышает максимально допустимый ({max_mb} МБ).",
-        )
-
 
 # ── Эндпоинты ─────────────────────────────────────────────────────────────────
 
@@ -107,19 +96,23 @@ def validate_upload(file: UploadFile) -> None:
     "/upload/",
     response_model=schemas.Response[schemas.FileGettingFromDbSchema],
     name="Загрузка файлов",
+    openapi_extra=UPLOAD_OPENAPI_EXTRA,
 )
 async def upload_file(
-    file: UploadFile = File(...),
+    request: Request,
     service: FileService = Depends(get_file_service),
     access_token=Depends(security.decode_jwt_access),
 ):
-    validate_upload(file)
-
-    created_file = await service.create(
-        message=None,
-        stream=file.file,
-        filename=file.filename,
+    # Тело читается прямо из запроса: файл пишется на диск по мере поступления
+    upload = await open_upload(request)
+    validate_upload(upload)
+
+    stored = await service.store(
+        stream=upload.chunks(),
+        filename=upload.filename,
+        max_size=MAX_FILE_SIZE_BYTES,
     )
+    created_file = await service.create(stored)
     return schemas.Response(data=created_file)
 
 
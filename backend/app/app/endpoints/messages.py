@@ -1,5 +1,5 @@
 import logging
-from fastapi import APIRouter, Depends, File, UploadFile, Path
+from fastapi import APIRouter, Request, Depends, Path
 
 from app.services import MessageService, ChatService
 from app.app import schemas
@@ -11,7 +11,8 @@ from app.utils import manager, get_unit_of_work
 from app.exceptions import NotAuthenticated, EntityError, UnfoundEntity, InaccessibleEntity
 from app.utils.file import get_file_service
 from app.services.file import FileService
-from app.app.endpoints.files import validate_upload
+from app.app.endpoints.files import validate_upload, MAX_FILE_SIZE_BYTES
+from app.utils.upload import UPLOAD_OPENAPI_EXTRA, open_upload
 
 logger = logging.getLogger(__name__)
 
@@ -45,11 +46,12 @@ async def update_message(
     message_for_return = await message_service.update(pk=message_id, data=data)
     members_chat = await chat_service.get_members(message.chat_id, return_id=True)
 
-    await manager.broadcast(type_of_message=1, message=message_for_return.content, chat_id=message_for_return.chat_id,
-                            receivers_id=members_chat, message_id=message_id, sender_id=message_for_return.sender_id,
-                            created_at=message_for_return.created_at.isoformat(),
-                            updated_at=message_for_return.updated_at.isoformat(),
-                            sender=message_for_return.sender.model_dump(mode='json'))
+    await uow.after_commit(manager.broadcast, type_of_message=1, message=message_for_return.content,
+                           chat_id=message_for_return.chat_id, receivers_id=members_chat, message_id=message_id,
+                           sender_id=message_for_return.sender_id,
+                           created_at=message_for_return.created_at.isoformat(),
+                           updated_at=message_for_return.updated_at.isoformat(),
+                           sender=message_for_return.sender.model_dump(mode='json'))
 
     return schemas.Response(data=message_for_return)
 
@@ -74,15 +76,15 @@ async def delete_message(
     if message.sender_id != int(access_token.get("user_id")):
         raise InaccessibleEntity(detail="Сообщение не принадлежит вам")
 
-    message_for_return = await message_service.update(pk=message_id, data={"is_deleted": True})
+    message_for_return = await message_service.delete(pk=message_id)
     members_chat = await chat_service.get_members(message.chat_id, return_id=True)
 
-    await manager.broadcast(type_of_message=2, message='Сообщение удалено', chat_id=message_for_return.chat_id,
-                            receivers_id=members_chat, message_id=message_id, sender_id=message_for_return.sender_id,
-                            is_deleted=message_for_return.is_deleted,
-                            created_at=message_for_return.created_at.isoformat(),
-                            updated_at=message_for_return.updated_at.isoformat(),
-                            sender=message_for_return.sender.model_dump(mode='json'))
+    await uow.after_commit(manager.broadcast, type_of_message=2, message='Сообщение удалено',
+                           chat_id=message_for_return.chat_id, receivers_id=members_chat, message_id=message_id,
+                           sender_id=message_for_return.sender_id, is_deleted=message_for_return.is_deleted,
+                           created_at=message_for_return.created_at.isoformat(),
+                           updated_at=message_for_return.updated_at.isoformat(),
+                           sender=message_for_return.sender.model_dump(mode='json'))
 
     return schemas.Response(data=message_for_return)
 
@@ -98,13 +100,9 @@ async def update_read_message(
                         uow: IUnitOfWork = Depends(get_unit_of_work)
 ):
     chat_service = ChatService(uow)
-    message_service = MessageService(uow)
-
-    await chat_service.update_last_message_read(user_id=access_token.get("user_id"), message_id=message_id)
-    message = await message_service.get_one(pk=message_id)
 
-    await manager.broadcast(type_of_message=4, message=None, chat_id=message.chat_id,
-                            receivers_id=(message.sender_id, ), last_read_message_id=message_id)
+    # Событие автору сообщения отправит буфер отметок после записи в БД
+    await chat_service.update_last_message_read(user_id=int(access_token.get("user_id")), message_id=message_id)
 
     return schemas.Response(data=None)
 
@@ -113,35 +111,52 @@ async def update_read_message(
     response_model=schemas.Response[schemas.MessageFromDbSchema],
     name="Отправить сообщение С файлом",
     description="Отправить отдельное сообщениен с файлом",
-    responses=get_responses_description_by_codes([401, 403, 404])
+    responses=get_responses_description_by_codes([401, 403, 404]),
+    openapi_extra=UPLOAD_OPENAPI_EXTRA,
 )
 async def upload_file(
+        request: Request,
         chat_id: int = Path(...),
-        file: UploadFile = File(...),
         file_service: FileService = Depends(get_file_service),
         uow: IUnitOfWork = Depends(get_unit_of_work),
         access_token=Depends(security.decode_jwt_access),
 ):
-    validate_upload(file)
+    upload = await open_upload(request)
+    validate_upload(upload)
 
     user_id = access_token.get("user_id")
     chat_service = ChatService(uow)
     message_service = MessageService(uow)
 
-    message = await message_service.create_message(chat_id=chat_id, data=None, sender_id=user_id)
+    # Не членам чата не даём писать байты на диск; окончательно членство проверит create_message
     members_chat = await chat_service.get_members(chat_id, return_id=True)
+    if user_id not in members_chat:
+        raise InaccessibleEntity(detail="Пользователь не состоит в чате")
 
-    created_file = await file_service.create(
-        message=message,
+    # Сначала файл целиком на диске, потом сообщение и строка файла: оборванная
+    # или слишком большая загрузка не оставляет сообщения без файла
+    stored = await file_service.store(
+        stream=upload.chunks(),
         chat_id=chat_id,
-        stream=file.file,
-        filename=file.filename,
+        filename=upload.filename,
+        max_size=MAX_FILE_SIZE_BYTES,
     )
+    # Сообщение и строка файла — одна транзакция (file_service работает на том же UnitOfWork
+    # запроса): при откате не остаётся ни сообщения, ни непрочитанных по нему, а файл удаляется
+    try:
+        async with uow:
+            message = await message_service.create_message(chat_id=chat_id, data=None, sender_id=user_id,
+                                                           commit=False)
+            created_file = await file_service.create(stored, message=message)
+    except BaseException:
+        file_service.discard(stored)
+        raise
+
     message = await message_service.get_one(message.id)
 
-    await manager.broadcast(type_of_message=0, message=None, chat_id=chat_id, file=created_file.model_dump(mode='json'),
-                            receivers_id=members_chat, message_id=message.id, sender_id=user_id,
-                            created_at=message.created_at.isoformat(),
-                            updated_at=message.updated_at.isoformat(), sender=message.sender.model_dump(mode='json'))
+    await uow.after_commit(manager.broadcast, type_of_message=0, message=None, chat_id=chat_id,
+                           file=created_file.model_dump(mode='json'), receivers_id=members_chat,
+                           message_id=message.id, sender_id=user_id, created_at=message.created_at.isoformat(),
+                           updated_at=message.updated_at.isoformat(), sender=message.sender.model_dump(mode='json'))
 
     return schemas.Response(data=message)
@@ -17,7 +17,7 @@ from app.app.schemas.task import (
 from app.app.schemas.task import TaskStatsResponseSchema
 from app.app.schemas.response import Response
 from app.utils.response import get_responses_description_by_codes
-from app.utils import get_unit_of_work
+from app.utils import get_unit_of_work, get_read_unit_of_work
 from app.utils.unit_of_work import IUnitOfWork
 from app.security import security
 from app.exceptions import NotAuthenticated
@@ -37,7 +37,7 @@ tasks = APIRouter(
 )
 async def get_tasks_stats(
     access_token=Depends(security.decode_jwt_access),
-    uow: IUnitOfWork = Depends(get_unit_of_work),
+    uow: IUnitOfWork = Depends(get_read_unit_of_work),
     chat_id: int | None = Query(None),
 ):
     service = TaskService(uow)
@@ -52,7 +52,7 @@ async def get_tasks_stats(
 )
 async def list_tasks(
     access_token=Depends(security.decode_jwt_access),
-    uow: IUnitOfWork = Depends(get_unit_of_work),
+    uow: IUnitOfWork = Depends(get_read_unit_of_work),
 
     chat_id: int | None = Query(None),
     creator_id: int | None = Query(None),
@@ -1,14 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Form
+from fastapi import APIRouter, Depends, HTTPException, status, Form, Query
 from typing import Dict, List
 import logging
 
 from app.services import UserService
+from app.services.user import USER_SEARCH_MAX_LIMIT
 from app.app.schemas.users import UserSchemaRegister, UserSchemaLogin
 from app.utils.unit_of_work import UnitOfWork, IUnitOfWork
 from app.security import security
 from app.app import schemas
 from app.utils.response import get_responses_description_by_codes
-from app.utils import get_unit_of_work
+from app.utils import get_unit_of_work, get_read_unit_of_work
 from app.exceptions import NotAuthenticated, InaccessibleEntity, UnprocessableEntity, EntityError, DuplicateEntity
 
 logger = logging.getLogger(__name__)
@@ -79,20 +80,16 @@ async def login_user(
         uow: IUnitOfWork = Depends(get_unit_of_work)
 ):
     user_service = UserService(uow)
-    if await user_service.check_credentials(input_password=user_data.password, username_or_email=user_data.username_or_email):
-        tokens = await user_service.create_jwt_tokens(
-            username_or_email = user_data.username_or_email
-        )
-        if tokens:
-            return schemas.Response(data=tokens)
-        raise EntityError(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Генерация токена провалилась"
-        )
-    else:
-        raise NotAuthenticated(
-            detail="Неверные данные"
-        )
+    tokens = await user_service.login(
+        username_or_email=user_data.username_or_email,
+        input_password=user_data.password,
+    )
+    if tokens:
+        return schemas.Response(data=tokens)
+    raise EntityError(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail="Генерация токена провалилась"
+    )
 
 @users.post(
     "/refresh_token/",
@@ -142,11 +139,32 @@ async def get_stats_about_user(
     return schemas.Response(data=await user_service.get_stats())
 
 
+@users.get(
+    "/search/",
+    response_model=schemas.Response[List[schemas.UserSchemaFromBd]],
+    name="Поиск пользователей",
+    description="Автодополнение по логину, почте и телефону: запросы короче трёх символов ищутся "
+                "по началу строки, длиннее — по вхождению. Сам пользователь и удалённые не возвращаются.",
+    responses=get_responses_description_by_codes([401, 403]),
+)
+async def search_users(
+        q: str = Query(..., min_length=1, max_length=100),
+        limit: int = Query(20, ge=1, le=USER_SEARCH_MAX_LIMIT),
+        access_token=Depends(security.decode_jwt_access),
+        uow: IUnitOfWork = Depends(get_read_unit_of_work)
+):
+    user_service = UserService(uow)
+    users_found = await user_service.search(q, limit, exclude_id=access_token.get("user_id"))
+    return schemas.Response(data=users_found)
+
+
 @users.post(
     "/get_all_users/",
     response_model=schemas.Response[List[schemas.UserSchemaFromBdStatistic]],
     name="Получить всех пользователей кроме самого себя",
+    description="Устарело: отдаёт всю таблицу пользователей, для выбора собеседника используйте GET /users/search/.",
     responses=get_responses_description_by_codes([401, 403, 404]),
+    deprecated=True,
 )
 async def get_all_user(
         access_token = Depends(security.decode_jwt_access),
@@ -77,6 +77,11 @@ class MessageReaderSchema(BaseModel):
     read_at:  datetime | None = None
 
 
+class MessageReadersSchema(BaseModel):
+    message_id: int
+    readers:    List[MessageReaderSchema]
+
+
 class MemberWithRoleSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
@@ -11,10 +11,14 @@ class FileBaseSchema(BaseModel):
 
 class FileCreateSchema(FileBaseSchema):
     path: str | None = None
+    size: int | None = None
+    sha256: str | None = None
 
 
 class FileGettingFromDbSchema(FileBaseSchema):
     model_config = ConfigDict(from_attributes=True)
 
     path: str
-    id: int
\ No newline at end of file
+    id: int
+    size: int | None = None
+    sha256: str | None = None
\ No newline at end of file
@@ -27,6 +27,12 @@ class MessageFromDbSchema(MessageCreateSchema):
     _convert_file = field_validator("file", mode="before")(sqlalchemy_to_pydantic(FileGettingFromDbSchema))
 
 
+class MessageSearchResultSchema(MessageFromDbSchema):
+    rank: float | None = None
+    # Фрагменты content с найденными словами в <mark>...</mark>, остальной текст HTML-экранирован
+    snippet: str | None = None
+
+
 class MessageUpdateSchema(BaseModel):
     content: str | None = None
 
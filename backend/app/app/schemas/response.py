@@ -8,6 +8,9 @@ class Paginator(BaseModel):
     total: int | None = Field(1, ge=0)
     has_prev: bool
     has_next: bool | None
+    prev_cursor: str | None = Field(None, title="Курсор на более старую страницу")
+    next_cursor: str | None = Field(None, title="Курсор на более новую страницу")
+    truncated: bool | None = Field(None, title="Выдача обрезана: совпадений больше, чем просматривает поиск")
 
 
 class Error(BaseModel):
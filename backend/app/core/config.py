@@ -14,10 +14,95 @@ class Config(BaseSettings):
     FILE_STORAGE_PATH: str = "/files/"
     API_BASE_URL: str = "http://localhost:8000"
 
+    # Пул соединений к БД на один воркер: постоянные + временные сверх них (итого на все воркеры
+    # должно помещаться в max_connections), сколько секунд ждать свободное соединение,
+    # через сколько секунд пересоздавать соединение (-1 — никогда), проверять ли его перед выдачей
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = -1
+    DB_POOL_PRE_PING: bool = False
+    # Кэш подготовленных запросов asyncpg на соединение (0 — выключен, нужно за pgbouncer
+    # в режиме transaction), таймауты подключения и выполнения запроса в секундах
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_CONNECT_TIMEOUT: float = 60.0
+    DB_COMMAND_TIMEOUT: float | None = None
+    # Реплики только для чтения: DSN postgresql+asyncpg://... через запятую (пусто — всё идёт в основную БД).
+    # Выбор реплики: round_robin — по очереди, least_busy — с наименьшим числом занятых соединений.
+    # После коммита пользователя его чтения столько секунд идут в основную БД (read-your-writes)
+    DB_REPLICA_URLS: str = ""
+    DB_REPLICA_SELECTION: str = "round_robin"
+    DB_READ_YOUR_WRITES_WINDOW: float = 5.0
+
+    # memory — рассылка только внутри процесса, redis — pub/sub между воркерами
+    BROADCAST_BACKEND: str = "memory"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    BROADCAST_CHANNEL_PREFIX: str = "mychat"
+    # Сколько секунд ждать отправки в один сокет, прежде чем закрыть его
+    WS_SEND_TIMEOUT: float = 5.0
+    # Размер исходящей очереди соединения и допустимое отставание клиента в секундах
+    WS_SEND_QUEUE_SIZE: int = 256
+    WS_MAX_LAG: float = 10.0
+
+    # Кэш проверенных access-токенов: сколько токенов держать в памяти воркера (0 — проверять каждый раз)
+    ACCESS_TOKEN_CACHE_SIZE: int = 10000
+
+    # Кэш состава чатов для рассылки: время жизни записи в секундах и максимум чатов
+    MEMBERSHIP_CACHE_TTL: float = 30.0
+    MEMBERSHIP_CACHE_SIZE: int = 10000
+
+    # Group commit сообщений из WebSocket: сколько мс копить пачку и её максимальный размер
+    MESSAGE_GROUP_COMMIT: bool = False
+    MESSAGE_GROUP_COMMIT_DELAY_MS: float = 2.0
+    MESSAGE_GROUP_COMMIT_MAX_BATCH: int = 500
+
+    # Батчи прочтения: фоновое сжатие запускается раз в интервал (0 — выключено)
+    # и за один проход берёт не больше READ_BATCH_COMPACT_PAIRS пар (пользователь, чат)
+    READ_BATCH_COMPACT_INTERVAL: float = 600.0
+    READ_BATCH_COMPACT_PAIRS: int = 1000
+    # Сверка: запросы читателей дополнительно выполняются старым условием from_id/to_id,
+    # расхождения с поиском по read_range пишутся в лог и в /admin/metrics/
+    READ_RANGE_VERIFY: bool = False
+
+    # Отметки «прочитано до сообщения N» копятся в памяти и пишутся одним UPDATE раз в столько мс
+    # (0 — писать сразу при каждом запросе)
+    READ_WATERMARK_FLUSH_MS: float = 500.0
+
+    # Хеширование паролей bcrypt: стоимость (хеши с другой стоимостью пересчитываются при входе),
+    # потоков на воркер и сколько операций может ждать (0 — без ограничения; сверх этого — 503)
+    PASSWORD_HASH_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 64
+
+    # Удаление истёкших и отозванных refresh-токенов: раз в интервал секунд (0 — выключено),
+    # порциями по REFRESH_TOKEN_REAP_BATCH строк, каждая в своей транзакции
+    REFRESH_TOKEN_REAP_INTERVAL: float = 3600.0
+    REFRESH_TOKEN_REAP_BATCH: int = 5000
+
+    # Автодополнение пользователей: запросы не длиннее USER_SEARCH_CACHE_PREFIX_LEN символов кэшируются
+    # в памяти воркера на USER_SEARCH_CACHE_TTL секунд (0 — без кэша), не больше USER_SEARCH_CACHE_SIZE запросов
+    USER_SEARCH_CACHE_TTL: float = 30.0
+    USER_SEARCH_CACHE_SIZE: int = 5000
+    USER_SEARCH_CACHE_PREFIX_LEN: int = 3
+
+    # Секции messages по диапазонам id: размер секции (подбирать под сообщения примерно за месяц),
+    # сколько пустых секций держать впереди текущего id и как часто проверять, в секундах (0 — не проверять)
+    MESSAGES_PARTITION_SIZE: int = 5_000_000
+    MESSAGES_PARTITIONS_AHEAD: int = 2
+    MESSAGES_PARTITION_CHECK_INTERVAL: float = 3600.0
+
+    # Поиск по сообщениям ранжирует не больше стольких самых новых совпадений — иначе на частых
+    # словах время запроса росло бы вместе с таблицей
+    MESSAGE_SEARCH_MAX_CANDIDATES: int = 1000
+
     @property
     def ASYNC_DATABASE_URL(self):
         return f'postgresql+asyncpg://{self.DB_USERNAME}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}'
 
+    @property
+    def REPLICA_DATABASE_URLS(self) -> list[str]:
+        return [url.strip() for url in self.DB_REPLICA_URLS.split(",") if url.strip()]
+
     @property
     def ASYNC_TEST_DATABASE_URL(self):
         return f'postgresql+asyncpg://{self.DB_USERNAME}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/test_{self.DB_NAME}'
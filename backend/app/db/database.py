@@ -2,13 +2,35 @@ from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, Asyn
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 from app.core.config import settings
+from app.db.pool import instrument_pool
 
-engine = create_async_engine(settings.ASYNC_DATABASE_URL)
+
+def _create_engine(url: str):
+    engine = create_async_engine(
+        url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "timeout": settings.DB_CONNECT_TIMEOUT,
+            "command_timeout": settings.DB_COMMAND_TIMEOUT,
+        },
+    )
+    instrument_pool(engine, max_overflow=settings.DB_MAX_OVERFLOW)
+    return engine
+
+
+engine = _create_engine(settings.ASYNC_DATABASE_URL)
 async_session_maker = async_sessionmaker(engine, class_=AsyncSession)
 
+# Реплики только для чтения, у каждой свой пул с теми же настройками
+replica_engines = [_create_engine(url) for url in settings.REPLICA_DATABASE_URLS]
+
 
 class Base(AsyncAttrs, DeclarativeBase):
     __abstract__ = True
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-
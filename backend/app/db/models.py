@@ -1,12 +1,20 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, ForeignKey, DateTime, Text, Boolean, BigInteger, func, UniqueConstraint, Enum, DATETIME, Index
+from sqlalchemy import String, ForeignKey, DateTime, Text, Boolean, BigInteger, func, UniqueConstraint, Enum, DATETIME, Index, Computed, DDL, event, LargeBinary
 from datetime import datetime
 from typing import Optional, List
 import enum
 import uuid
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, INT8RANGE, Range, TSVECTOR
 
+from app.core.config import settings
 from .database import Base
+from .partitions import initial_partitions_sql
+
+
+# Конфигурация полнотекстового поиска по сообщениям. Русская конфигурация латиницу
+# обрабатывает английским стеммером, так что подходит для смешанных чатов.
+# Зашита в генерируемую колонку messages.search_vector — меняется только миграцией.
+MESSAGE_SEARCH_CONFIG = "russian"
 
 
 class ChatType(str, enum.Enum):
@@ -63,6 +71,22 @@ class User(Base):
         back_populates="user",
     )
 
+    __table_args__ = (
+        # Автодополнение пользователей (UserRepository.search): LIKE '%...%' и 'ab%' по триграммам
+        Index('idx_users_username_trgm', func.lower(username).label('username_lower'), postgresql_using='gin',
+              postgresql_ops={'username_lower': 'gin_trgm_ops'}),
+        Index('idx_users_email_trgm', func.lower(email).label('email_lower'), postgresql_using='gin',
+              postgresql_ops={'email_lower': 'gin_trgm_ops'}),
+        Index('idx_users_phone_trgm', 'phone', postgresql_using='gin', postgresql_ops={'phone': 'gin_trgm_ops'}),
+    )
+
+
+# Классы операторов gin_trgm_ops нужны до создания таблиц через create_all (тесты, бенчмарки);
+# в рабочей БД расширение создаёт миграция
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+# То же для btree_gist: GiST-индекс (chat_id, read_range) у message_read_batches
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+
 
 class Chat(Base):
     __tablename__ = 'chats'
@@ -72,10 +96,21 @@ class Chat(Base):
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     is_deleted: Mapped[bool] = mapped_column(default=False, server_default="false")
 
+    # Денормализованные поля, поддерживаются в той же транзакции, что и запись сообщений
+    # (MessageService). Пересчитать с нуля: python reconcile_counters.py
+    last_message_id: Mapped[Optional[int]] = mapped_column(
+        BigInteger, ForeignKey('messages.id', ondelete='SET NULL', use_alter=True, name='chats_last_message_id_fkey'),
+        nullable=True)
+    last_message_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    message_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default='0')
+
+    # Связи не грузятся неявно: нужный набор выбирается профилем загрузки (app.repositories.loading.ChatLoad)
     participants: Mapped[List["ChatParticipant"]] = relationship('ChatParticipant', back_populates='chat',
-                                                                 lazy='selectin', cascade="all, delete-orphan", )
+                                                                 lazy='raise', cascade="all, delete-orphan", )
     messages: Mapped[List["Message"]] = relationship('Message', back_populates='chat', cascade="all, delete-orphan",
-                                                     lazy='selectin')
+                                                     lazy='raise', foreign_keys='Message.chat_id')
+    last_message: Mapped[Optional["Message"]] = relationship('Message', foreign_keys=[last_message_id],
+                                                             viewonly=True, lazy='raise')
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     private_chat: Mapped[Optional["PrivateChat"]] = relationship('PrivateChat', uselist=False, back_populates='chat')
@@ -92,6 +127,8 @@ class ChatParticipant(Base):
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey('users.id'), nullable=False)
     role: Mapped[UserRole] = mapped_column(Enum(UserRole), default=UserRole.MEMBER)
     last_read_message_id: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default='0')
+    # Кэш числа непрочитанных (чужих неудалённых сообщений с id > last_read_message_id)
+    unread_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default='0')
 
     chat: Mapped['Chat'] = relationship('Chat', back_populates='participants')
     user: Mapped['User'] = relationship('User', back_populates='chat_participants')
@@ -124,6 +161,7 @@ class PrivateChat(Base):
 class Message(Base):
     __tablename__ = 'messages'
 
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     chat_id: Mapped[int] = mapped_column(BigInteger, ForeignKey('chats.id'), nullable=False)
     sender_id: Mapped[int] = mapped_column(BigInteger, ForeignKey('users.id'), nullable=True)
     content: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
@@ -131,8 +169,14 @@ class Message(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(),
                                                  onupdate=func.now())
     is_deleted: Mapped[bool] = mapped_column(default=False, server_default="false")
+    # Лексемы content для поиска; в обычные выборки сообщений не грузится
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{MESSAGE_SEARCH_CONFIG}'::regconfig, coalesce(content, ''))", persisted=True),
+        deferred=True,
+    )
 
-    chat: Mapped['Chat'] = relationship('Chat', back_populates='messages')
+    chat: Mapped['Chat'] = relationship('Chat', back_populates='messages', foreign_keys=[chat_id])
     sender: Mapped['User'] = relationship('User', back_populates='messages', lazy='joined')
     file: Mapped['File'] = relationship('File', back_populates='message', cascade="all, delete-orphan", uselist=False,
                                         lazy='joined')
@@ -143,12 +187,29 @@ class Message(Base):
         uselist=False,
     )
 
+    __table_args__ = (
+        # Keyset-пагинация истории: WHERE chat_id = C AND id < X ORDER BY id DESC LIMIT N
+        Index('idx_messages_chat_id_id', 'chat_id', 'id'),
+        Index('idx_messages_search_vector', 'search_vector', postgresql_using='gin'),
+        # Секции по диапазонам id, см. app/db/partitions.py
+        {'postgresql_partition_by': 'RANGE (id)'},
+    )
+
+
+@event.listens_for(Message.__table__, "after_create")
+def _create_message_partitions(target, connection, **kw):
+    # Без секций в секционированную таблицу ничего не вставить; в рабочей БД их создают
+    # миграция и MessagePartitionMaintainer
+    for statement in initial_partitions_sql(settings.MESSAGES_PARTITION_SIZE, settings.MESSAGES_PARTITIONS_AHEAD):
+        connection.exec_driver_sql(statement)
+
 
 class RefreshTokens(Base):
     __tablename__ = 'refresh_tokens'
 
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    token: Mapped[str] = mapped_column(String, unique=True, nullable=False)
+    # sha256 refresh-токена: сам JWT не храним, ищем по (user_id, session_id) и сверяем хеш
+    token_hash: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
     expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     is_revoked: Mapped[bool] = mapped_column(Boolean, default=False)
     session_id: Mapped[str] = mapped_column(String, nullable=False, index=True,
@@ -156,6 +217,14 @@ class RefreshTokens(Base):
 
     user = relationship("User", back_populates="refresh_tokens")
 
+    __table_args__ = (
+        # Одна запись на сессию: вход и обновление токенов делают upsert по (user_id, session_id)
+        UniqueConstraint('user_id', 'session_id', name='uq_refresh_tokens_user_session'),
+        # Фоновое удаление истёкших и отозванных токенов (RefreshTokenReaper)
+        Index('idx_refresh_tokens_expires_at', 'expires_at'),
+        Index('idx_refresh_tokens_revoked', 'id', postgresql_where=is_revoked),
+    )
+
 
 class File(Base):
     __tablename__ = 'files'
@@ -165,6 +234,9 @@ class File(Base):
                                             unique=True)
     url: Mapped[str] = mapped_column(String, nullable=False)
     path: Mapped[str] = mapped_column(String, nullable=True)
+    # Считаются при записи файла; у файлов, загруженных раньше, пустые
+    size: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    sha256: Mapped[str] = mapped_column(String(64), nullable=True)
 
     message: Mapped['Message'] = relationship("Message", back_populates="file", single_parent=True)
 
@@ -250,9 +322,18 @@ class MessageReadBatch(Base):
     Вместо записи каждого прочитанного сообщения отдельно — пишем батч
     раз в N минут: "пользователь прочитал сообщения from_id..to_id в момент read_at".
 
+    read_range — тот же диапазон как int8range [from_id, to_id], вычисляется самой БД.
+
     Индексы:
-      - (chat_id, to_id)   — быстрый ответ на вопрос "кто прочитал сообщение M?"
-      - (user_id, chat_id) — быстрый ответ на вопрос "что читал пользователь в чате?"
+      - GiST по (chat_id, read_range) — "кто прочитал сообщение M в чате C?"
+        (chat_id = C AND read_range @> M). id сообщений общие для всех чатов, и после сжатия
+        у пары (пользователь, чат) обычно один широкий диапазон, накрывающий id всех чатов за
+        это время, — поэтому chat_id должен быть в том же индексе, а не отсеиваться после (btree_gist)
+      - (chat_id, from_id, to_id)  — прежний индекс, нужен сверке READ_RANGE_VERIFY
+      - (user_id, chat_id, to_id)  — последний диапазон пользователя в чате (склейка при записи)
+
+    Диапазоны одного пользователя в чате периодически сжимаются
+    (MessageReadBatchRepository.compact_pair), чтобы таблица не росла без границ.
     """
     __tablename__ = 'message_read_batches'
 
@@ -261,12 +342,16 @@ class MessageReadBatch(Base):
     from_id:  Mapped[int]      = mapped_column(BigInteger, nullable=False)
     to_id:    Mapped[int]      = mapped_column(BigInteger, nullable=False)
     read_at:  Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    read_range: Mapped[Range[int]] = mapped_column(INT8RANGE, Computed("int8range(from_id, to_id, '[]')", persisted=True))
 
     user: Mapped['User'] = relationship('User')
     chat: Mapped['Chat'] = relationship('Chat')
 
     __table_args__ = (
-        # Главный индекс для запроса "кто прочитал сообщение M в чате C"
-        # WHERE chat_id=C AND from_id <= M AND to_id >= M
+        # Главный индекс для запроса "кто прочитал сообщение M в чате C":
+        # WHERE chat_id = C AND read_range @> M; равенство по bigint в GiST даёт btree_gist
+        Index('idx_mrb_chat_read_range', 'chat_id', 'read_range', postgresql_using='gist'),
+        # Прежний индекс под WHERE chat_id=C AND from_id <= M AND to_id >= M
         Index('idx_mrb_chat_range', 'chat_id', 'from_id', 'to_id'),
+        Index('idx_mrb_user_chat_to', 'user_id', 'chat_id', 'to_id'),
     )
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""
+Секционирование таблицы messages по диапазонам id.
+
+Ключ секционирования — id, а не created_at: первичный ключ секционированной таблицы
+обязан включать ключ секционирования, и только так files.message_id, tasks.message_id
+и chats.last_message_id остаются внешними ключами на messages(id).
+id растёт вместе с created_at, поэтому секция — это отрезок времени, а запросы
+истории (id < X) и непрочитанных (id > last_read) отсекают лишние секции.
+
+Секция messages_p<start> хранит id из [start, start + размер); messages_p0 начинается
+с MINVALUE. Выше последней секции стоит messages_overflow до MAXVALUE — в неё попадают
+сообщения, если фоновое создание секций отстало. Секция DEFAULT не подходит: с ней
+PostgreSQL не может читать секции по порядку id и для LIMIT-запросов истории
+открывает индексы всех секций.
+"""
+import re
+
+MESSAGES_TABLE = "messages"
+MESSAGES_PARTITION_PREFIX = "messages_p"
+MESSAGES_OVERFLOW_PARTITION = "messages_overflow"
+
+_PARTITION_NAME_RE = re.compile(rf"^{MESSAGES_PARTITION_PREFIX}\d+$")
+# Границы по BIGINT pg_get_expr выводит в кавычках: FROM ('5000000') TO ('10000000')
+_BOUND_RE = re.compile(r"FROM \('?(MINVALUE|\d+)'?\) TO \('?(MAXVALUE|\d+)'?\)")
+
+
+def partition_name(start: int) -> str:
+    return f"{MESSAGES_PARTITION_PREFIX}{start}"
+
+
+def is_messages_partition(name: str) -> bool:
+    return name == MESSAGES_OVERFLOW_PARTITION or bool(_PARTITION_NAME_RE.match(name))
+
+
+def parse_bound(bound: str) -> tuple[int | None, int | None] | None:
+    """'FOR VALUES FROM (1) TO (100)' -> (1, 100); MINVALUE и MAXVALUE -> None."""
+    match = _BOUND_RE.search(bound)
+    if match is None:
+        return None
+    start, end = match.groups()
+    return (None if start == "MINVALUE" else int(start)), (None if end == "MAXVALUE" else int(end))
+
+
+def _bound_sql(start: int, end: int | None) -> str:
+    lower = "MINVALUE" if start == 0 else str(start)
+    upper = "MAXVALUE" if end is None else str(end)
+    return f"FOR VALUES FROM ({lower}) TO ({upper})"
+
+
+def create_partition_sql(start: int, end: int) -> str:
+    return f"CREATE TABLE {partition_name(start)} PARTITION OF {MESSAGES_TABLE} {_bound_sql(start, end)}"
+
+
+def create_overflow_partition_sql(start: int) -> str:
+    return f"CREATE TABLE {MESSAGES_OVERFLOW_PARTITION} PARTITION OF {MESSAGES_TABLE} {_bound_sql(start, None)}"
+
+
+def attach_partition_sql(name: str, start: int, end: int) -> str:
+    return f"ALTER TABLE {MESSAGES_TABLE} ATTACH PARTITION {name} {_bound_sql(start, end)}"
+
+
+def initial_partitions_sql(size: int, ahead: int) -> list[str]:
+    """Секции для пустой таблицы: messages_p0, ещё ahead впереди и messages_overflow над ними."""
+    statements = [create_partition_sql(n * size, (n + 1) * size) for n in range(ahead + 1)]
+    statements.append(create_overflow_partition_sql((ahead + 1) * size))
+    return statements
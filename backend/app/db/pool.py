@@ -0,0 +1,99 @@
+import time
+import weakref
+from collections import Counter, deque
+
+from sqlalchemy import event
+
+
+class PoolMetrics:
+    """
+    Счётчики пула соединений движка: сколько раз брали соединение, сколько
+    открывали сверх pool_size (overflow), сколько раз пул был выбран целиком
+    и сколько соединение держали. Собираются через публичные события пула
+    (connect/checkout/checkin), нужны, чтобы подбирать размер пула и число
+    воркеров под max_connections Postgres.
+    """
+
+    def __init__(self, max_overflow: int):
+        # У QueuePool нет публичного геттера max_overflow — берём из настроек движка
+        self.max_overflow = max_overflow
+        self.counters: Counter = Counter()
+        self.peak_in_use = 0
+        self.max_hold_ms = 0.0
+        # Последние времена удержания — для перцентилей в метриках
+        self.recent_holds_ms: deque[float] = deque(maxlen=1000)
+
+
+_metrics: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def instrument_pool(engine, max_overflow: int) -> PoolMetrics:
+    """Вешает счётчики на пул движка. Слушатели переживают engine.dispose()."""
+    sync_engine = engine.sync_engine
+    metrics = PoolMetrics(max_overflow)
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.counters["connects"] += 1
+        # overflow() > 0 — соединение открыто сверх pool_size
+        if sync_engine.pool.overflow() > 0:
+            metrics.counters["overflow_events"] += 1
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool = sync_engine.pool
+        in_use = pool.checkedout()
+        metrics.counters["checkouts"] += 1
+        metrics.peak_in_use = max(metrics.peak_in_use, in_use)
+        if max_overflow >= 0 and in_use >= pool.size() + max_overflow:
+            # Свободных соединений не осталось — следующий запрос будет ждать pool_timeout
+            metrics.counters["saturated_checkouts"] += 1
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None)
+        if started is None:
+            return
+        hold_ms = (time.perf_counter() - started) * 1000
+        metrics.counters["hold_total_ms"] += hold_ms
+        metrics.counters["checkins"] += 1
+        metrics.max_hold_ms = max(metrics.max_hold_ms, hold_ms)
+        metrics.recent_holds_ms.append(hold_ms)
+
+    _metrics[sync_engine] = metrics
+    return metrics
+
+
+def pool_stats(engine) -> dict:
+    pool = engine.sync_engine.pool
+    stats = {
+        "class": type(pool).__name__,
+        "status": pool.status(),
+    }
+    metrics = _metrics.get(engine.sync_engine)
+    if metrics is None:
+        return stats
+
+    holds = sorted(metrics.recent_holds_ms)
+    checkins = metrics.counters["checkins"]
+    unbounded = metrics.max_overflow < 0
+    stats.update({
+        "pool_size": pool.size(),
+        "max_overflow": None if unbounded else metrics.max_overflow,
+        # Предел соединений одного воркера: воркеров * это число должно помещаться в max_connections.
+        # При max_overflow=-1 пул не ограничен — None
+        "max_connections": None if unbounded else pool.size() + metrics.max_overflow,
+        "in_use": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "peak_in_use": metrics.peak_in_use,
+        "connects": metrics.counters["connects"],
+        "checkouts": metrics.counters["checkouts"],
+        "overflow_events": metrics.counters["overflow_events"],
+        "saturated_checkouts": metrics.counters["saturated_checkouts"],
+        "hold_avg_ms": round(metrics.counters["hold_total_ms"] / checkins, 3) if checkins else None,
+        "hold_p95_ms": round(holds[min(len(holds) - 1, int(len(holds) * 0.95))], 3) if holds else None,
+        "hold_max_ms": round(metrics.max_hold_ms, 3),
+    })
+    return stats
@@ -1,4 +1,5 @@
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -11,14 +12,38 @@ from app.app.endpoints.files import files
 from app.app.endpoints.admin import admin
 from app.core.config import settings
 from app.logs.config import setup_logging, logger
+from app.utils import manager
+from app.services.message_writer import message_writer
+from app.services.read_batch_compactor import read_batch_compactor
+from app.services.message_partitions import message_partition_maintainer
+from app.services.read_watermarks import read_watermarks
+from app.services.refresh_token_reaper import refresh_token_reaper
+from app.security.password_hasher import password_hasher
 
 ENV = os.getenv("ENVIRONMENT", "development")
 
 setup_logging(ENV)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await manager.startup()
+    read_batch_compactor.start()
+    message_partition_maintainer.start()
+    refresh_token_reaper.start()
+    yield
+    await refresh_token_reaper.stop()
+    await message_partition_maintainer.stop()
+    await read_batch_compactor.stop()
+    await read_watermarks.stop()
+    await message_writer.stop()
+    await manager.shutdown()
+    password_hasher.shutdown()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
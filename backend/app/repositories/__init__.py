@@ -1,4 +1,5 @@
 from .base import Repository
+from .loading import ChatLoad
 from .chat import ChatRepository
 from .chat_participant import ChatParticipantRepository
 from .message import MessageRepository
@@ -60,6 +60,11 @@ class Repository(ABC):
         res = await self.session.execute(stmt)
         return res.scalar_one_or_none()
 
+    async def exists(self, pk: int) -> bool:
+        stmt = select(self.model.id).where(self.model.id == pk).limit(1)
+        res = await self.session.execute(stmt)
+        return res.scalar_one_or_none() is not None
+
     async def get_one_by(self, **kwargs):
         stmt = select(self.model)
         for field, value in kwargs.items():
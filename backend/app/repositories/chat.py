@@ -1,26 +1,134 @@
-from sqlalchemy import insert, select, update, delete, or_, and_
+from sqlalchemy import insert, select, update, delete, or_, and_, func, case
+from sqlalchemy.orm import aliased, raiseload
 
 from .base import Repository
-from app.db.models import Chat, ChatParticipant
+from .loading import ChatLoad, chat_load_options
+from app.db.models import Chat, ChatParticipant, Message
 from app.security import security
 
 class ChatRepository(Repository):
     model = Chat
 
-    async def get_all_for_user(self, user_id: int):
+    async def get_one(self, pk: int, load: ChatLoad = ChatLoad.BARE):
+        stmt = (
+            select(self.model)
+            .where(self.model.id == pk)
+            .options(*chat_load_options(load))
+        )
+        res = await self.session.execute(stmt)
+        return res.scalar_one_or_none()
+
+    async def get_all_for_user(self, user_id: int, load: ChatLoad = ChatLoad.BARE):
         stmt = (
             select(self.model)
             .join(ChatParticipant, self.model.id == ChatParticipant.chat_id)
             .where(ChatParticipant.user_id == user_id)
+            .options(*chat_load_options(load))
         )
         res = await self.session.execute(stmt)
         return res.scalars().all()
 
-    async def get_one_for_user(self, chat_id: int, user_id: int):
+    async def get_one_for_user(self, chat_id: int, user_id: int, load: ChatLoad = ChatLoad.BARE):
         stmt = (
             select(self.model)
             .join(ChatParticipant, self.model.id == ChatParticipant.chat_id)
             .where(and_(ChatParticipant.user_id == user_id, ChatParticipant.chat_id == chat_id))
+            .options(*chat_load_options(load))
+        )
+        res = await self.session.execute(stmt)
+        return res.scalars().one_or_none()
+
+
+    async def get_sidebar_for_user(self, user_id: int):
+        """
+        Список чатов пользователя для сайдбара одним запросом.
+        Для каждого чата: сам чат, last_read_message_id и кэш непрочитанных пользователя,
+        последнее сообщение по указателю chats.last_message_id и максимальный watermark
+        прочтения остальных участников. Отсортировано по последней активности.
+        """
+        me = aliased(ChatParticipant)
+        other = aliased(ChatParticipant)
+        last_message = aliased(Message)
+
+        max_other_read_id = (
+            select(func.coalesce(func.max(other.last_read_message_id), 0))
+            .where(other.chat_id == self.model.id, other.user_id != user_id)
+            .scalar_subquery()
+        )
+
+        stmt = (
+            select(
+                self.model,
+                me.last_read_message_id,
+                last_message,
+                max_other_read_id.label('max_other_read_id'),
+                me.unread_count,
+            )
+            .join(me, and_(me.chat_id == self.model.id, me.user_id == user_id))
+            .outerjoin(last_message, last_message.id == self.model.last_message_id)
+            .options(raiseload(last_message.task))
+            .order_by(func.greatest(self.model.created_at,
+                                    func.coalesce(self.model.last_message_at, self.model.created_at)).desc())
+        )
+        res = await self.session.execute(stmt)
+        return res.unique().all()
+
+    async def register_message(self, chat_id: int, message_id: int, created_at):
+        """Учитывает новое сообщение в счётчике и указателе на последнее сообщение чата."""
+        is_newer = or_(self.model.last_message_id.is_(None), self.model.last_message_id < message_id)
+        stmt = (
+            update(self.model)
+            .where(self.model.id == chat_id)
+            .values(
+                message_count=self.model.message_count + 1,
+                last_message_id=case((is_newer, message_id), else_=self.model.last_message_id),
+                last_message_at=case((is_newer, created_at), else_=self.model.last_message_at),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.execute(stmt)
+
+    async def unregister_message(self, chat_id: int, message_id: int):
+        """
+        Убирает удаляемое сообщение из счётчика. Если оно было последним —
+        указатель переезжает на предыдущее неудалённое сообщение.
+        """
+        previous = (
+            select(Message)
+            .where(Message.chat_id == chat_id, Message.is_deleted == False, Message.id != message_id)
+            .order_by(Message.id.desc())
+            .limit(1)
+            .subquery()
+        )
+        was_last = or_(self.model.last_message_id.is_(None), self.model.last_message_id == message_id)
+        stmt = (
+            update(self.model)
+            .where(self.model.id == chat_id)
+            .values(
+                message_count=func.greatest(self.model.message_count - 1, 0),
+                last_message_id=case((was_last, select(previous.c.id).scalar_subquery()),
+                                     else_=self.model.last_message_id),
+                last_message_at=case((was_last, select(previous.c.created_at).scalar_subquery()),
+                                     else_=self.model.last_message_at),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.execute(stmt)
+
+    async def reconcile_counters(self, chat_id: int | None = None):
+        """Пересчитывает message_count и указатель на последнее сообщение по таблице messages."""
+        alive = and_(Message.chat_id == self.model.id, Message.is_deleted == False)
+        last = select(Message.id, Message.created_at).where(alive).order_by(Message.id.desc()).limit(1)
+        stmt = (
+            update(self.model)
+            .values(
+                message_count=select(func.count()).select_from(Message).where(alive).scalar_subquery(),
+                last_message_id=last.with_only_columns(Message.id).scalar_subquery(),
+                last_message_at=last.with_only_columns(Message.created_at).scalar_subquery(),
+            )
+            .execution_options(synchronize_session=False)
         )
+        if chat_id is not None:
+            stmt = stmt.where(self.model.id == chat_id)
         res = await self.session.execute(stmt)
-        return res.scalars().one_or_none()
\ No newline at end of file
+        return res.rowcount
@@ -1,8 +1,9 @@
 
-from sqlalchemy import select, func
+from sqlalchemy import select, update, func, literal, column, BigInteger
+from sqlalchemy.dialects.postgresql import ARRAY
 
 from .base import Repository
-from app.db.models import Chat, ChatParticipant
+from app.db.models import Chat, ChatParticipant, Message
 from app.security import security
 
 class ChatParticipantRepository(Repository):
@@ -18,4 +19,111 @@ class ChatParticipantRepository(Repository):
         )
         res = await self.session.execute(stmt)
         value = res.scalar()
-        return int(value) if value is not None else 0
\ No newline at end of file
+        return int(value) if value is not None else 0
+
+    async def get_member_ids(self, chat_id: int) -> list[int]:
+        stmt = select(self.model.user_id).where(self.model.chat_id == chat_id)
+        res = await self.session.execute(stmt)
+        return list(res.scalars().all())
+
+    async def increment_unread(self, chat_id: int, sender_id: int):
+        """Новое сообщение от sender_id: +1 непрочитанное всем остальным участникам."""
+        stmt = (
+            update(self.model)
+            .where(self.model.chat_id == chat_id, self.model.user_id != sender_id)
+            .values(unread_count=self.model.unread_count + 1)
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.execute(stmt)
+
+    async def decrement_unread(self, chat_id: int, message_id: int, sender_id: int):
+        """Удалено сообщение: -1 непрочитанное тем, у кого оно ещё не было прочитано."""
+        stmt = (
+            update(self.model)
+            .where(
+                self.model.chat_id == chat_id,
+                self.model.user_id != sender_id,
+                self.model.last_read_message_id < message_id,
+            )
+            .values(unread_count=func.greatest(self.model.unread_count - 1, 0))
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.execute(stmt)
+
+    async def refresh_unread_count(self, chat_id: int | None = None, user_id: int | None = None):
+        """
+        Пересчитывает кэш непрочитанных по таблице messages.
+        Вызывается при сдвиге last_read_message_id и при добавлении участника;
+        без аргументов — для всех участников всех чатов.
+        """
+        unread = (
+            select(func.count())
+            .select_from(Message)
+            .where(
+                Message.chat_id == self.model.chat_id,
+                Message.id > self.model.last_read_message_id,
+                Message.sender_id != self.model.user_id,
+                Message.is_deleted.is_(False),
+            )
+            .scalar_subquery()
+        )
+        stmt = (
+            update(self.model)
+            .values(unread_count=unread)
+            .execution_options(synchronize_session=False)
+        )
+        if chat_id is not None:
+            stmt = stmt.where(self.model.chat_id == chat_id)
+        if user_id is not None:
+            stmt = stmt.where(self.model.user_id == user_id)
+        res = await self.session.execute(stmt)
+        return res.rowcount
+
+    async def advance_read_watermarks(self, items: list[tuple[int, int, int]]) -> list:
+        """
+        Сдвигает last_read_message_id сразу для многих участников одним UPDATE.
+        items — (user_id, chat_id, message_id), не больше одной записи на пару.
+        Водяной знак только растёт: строки, где он уже не меньше message_id, не трогаются.
+        unread_count пересчитывается тем же запросом. Строки блокируются по возрастанию id,
+        чтобы сбросы с разных воркеров не сцепились.
+        Возвращает реально сдвинутые (user_id, chat_id, last_read_message_id).
+        """
+        source = func.unnest(
+            literal([item[0] for item in items], ARRAY(BigInteger)),
+            literal([item[1] for item in items], ARRAY(BigInteger)),
+            literal([item[2] for item in items], ARRAY(BigInteger)),
+        ).table_valued(
+            column("user_id", BigInteger), column("chat_id", BigInteger), column("message_id", BigInteger),
+        ).render_derived(name="source")
+        matches = (
+            (self.model.user_id == source.c.user_id)
+            & (self.model.chat_id == source.c.chat_id)
+            & (self.model.last_read_message_id < source.c.message_id)
+        )
+        locked = (
+            select(self.model.id)
+            .join(source, matches)
+            .order_by(self.model.id)
+            .with_for_update(of=self.model)
+            .cte("locked")
+        )
+        unread = (
+            select(func.count())
+            .select_from(Message)
+            .where(
+                Message.chat_id == source.c.chat_id,
+                Message.id > source.c.message_id,
+                Message.sender_id != source.c.user_id,
+                Message.is_deleted.is_(False),
+            )
+            .scalar_subquery()
+        )
+        stmt = (
+            update(self.model)
+            .where(self.model.id == locked.c.id, matches)
+            .values(last_read_message_id=source.c.message_id, unread_count=unread)
+            .returning(self.model.user_id, self.model.chat_id, self.model.last_read_message_id)
+            .execution_options(synchronize_session=False)
+        )
+        res = await self.session.execute(stmt)
+        return res.all()
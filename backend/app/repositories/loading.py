@@ -0,0 +1,24 @@
+import enum
+
+from sqlalchemy.orm import selectinload
+
+from app.db.models import Chat, ChatParticipant
+
+
+class ChatLoad(str, enum.Enum):
+    """
+    Именованные профили загрузки чата.
+    Все связи Chat объявлены с lazy='raise', поэтому репозиторий/сервис явно
+    выбирает, что подтянуть вместе с чатом, а остальное не грузится вовсе.
+    """
+    BARE = "bare"
+    WITH_PARTICIPANTS = "with_participants"
+    WITH_LAST_MESSAGE = "with_last_message"
+
+
+def chat_load_options(load: ChatLoad) -> list:
+    if load == ChatLoad.WITH_PARTICIPANTS:
+        return [selectinload(Chat.participants).joinedload(ChatParticipant.user)]
+    if load == ChatLoad.WITH_LAST_MESSAGE:
+        return [selectinload(Chat.last_message)]
+    return []
@@ -1,7 +1,17 @@
-from sqlalchemy import insert, select, update, delete, or_, and_, func
+from sqlalchemy import (insert, select, update, delete, or_, and_, func, case, literal, column, tuple_, BigInteger,
+                        Integer, Text, Float, text)
+from sqlalchemy.dialects.postgresql import ARRAY, REGCONFIG
 
 from .base import Repository
-from app.db.models import Message
+from app.db.models import Message, Chat, ChatParticipant, MESSAGE_SEARCH_CONFIG
+from app.db.partitions import (MESSAGES_TABLE, MESSAGES_OVERFLOW_PARTITION, parse_bound, partition_name,
+                                create_partition_sql, create_overflow_partition_sql, attach_partition_sql)
+
+# Параметры ts_headline: до двух фрагментов по 8–25 слов вокруг совпадений
+SEARCH_HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MinWords=8, MaxWords=25, MaxFragments=2, FragmentDelimiter=" … "'
+# Перестройка секций берёт эксклюзивную блокировку messages: не ждём её дольше, чем здесь указано,
+# чтобы не копить за собой очередь запросов — попробуем на следующем проходе
+PARTITION_LOCK_TIMEOUT = "5s"
 
 class MessageRepository(Repository):
     model = Message
@@ -15,11 +25,292 @@ class MessageRepository(Repository):
         res = await self.session.execute(stmt)
         return res.scalars().all()
 
+    async def insert_for_member(self, chat_id: int, sender_id: int, content: str | None):
+        """
+        Вставляет сообщение участника чата одним запросом. Проверка членства, INSERT ... RETURNING,
+        обновление счётчиков чата (как в ChatRepository.register_message) и +1 непрочитанное
+        остальным участникам идут в одном statement через CTE.
+        Возвращает строку (id, created_at, updated_at) или None, если sender_id не состоит в чате.
+        """
+        is_member = (
+            select(ChatParticipant.id)
+            .where(ChatParticipant.chat_id == chat_id, ChatParticipant.user_id == sender_id)
+            .exists()
+        )
+        inserted = (
+            insert(self.model)
+            .from_select(
+                ["chat_id", "sender_id", "content", "is_deleted"],
+                select(literal(chat_id, BigInteger), literal(sender_id, BigInteger), literal(content, Text),
+                       literal(False))
+                .where(is_member),
+            )
+            .returning(self.model.id, self.model.chat_id, self.model.created_at, self.model.updated_at)
+            .cte("inserted")
+        )
+        is_newer = or_(Chat.last_message_id.is_(None), Chat.last_message_id < inserted.c.id)
+        chat_updated = (
+            update(Chat)
+            .where(Chat.id == inserted.c.chat_id)
+            .values(
+                message_count=Chat.message_count + 1,
+                last_message_id=case((is_newer, inserted.c.id), else_=Chat.last_message_id),
+                last_message_at=case((is_newer, inserted.c.created_at), else_=Chat.last_message_at),
+            )
+            .returning(Chat.id)
+            .cte("chat_updated")
+        )
+        # Участники обновляются через chat_updated: строка чата всегда блокируется первой,
+        # иначе порядок выполнения CTE не определён и параллельные вставки ловят deadlock
+        unread_updated = (
+            update(ChatParticipant)
+            .where(ChatParticipant.chat_id == chat_updated.c.id, ChatParticipant.user_id != sender_id)
+            .values(unread_count=ChatParticipant.unread_count + 1)
+            .returning(ChatParticipant.id)
+            .cte("unread_updated")
+        )
+        stmt = (
+            select(inserted.c.id, inserted.c.created_at, inserted.c.updated_at)
+            .add_cte(chat_updated)
+            .add_cte(unread_updated)
+        )
+        res = await self.session.execute(stmt)
+        return res.first()
+
+    async def insert_many_for_members(self, items: list[tuple[int, int, str | None]]) -> dict:
+        """
+        Групповая вставка сообщений (group commit) одним запросом. items — (chat_id, sender_id, content).
+        Возвращает {индекс в items: (id, created_at, updated_at)}; сообщения тех, кто не состоит
+        в чате, не вставляются и в ответ не попадают. id заранее берутся из последовательности,
+        чтобы однозначно сопоставить вставленные строки с входными.
+        """
+        source = func.unnest(
+            literal(list(range(len(items))), ARRAY(Integer)),
+            literal([item[0] for item in items], ARRAY(BigInteger)),
+            literal([item[1] for item in items], ARRAY(BigInteger)),
+            literal([item[2] for item in items], ARRAY(Text)),
+        ).table_valued(
+            column("ord", Integer), column("chat_id", BigInteger), column("sender_id", BigInteger),
+            column("content", Text),
+        ).render_derived(name="source")
+        is_member = (
+            select(ChatParticipant.id)
+            .where(ChatParticipant.chat_id == source.c.chat_id, ChatParticipant.user_id == source.c.sender_id)
+            .exists()
+        )
+        numbered = (
+            select(
+                source.c.ord, source.c.chat_id, source.c.sender_id, source.c.content,
+                func.nextval(func.pg_get_serial_sequence(self.model.__tablename__, "id")).label("id"),
+            )
+            .where(is_member)
+            .order_by(source.c.ord)
+            .cte("numbered")
+        )
+        inserted = (
+            insert(self.model)
+            .from_select(
+                ["id", "chat_id", "sender_id", "content", "is_deleted"],
+                select(numbered.c.id, numbered.c.chat_id, numbered.c.sender_id, numbered.c.content, literal(False)),
+            )
+            .returning(self.model.id, self.model.chat_id, self.model.sender_id, self.model.created_at,
+                       self.model.updated_at)
+            .cte("inserted")
+        )
+        per_chat = (
+            select(
+                inserted.c.chat_id,
+                func.count().label("cnt"),
+                func.max(inserted.c.id).label("max_id"),
+                func.max(inserted.c.created_at).label("max_created_at"),
+            )
+            .group_by(inserted.c.chat_id)
+            .cte("per_chat")
+        )
+        # Чаты пачки блокируются по возрастанию id, чтобы пачки с разных воркеров не сцепились
+        locked_chats = (
+            select(Chat.id)
+            .where(Chat.id.in_(select(per_chat.c.chat_id)))
+            .order_by(Chat.id)
+            .with_for_update()
+            .cte("locked_chats")
+        )
+        is_newer = or_(Chat.last_message_id.is_(None), Chat.last_message_id < per_chat.c.max_id)
+        chat_updated = (
+            update(Chat)
+            .where(Chat.id == per_chat.c.chat_id, Chat.id == locked_chats.c.id)
+            .values(
+                message_count=Chat.message_count + per_chat.c.cnt,
+                last_message_id=case((is_newer, per_chat.c.max_id), else_=Chat.last_message_id),
+                last_message_at=case((is_newer, per_chat.c.max_created_at), else_=Chat.last_message_at),
+            )
+            .returning(Chat.id)
+            .cte("chat_updated")
+        )
+        # Свои сообщения участнику в непрочитанные не идут; как и в insert_for_member,
+        # участники обновляются только после блокировки строки чата (через chat_updated)
+        sent_by_participant = (
+            select(func.count())
+            .where(inserted.c.chat_id == ChatParticipant.chat_id, inserted.c.sender_id == ChatParticipant.user_id)
+            .scalar_subquery()
+        )
+        unread_updated = (
+            update(ChatParticipant)
+            .where(
+                ChatParticipant.chat_id == chat_updated.c.id,
+                ChatParticipant.chat_id == per_chat.c.chat_id,
+                per_chat.c.cnt > sent_by_participant,
+            )
+            .values(unread_count=ChatParticipant.unread_count + per_chat.c.cnt - sent_by_participant)
+            .returning(ChatParticipant.id)
+            .cte("unread_updated")
+        )
+        stmt = (
+            select(numbered.c.ord, inserted.c.id, inserted.c.created_at, inserted.c.updated_at)
+            .join_from(numbered, inserted, numbered.c.id == inserted.c.id)
+            .add_cte(chat_updated)
+            .add_cte(unread_updated)
+        )
+        res = await self.session.execute(stmt)
+        return {row.ord: row for row in res.all()}
+
+    async def get_window_for_chat(
+            self,
+            chat_id: int,
+            *,
+            limit: int,
+            before_id: int | None = None,
+            after_id: int | None = None,
+            around_id: int | None = None,
+    ):
+        """
+        Keyset-выборка окна истории чата по индексу (chat_id, id).
+        Возвращает (messages, has_prev, has_next), сообщения отсортированы по id по возрастанию.
+
+        - before_id — limit сообщений старше before_id
+        - after_id  — limit сообщений новее after_id
+        - around_id — окно вокруг around_id (сам around_id попадает в новую половину)
+        - ничего    — последние limit сообщений
+        """
+        if around_id is not None:
+            # Вместе половины дают ровно limit; при limit=1 остаётся только around_id, и старшую
+            # половину не запрашиваем — has_prev тогда True, как у after_id
+            older_limit = limit // 2
+            older, has_prev = [], True
+            if older_limit:
+                older, has_prev, _ = await self.get_window_for_chat(chat_id, limit=older_limit, before_id=around_id)
+            newer, _, has_next = await self.get_window_for_chat(chat_id, limit=limit - older_limit,
+                                                                after_id=around_id - 1)
+            return older + newer, has_prev, has_next
+
+        stmt = select(self.model).where(self.model.chat_id == chat_id)
+        if after_id is not None:
+            stmt = stmt.where(self.model.id > after_id).order_by(self.model.id.asc())
+        else:
+            if before_id is not None:
+                stmt = stmt.where(self.model.id < before_id)
+            stmt = stmt.order_by(self.model.id.desc())
+        stmt = stmt.limit(limit + 1)
+
+        res = await self.session.execute(stmt)
+        messages = list(res.scalars().all())
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+
+        if after_id is not None:
+            return messages, True, has_more
+        messages.reverse()
+        return messages, has_more, before_id is not None
+
+    async def search(
+            self,
+            query: str,
+            *,
+            user_id: int,
+            chat_id: int | None = None,
+            limit: int,
+            after: tuple[float, int] | None = None,
+            max_candidates: int,
+    ):
+        """
+        Полнотекстовый поиск по search_vector (GIN-индекс). query — строка в синтаксисе to_tsquery
+        (app.utils.search.build_tsquery). С chat_id — поиск в одном чате (членство проверяет сервис),
+        без него — во всех чатах, где состоит user_id. Удалённые сообщения не находятся.
+
+        Ранг считается только для max_candidates самых новых совпадений, чтобы частое слово
+        не заставляло ранжировать всю таблицу; более старые совпадения не находятся вовсе.
+        Порядок — (rank desc, id desc); after — (rank, id) последней строки предыдущей страницы.
+        Ранг зависит только от сообщения и запроса, поэтому курсор устойчив между страницами.
+        Возвращает ([(message, rank, snippet)], has_next, truncated), truncated — совпадений
+        больше max_candidates и часть из них отброшена.
+        """
+        # Подготовленный запрос после пяти выполнений переходит на общий план, не знающий ни слов,
+        # ни лимита: для частого слова это bitmap-скан всех совпадений, и время растёт с таблицей.
+        # Частое слово выгоднее искать обратным сканом по id до max_candidates совпадений, редкое —
+        # через GIN, поэтому план строится под конкретный запрос (SET LOCAL — до конца транзакции)
+        await self.session.execute(text("SET LOCAL plan_cache_mode = force_custom_plan"))
+        tsquery = func.to_tsquery(literal(MESSAGE_SEARCH_CONFIG, REGCONFIG), query)
+        candidates = (
+            select(
+                self.model.id,
+                func.ts_rank_cd(self.model.search_vector, tsquery, 1).label("rank"),
+            )
+            .where(self.model.search_vector.bool_op("@@")(tsquery), self.model.is_deleted == False)
+            .order_by(self.model.id.desc())
+            .limit(max_candidates + 1)
+        )
+        if chat_id is not None:
+            candidates = candidates.where(self.model.chat_id == chat_id)
+        else:
+            candidates = candidates.where(self.model.chat_id.in_(
+                select(ChatParticipant.chat_id).where(ChatParticipant.user_id == user_id)
+            ))
+        # Лишнее совпадение сверх max_candidates только показывает, что выдача обрезана:
+        # CTE читается дважды и поэтому вычисляется один раз
+        candidates = candidates.cte("candidates")
+        truncated = select(func.count() > max_candidates).select_from(candidates).scalar_subquery()
+        kept = (
+            select(candidates.c.id, candidates.c.rank)
+            .order_by(candidates.c.id.desc())
+            .limit(max_candidates)
+            .subquery("kept")
+        )
+
+        page = select(kept.c.id, kept.c.rank)
+        if after is not None:
+            page = page.where(
+                tuple_(kept.c.rank, kept.c.id) < tuple_(literal(after[0], Float), literal(after[1]))
+            )
+        page = page.order_by(kept.c.rank.desc(), kept.c.id.desc()).limit(limit + 1).subquery("page")
+
+        # Подсветка считается только для строк страницы; content экранируется до ts_headline,
+        # в сниппете остаются только наши теги <mark>
+        escaped = func.replace(func.replace(func.replace(self.model.content, "&", "&amp;"), "<", "&lt;"), ">", "&gt;")
+        snippet = func.ts_headline(literal(MESSAGE_SEARCH_CONFIG, REGCONFIG), escaped, tsquery,
+                                   SEARCH_HEADLINE_OPTIONS)
+        stmt = (
+            select(self.model, page.c.rank, snippet.label("snippet"), truncated.label("truncated"))
+            .join(page, page.c.id == self.model.id)
+            .order_by(page.c.rank.desc(), page.c.id.desc())
+        )
+        res = await self.session.execute(stmt)
+        rows = res.all()
+        # Пустая страница бывает только без кандидатов вовсе (курсор выдаётся лишь при has_next)
+        is_truncated = bool(rows) and rows[0].truncated
+        return [tuple(row[:3]) for row in rows[:limit]], len(rows) > limit, is_truncated
+
+    async def get_chat_and_sender(self, message_id: int):
+        """Только (chat_id, sender_id) сообщения — без подгрузки автора, файла и задачи."""
+        stmt = select(self.model.chat_id, self.model.sender_id).where(self.model.id == message_id)
+        res = await self.session.execute(stmt)
+        return res.one_or_none()
+
     async def get_last_for_chat(self, chat_id: int):
         stmt = (
             select(self.model)
             .where(self.model.chat_id == chat_id, self.model.is_deleted == False)
-            .order_by(self.model.created_at.desc())
+            .order_by(self.model.id.desc())
+            .limit(1)
         )
         res = await self.session.execute(stmt)
         return res.scalars().first()
@@ -36,4 +327,76 @@ class MessageRepository(Repository):
             )
         )
         res = await self.session.execute(stmt)
-        return res.scalar_one()
\ No newline at end of file
+        return res.scalar_one()
+
+    async def try_lock_partitions(self) -> bool:
+        """Блокировка обслуживания секций до конца транзакции; False — её держит другой воркер."""
+        res = await self.session.execute(
+            select(func.pg_try_advisory_xact_lock(func.hashtext(f"{MESSAGES_TABLE}_partitions")))
+        )
+        return res.scalar_one()
+
+    async def get_partitions(self) -> list[tuple[str, int | None, int | None]]:
+        """Секции messages: (имя, начало, конец); MINVALUE и MAXVALUE — None."""
+        res = await self.session.execute(
+            text(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = CAST(:parent AS regclass)"
+            ),
+            {"parent": MESSAGES_TABLE},
+        )
+        partitions = []
+        for name, bound in res.all():
+            start, end = parse_bound(bound) or (None, None)
+            partitions.append((name, start, end))
+        return partitions
+
+    async def get_max_id(self) -> int:
+        res = await self.session.execute(select(func.coalesce(func.max(self.model.id), 0)))
+        return res.scalar_one()
+
+    async def lock_for_partitioning(self) -> None:
+        await self.session.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+        await self.session.execute(text(f"LOCK TABLE {MESSAGES_TABLE} IN ACCESS EXCLUSIVE MODE"))
+
+    async def detach_overflow(self) -> None:
+        await self.session.execute(text(f"ALTER TABLE {MESSAGES_TABLE} DETACH PARTITION {MESSAGES_OVERFLOW_PARTITION}"))
+
+    async def drop_overflow(self) -> None:
+        await self.session.execute(text(f"DROP TABLE {MESSAGES_OVERFLOW_PARTITION}"))
+
+    async def attach_overflow(self, start: int, end: int) -> None:
+        """Отсоединённая messages_overflow возвращается обычной секцией [start, end)."""
+        await self.session.execute(
+            text(f"ALTER TABLE {MESSAGES_OVERFLOW_PARTITION} RENAME TO {partition_name(start)}")
+        )
+        await self.session.execute(text(attach_partition_sql(partition_name(start), start, end)))
+
+    async def get_referencing_fks(self) -> list[tuple[str, str, str]]:
+        """Внешние ключи других таблиц на messages: (таблица, имя, определение)."""
+        res = await self.session.execute(
+            text(
+                "SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE confrelid = CAST(:parent AS regclass) AND contype = 'f' AND conparentid = 0 "
+                "ORDER BY conname"
+            ),
+            {"parent": MESSAGES_TABLE},
+        )
+        # Ключ, ещё не прошедший VALIDATE, возвращается с суффиксом NOT VALID — add_fk допишет его сам
+        return [(table, name, definition.removesuffix(" NOT VALID")) for table, name, definition in res.all()]
+
+    async def drop_fk(self, table: str, name: str) -> None:
+        await self.session.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"'))
+
+    async def add_fk(self, table: str, name: str, definition: str) -> None:
+        """Ключ без проверки существующих строк; проверяет validate_fk отдельной транзакцией."""
+        await self.session.execute(text(f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition} NOT VALID'))
+
+    async def validate_fk(self, table: str, name: str) -> None:
+        await self.session.execute(text(f'ALTER TABLE {table} VALIDATE CONSTRAINT "{name}"'))
+
+    async def create_partition(self, start: int, end: int) -> None:
+        await self.session.execute(text(create_partition_sql(start, end)))
+
+    async def create_overflow(self, start: int) -> None:
+        await self.session.execute(text(create_overflow_partition_sql(start)))
@@ -1,9 +1,51 @@
+import heapq
 from datetime import datetime, timezone
 
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, and_, func, delete, cast, BigInteger
 
 from .base import Repository
-from app.db.models import MessageReadBatch
+from app.db.models import MessageReadBatch, Message, User
+
+
+def merge_read_ranges(rows) -> list[tuple[int, int, datetime]]:
+    """
+    Сводит диапазоны прочтения одного пользователя в одном чате к минимальному набору
+    непересекающихся (from_id, to_id, read_at), упорядоченных по from_id.
+
+    Каждому сообщению остаётся самый ранний read_at, время прочтения не сдвигается:
+    пересечения режутся, а в один диапазон склеиваются только соседние и пересекающиеся
+    диапазоны с одинаковым read_at.
+    """
+    heap = [(from_id, read_at, to_id) for from_id, to_id, read_at in rows]
+    heapq.heapify(heap)
+    result = []
+    current = None
+    while heap:
+        item = heapq.heappop(heap)
+        if current is None:
+            current = item
+            continue
+        from_id, read_at, to_id = item
+        cur_from, cur_read_at, cur_to = current
+        if from_id > cur_to + 1 or (from_id > cur_to and read_at != cur_read_at):
+            result.append(current)
+            current = item
+        elif read_at == cur_read_at:
+            current = (cur_from, cur_read_at, max(cur_to, to_id))
+        elif read_at > cur_read_at:
+            # Пересечение уже прочитано раньше — остаётся только хвост
+            if to_id > cur_to:
+                heapq.heappush(heap, (cur_to + 1, read_at, to_id))
+        else:
+            # Новый диапазон прочитан раньше — режем текущий вокруг него
+            if cur_from < from_id:
+                result.append((cur_from, cur_read_at, from_id - 1))
+            if cur_to > to_id:
+                heapq.heappush(heap, (to_id + 1, cur_read_at, cur_to))
+            current = item
+    if current is not None:
+        result.append(current)
+    return [(from_id, to_id, read_at) for from_id, read_at, to_id in result]
 
 
 class MessageReadBatchRepository(Repository):
@@ -17,50 +59,175 @@ class MessageReadBatchRepository(Repository):
         to_id: int,
     ) -> MessageReadBatch:
         """
-        Создаёт запись о прочтении диапазона сообщений [from_id, to_id].
+        Записывает прочтение диапазона сообщений [from_id, to_id].
         Вызывается с фронта раз в N минут.
+
+        Фронт шлёт диапазоны подряд, поэтому новый диапазон сначала сверяем
+        с последним диапазоном пользователя в этом чате:
+          - уже покрыт им — ничего не пишем, там более ранний read_at;
+          - пересекается с ним — пишем только непрочитанный хвост.
+        Соседний диапазон пишется отдельной строкой со своим read_at: расширить старую
+        строку значило бы задним числом датировать новые сообщения её временем.
+        Остальное доводит фоновое сжатие (compact_pair).
         """
+        now = datetime.now(timezone.utc)
+        last = await self.session.scalar(
+            select(self.model)
+            .where(self.model.user_id == user_id, self.model.chat_id == chat_id)
+            .order_by(self.model.to_id.desc())
+            .limit(1)
+            .with_for_update()
+        )
+        if last is not None and last.from_id <= from_id <= last.to_id:
+            if to_id <= last.to_id:
+                return last
+            from_id = last.to_id + 1
+
         obj = self.model(
             user_id=user_id,
             chat_id=chat_id,
             from_id=from_id,
             to_id=to_id,
-            read_at=datetime.now(timezone.utc),
+            read_at=now,
         )
         self.session.add(obj)
         await self.session.flush()
         return obj
 
+    async def try_lock_compaction(self) -> bool:
+        """Блокировка сжатия батчей до конца транзакции; False — её держит другой воркер."""
+        res = await self.session.execute(
+            select(func.pg_try_advisory_xact_lock(func.hashtext(f"{self.model.__tablename__}_compaction")))
+        )
+        return res.scalar_one()
+
+    async def get_pairs_changed_since(self, last_id: int, limit: int) -> list:
+        """
+        Пары (user_id, chat_id), у которых появились батчи с id > last_id, вместе с
+        максимальным id батча пары. Отсортированы по этому id, чтобы сжатие могло
+        идти порциями и запоминать, докуда дошло.
+        """
+        max_id = func.max(self.model.id)
+        stmt = (
+            select(self.model.user_id, self.model.chat_id, max_id.label('max_id'))
+            .where(self.model.id > last_id)
+            .group_by(self.model.user_id, self.model.chat_id)
+            .order_by(max_id)
+            .limit(limit)
+        )
+        res = await self.session.execute(stmt)
+        return res.all()
+
+    async def compact_pair(self, user_id: int, chat_id: int) -> tuple[int, int]:
+        """
+        Сжимает все батчи пользователя в чате (merge_read_ranges). Существующие строки
+        переписываются на месте, лишние удаляются — новых id не появляется.
+        Возвращает (строк было, строк стало).
+        """
+        res = await self.session.scalars(
+            select(self.model)
+            .where(self.model.user_id == user_id, self.model.chat_id == chat_id)
+            .order_by(self.model.id)
+            .with_for_update()
+        )
+        batches = res.all()
+        ranges = merge_read_ranges((batch.from_id, batch.to_id, batch.read_at) for batch in batches)
+        if ranges == sorted((batch.from_id, batch.to_id, batch.read_at) for batch in batches):
+            return len(batches), len(ranges)
+
+        for batch, (from_id, to_id, read_at) in zip(batches, ranges):
+            batch.from_id, batch.to_id, batch.read_at = from_id, to_id, read_at
+        extra_ids = [batch.id for batch in batches[len(ranges):]]
+        await self.session.execute(delete(self.model).where(self.model.id.in_(extra_ids)))
+        await self.session.flush()
+        return len(batches), len(ranges)
+
+    def _covers(self, message_id, legacy: bool = False):
+        """
+        Условие «батч покрывает сообщение message_id» (число или колонка).
+        По умолчанию — read_range @> id через GiST-индекс; legacy=True — старое сравнение
+        from_id/to_id по b-tree, нужно только для сверки (READ_RANGE_VERIFY).
+        """
+        if legacy:
+            return and_(self.model.from_id <= message_id, self.model.to_id >= message_id)
+        return self.model.read_range.contains(cast(message_id, BigInteger))
+
     async def get_readers_for_message(
         self,
         chat_id: int,
         message_id: int,
         exclude_user_id: int,
+        legacy: bool = False,
     ) -> list:
         """
-        Возвращает список (user_id, earliest_read_at) для всех пользователей
+        Возвращает список (user_id, read_at, username, email) для всех пользователей
         которые прочитали сообщение message_id в чате chat_id.
 
-        Логика: ищем батчи где from_id <= message_id <= to_id.
+        Логика: ищем батчи, чей диапазон read_range содержит message_id.
         Берём самый ранний read_at на пользователя — это момент когда
         сообщение впервые попало в батч прочтения (с погрешностью до N минут).
+        Данные пользователя подтягиваются тем же запросом.
         """
         stmt = (
             select(
                 self.model.user_id,
                 func.min(self.model.read_at).label('read_at'),
+                User.username,
+                User.email,
             )
+            .join(User, User.id == self.model.user_id)
             .where(
                 and_(
+                    self._covers(message_id, legacy),
                     self.model.chat_id == chat_id,
-                    self.model.from_id <= message_id,
-                    self.model.to_id   >= message_id,
                     self.model.user_id != exclude_user_id,
                 )
             )
-            .group_by(self.model.user_id)
+            .group_by(self.model.user_id, User.username, User.email)
             .order_by(func.min(self.model.read_at))
         )
 
         res = await self.session.execute(stmt)
-        return res.all()  # list of Row(user_id, read_at)
\ No newline at end of file
+        return res.all()  # list of Row(user_id, read_at, username, email)
+
+    async def get_readers_for_range(
+        self,
+        chat_id: int,
+        from_id: int,
+        to_id: int,
+        legacy: bool = False,
+    ) -> list:
+        """
+        Читатели сразу для всех сообщений чата с id из [from_id, to_id] — одним запросом.
+        Возвращает строки (message_id, user_id, read_at, username, email) по возрастанию
+        message_id и read_at. Автор сообщения в его читатели не попадает.
+        Сообщения без читателей приходят одной строкой с user_id = None.
+        """
+        covers = and_(
+            self._covers(Message.id, legacy),
+            self.model.chat_id == Message.chat_id,
+            self.model.user_id.is_distinct_from(Message.sender_id),
+        )
+        read_at = func.min(self.model.read_at)
+        stmt = (
+            select(
+                Message.id.label('message_id'),
+                self.model.user_id,
+                read_at.label('read_at'),
+                User.username,
+                User.email,
+            )
+            .select_from(Message)
+            .outerjoin(self.model, covers)
+            .outerjoin(User, User.id == self.model.user_id)
+            .where(
+                Message.chat_id == chat_id,
+                Message.id >= from_id,
+                Message.id <= to_id,
+            )
+            .group_by(Message.id, self.model.user_id, User.username, User.email)
+            .order_by(Message.id, read_at)
+        )
+
+        res = await self.session.execute(stmt)
+        return res.all()
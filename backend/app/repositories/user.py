@@ -1,13 +1,61 @@
+import re
 import uuid
 from sqlalchemy import insert, select, update, delete, or_, and_, func, case
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from .base import Repository
 from app.db.models import User, ChatParticipant, RefreshTokens, Message
 from app.security import security
 
+# Короче этого триграммы по вхождению почти ничего не отсекают — ищем по началу строки
+SEARCH_MIN_INFIX_LEN = 3
+_PHONE_QUERY_RE = re.compile(r"^[+\d\s()-]+$")
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
 class UserRepository(Repository):
     model = User
 
+    async def search(self, query: str, limit: int):
+        """
+        Автодополнение по username, email и телефону (триграммные GIN-индексы), без удалённых.
+        Запрос короче SEARCH_MIN_INFIX_LEN ищется по началу строки, длиннее — по вхождению.
+        Телефон ищется, только если запрос похож на номер: по цифрам без пробелов и скобок.
+        Сначала точное совпадение username, затем по началу username, затем email, затем остальные.
+        """
+        query = query.strip().lower()
+        escaped = _escape_like(query)
+        pattern = f"{escaped}%" if len(query) < SEARCH_MIN_INFIX_LEN else f"%{escaped}%"
+        username = func.lower(self.model.username)
+        email = func.lower(self.model.email)
+        conditions = [username.like(pattern), email.like(pattern)]
+        digits = re.sub(r"\D", "", query)
+        if digits and _PHONE_QUERY_RE.match(query):
+            # Номера хранятся в E.164 (+79991234567)
+            phone_pattern = f"+{digits}%" if len(digits) < SEARCH_MIN_INFIX_LEN else f"%{digits}%"
+            conditions.append(self.model.phone.like(phone_pattern))
+
+        stmt = (
+            select(self.model)
+            .where(or_(*conditions), self.model.is_deleted == False)
+            .order_by(
+                case(
+                    (username == query, 0),
+                    (username.like(f"{escaped}%"), 1),
+                    (email.like(f"{escaped}%"), 2),
+                    else_=3,
+                ),
+                func.length(self.model.username),
+                self.model.id,
+            )
+            .limit(limit)
+        )
+        res = await self.session.execute(stmt)
+        return res.scalars().all()
+
     async def get_one_with_stat(self, user_id: int, chat_id: int | None):
         stmt_user = select(self.model).where(self.model.id == user_id)
         res_user = await self.session.execute(stmt_user)
@@ -35,24 +83,27 @@ class UserRepository(Repository):
         }
 
     async def get_all_with_stat(self):
-        stmt_user = select(self.model)
-        res_user = await self.session.execute(stmt_user)
-        users = res_user.scalars().all()
-        if not users:
+        count_message = (
+            select(Message.sender_id, func.count(Message.id).label('count_message'))
+            .group_by(Message.sender_id)
+            .subquery()
+        )
+        stmt = (
+            select(self.model, func.coalesce(count_message.c.count_message, 0))
+            .outerjoin(count_message, count_message.c.sender_id == self.model.id)
+        )
+        res = await self.session.execute(stmt)
+        rows = res.all()
+        if not rows:
             return None
 
-        result = []
-        for user in users:
-            stmt_count = select(func.count(Message.id)).where(Message.sender_id == user.id)
-            res_count = await self.session.execute(stmt_count)
-            count_message = res_count.scalar() or 0
-
-            result.append({
+        return [
+            {
                 "user": user,
                 "count_message": count_message,
-            })
-
-        return result
+            }
+            for user, count_message in rows
+        ]
 
     async def get_all(self, exception_id: int | None = None):
         stmt = select(self.model)
@@ -93,77 +144,85 @@ class UserRepository(Repository):
         return res.scalars().all()
 
     async def _get_credentials_by_username_or_email(self, username_or_email: str):
-        stmt = select(self.model).where(
+        stmt = select(
+            self.model.id, self.model.email, self.model.username, self.model.phone,
+            self.model.password, self.model.is_superuser,
+        ).where(
             or_(
                 self.model.email == username_or_email,
                 self.model.username == username_or_email,
             )
         )
         res = await self.session.execute(stmt)
-        user = res.scalar_one_or_none()
+        user = res.one_or_none()
         if user:
             return {
                 'user_id': user.id,
                 'email': user.email,
                 'username': user.username,
                 'phone': user.phone,
-                'password': user.password
+                'password': user.password,
+                'is_superuser': bool(user.is_superuser),
             }
         return None
 
-    async def check_credentials(self, username_or_email: str, input_password: str):
-        existing_user = await self._get_credentials_by_username_or_email(
-            username_or_email=username_or_email,
+    async def get_credentials(self, username_or_email: str):
+        """id, логин, почта, телефон, хеш пароля и is_superuser; пароль проверяет сервис вне транзакции."""
+        return await self._get_credentials_by_username_or_email(username_or_email=username_or_email)
+
+    async def set_password_hash(self, user_id: int, password_hash: str):
+        stmt = update(self.model).where(self.model.id == user_id).values(password=password_hash)
+        await self.session.execute(stmt)
+
+    async def upsert_refresh_token(self, user_id: int, session_id: str, token: str, expires_at):
+        """Одна запись на сессию: новый refresh-токен заменяет прежний токен этой сессии."""
+        stmt = pg_insert(RefreshTokens).values(
+            user_id=user_id, session_id=session_id, token_hash=security.hash_refresh_token(token),
+            expires_at=expires_at, is_revoked=False,
         )
-        if existing_user:
-            return security.verify_hash(input_password, existing_user['password'])
-        else:
-            return False
+        stmt = stmt.on_conflict_do_update(
+            constraint='uq_refresh_tokens_user_session',
+            set_={"token_hash": stmt.excluded.token_hash, "expires_at": stmt.excluded.expires_at, "is_revoked": False},
+        )
+        await self.session.execute(stmt)
 
-    async def create_jwt_tokens(self, username_or_email: str, user_id: int | None = None, session_id: str | None = None):
+    async def issue_tokens(self, user_id: int, username: str, is_superuser: bool, session_id: str | None = None):
+        """Пара access/refresh для уже проверенного пользователя; refresh сохраняется без коммита."""
         if session_id is None:
             session_id = str(uuid.uuid4())
-        user = await self._get_credentials_by_username_or_email(username_or_email=username_or_email)
-        username = user['username']
-        user_id = user['user_id'] if user_id is None else user_id
-
-        # Получаем is_superuser из БД
-        stmt = select(self.model).where(self.model.id == user_id)
-        res = await self.session.execute(stmt)
-        user_obj = res.scalar_one_or_none()
-        is_superuser = bool(user_obj.is_superuser) if user_obj else False
-
         data = {"user_id": user_id, "username": username, "session_id": session_id, "is_superuser": is_superuser}
         tokens = security.create_jwt_tokens(data)
         if tokens:
-            refresh_token = tokens['refresh_token']
-            expire_refresh_token = tokens['expires_refresh_at']
-
-            stmt = delete(RefreshTokens).where(
-                and_(
-                    RefreshTokens.user_id == user_id,
-                    RefreshTokens.session_id == session_id,
-                )).returning(RefreshTokens)
+            await self.upsert_refresh_token(
+                user_id=user_id, session_id=session_id,
+                token=tokens['refresh_token'], expires_at=tokens['expires_refresh_at'],
+            )
+        return tokens
 
+    async def create_jwt_tokens(self, username_or_email: str, user_id: int | None = None, session_id: str | None = None):
+        if user_id is None:
+            user = await self._get_credentials_by_username_or_email(username_or_email=username_or_email)
+            if user is None:
+                return None
+            user_id, username, is_superuser = user['user_id'], user['username'], user['is_superuser']
+        else:
+            stmt = select(self.model.username, self.model.is_superuser).where(self.model.id == user_id)
             res = await self.session.execute(stmt)
-            deleted_token = res.scalars().first()
-            data_for_insert =  {"user_id": user_id, 'token': refresh_token, "expires_at": expire_refresh_token}
-
-            if deleted_token is not None:
-                session_id = deleted_token.session_id
-            data_for_insert.update({"session_id": session_id})
-            stmt = insert(RefreshTokens).values(data_for_insert).returning(RefreshTokens)
-
-            await self.session.execute(stmt)
-
-            return tokens
-        return None
+            user = res.one_or_none()
+            if user is None:
+                return None
+            username, is_superuser = user.username, bool(user.is_superuser)
+        return await self.issue_tokens(user_id=user_id, username=username, is_superuser=is_superuser,
+                                       session_id=session_id)
 
     async def check_refresh_token(self, raw_token: str, user_id: int, session_id: str):
-        stmt = select(RefreshTokens).where(
+        # Поиск по уникальному (user_id, session_id), сам токен сверяется по sha256
+        stmt = select(RefreshTokens.id).where(
             and_(
                 RefreshTokens.user_id == user_id,
-                RefreshTokens.token == raw_token
+                RefreshTokens.session_id == session_id,
+                RefreshTokens.token_hash == security.hash_refresh_token(raw_token),
+                RefreshTokens.is_revoked == False,
         ))
         res = await self.session.execute(stmt)
 
@@ -175,4 +234,19 @@ class UserRepository(Repository):
                 )
 
             await self.session.execute(stmt)
-        return (token is not None)
\ No newline at end of file
+        return (token is not None)
+
+    async def delete_expired_refresh_tokens(self, limit: int) -> int:
+        """
+        Удаляет до limit истёкших или отозванных refresh-токенов, возвращает сколько удалено.
+        Строки, занятые другим воркером, пропускаются (SKIP LOCKED).
+        """
+        expired = (
+            select(RefreshTokens.id)
+            .where(or_(RefreshTokens.expires_at < func.now(), RefreshTokens.is_revoked == True))
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = delete(RefreshTokens).where(RefreshTokens.id.in_(expired.scalar_subquery()))
+        res = await self.session.execute(stmt)
+        return res.rowcount
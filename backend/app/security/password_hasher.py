@@ -0,0 +1,107 @@
+import asyncio
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import status
+
+from app.core.config import settings
+from app.exceptions import EntityError
+from app.security.security import pwd_context
+
+
+class PasswordHasher:
+    """
+    bcrypt в отдельном пуле потоков: одна операция занимает сотни миллисекунд CPU,
+    и в обработчике она останавливала бы event loop вместе со всеми WebSocket воркера.
+    bcrypt отпускает GIL, поэтому потоков достаточно — цикл событий работает, пока они считают.
+    Одновременно считается не больше workers операций; если в очереди за ними
+    (без учёта уже считающихся) стоит max_pending, новая сразу получает 503 —
+    при шторме входов очередь не растёт бесконечно.
+    """
+
+    def __init__(self, context, workers: int, max_pending: int):
+        self.context = context
+        self.workers = workers
+        self.max_pending = max_pending
+        # Все операции в работе: считающиеся в потоках и ждущие свободного потока
+        self.pending = 0
+        self.counters: Counter = Counter()
+        self.max_wait_ms = 0.0
+        # Последние ожидания и длительности — для перцентилей в метриках
+        self.recent_waits_ms: deque[float] = deque(maxlen=1000)
+        self.recent_runs_ms: deque[float] = deque(maxlen=1000)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hasher")
+
+    @property
+    def queued(self) -> int:
+        """Операции, которые ещё ждут свободного потока."""
+        return max(self.pending - self.workers, 0)
+
+    async def _run(self, operation: str, func, *args):
+        if self.max_pending and self.queued >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise EntityError(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервер перегружен, повторите попытку позже",
+            )
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                wait_ms = (started - submitted) * 1000
+                self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+                self.recent_waits_ms.append(wait_ms)
+                self.recent_runs_ms.append((time.perf_counter() - started) * 1000)
+
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, job)
+        finally:
+            self.pending -= 1
+            self.counters[operation] += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hashes", self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run("verifies", self.context.verify, password, hashed)
+
+    async def verify_and_update(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        """(пароль верный, новый хеш); новый хеш не None, если старый посчитан с другими параметрами."""
+        valid, new_hash = await self._run("verifies", self.context.verify_and_update, password, hashed)
+        if new_hash is not None:
+            self.counters["rehashes"] += 1
+        return valid, new_hash
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        waits = sorted(self.recent_waits_ms)
+        runs = sorted(self.recent_runs_ms)
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "rounds": settings.PASSWORD_HASH_ROUNDS,
+            "pending": self.pending,
+            "queued": self.queued,
+            "hashes": self.counters["hashes"],
+            "verifies": self.counters["verifies"],
+            "rehashes": self.counters["rehashes"],
+            "rejected": self.counters["rejected"],
+            "wait_p95_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else None,
+            "wait_max_ms": round(self.max_wait_ms, 3),
+            "run_p50_ms": round(runs[len(runs) // 2], 3) if runs else None,
+            "run_p95_ms": round(runs[min(len(runs) - 1, int(len(runs) * 0.95))], 3) if runs else None,
+        }
+
+
+password_hasher = PasswordHasher(
+    pwd_context,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
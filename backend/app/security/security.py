@@ -1,8 +1,9 @@
 import datetime
+import hashlib
 import jwt
 import phonenumbers
 import re
-from typing import Dict
+from typing import Dict, Mapping
 
 from passlib.context import CryptContext 
 from fastapi.security import OAuth2PasswordBearer
@@ -11,8 +12,16 @@ from fastapi import Depends, HTTPException, status
 from app.core.config import settings
 from app.app.schemas import Tokens
 from app.exceptions import NotAuthenticated, InaccessibleEntity, UnprocessableEntity, EntityError
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.security.token_cache import access_token_cache
+
+# min/max_rounds = rounds: needs_update срабатывает на любой хеш с другой стоимостью
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.PASSWORD_HASH_ROUNDS,
+    bcrypt__min_rounds=settings.PASSWORD_HASH_ROUNDS,
+    bcrypt__max_rounds=settings.PASSWORD_HASH_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/users/login/swagger/')
 
 SECRET_KEY = settings.SECRET_KEY
@@ -27,6 +36,10 @@ def verify_hash(plain_str, hashed_str):
 def get_string_hash(string_for_hash):
     return pwd_context.hash(string_for_hash)
 
+def hash_refresh_token(token: str) -> bytes:
+    """sha256 refresh-токена: в БД хранится и сравнивается только он."""
+    return hashlib.sha256(token.encode()).digest()
+
 def create_jwt_for_swagger(data: Dict):
     try:
         to_encode_access = data.copy()
@@ -63,17 +76,37 @@ def create_jwt_tokens(data: Dict):
         print(e)
         return None
 
-async def decode_jwt_access(token: str = Depends(oauth2_scheme)):
+def decode_access_claims(token: str) -> Mapping:
+    """
+    Проверяет access-токен и возвращает его claims (с ключом raw) только для чтения.
+    Повторные проверки того же токена берутся из access_token_cache.
+    """
+    key = access_token_cache.key(token)
+    claims = access_token_cache.get(key)
+    if claims is not None:
+        return claims
     try:
         decode = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        decode.update({"raw": token})
-        if decode['type'] != 'access':
-            raise NotAuthenticated(detail="Неверный тип токена")
-        return decode
     except jwt.ExpiredSignatureError:
         raise NotAuthenticated(detail="Токен истёк")
     except jwt.InvalidTokenError:
         raise NotAuthenticated(detail="Неверный токен")
+    if decode.get('type') != 'access':
+        raise NotAuthenticated(detail="Неверный тип токена")
+    decode.update({"raw": token})
+    return access_token_cache.set(key, decode, decode.get("exp"))
+
+async def decode_jwt_access(token: str = Depends(oauth2_scheme)):
+    return decode_access_claims(token)
+
+def get_user_id_from_authorization(authorization: str | None) -> int | None:
+    """user_id из заголовка 'Authorization: Bearer <access>'; None, если токена нет или он невалиден."""
+    if not authorization or not authorization.startswith("Bearer "):
+        return None
+    try:
+        return decode_access_claims(authorization[len("Bearer "):]).get("user_id")
+    except NotAuthenticated:
+        return None
 
 async def require_superuser(token: dict = Depends(decode_jwt_access)):
     """Зависимость: пропускает только суперпользователей."""
@@ -0,0 +1,71 @@
+import hashlib
+import time
+from collections import Counter
+from types import MappingProxyType
+from typing import Mapping
+
+from app.core.config import settings
+
+
+class AccessTokenCache:
+    """
+    Кэш проверенных access-токенов в памяти процесса: sha256 токена -> claims.
+    Токен без состояния, поэтому повторная проверка подписи даёт тот же результат до exp —
+    запись живёт ровно до exp токена, при переполнении вытесняется давно не использованная.
+    Claims отдаются только для чтения (MappingProxyType): один объект видят все запросы с этим токеном.
+    Кэшируются только успешно проверенные токены, чтобы мусорные токены не вытесняли настоящие.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.counters: Counter = Counter()
+        self._items: dict[bytes, tuple[float, Mapping]] = {}
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, key: bytes) -> Mapping | None:
+        if self.max_size <= 0:
+            return None
+        item = self._items.pop(key, None)
+        if item is None:
+            self.counters["misses"] += 1
+            return None
+        if item[0] <= time.time():
+            self.counters["expired"] += 1
+            self.counters["misses"] += 1
+            return None
+        # Переставляем в конец: dict хранит порядок вставки, в начале — давно не использованные
+        self._items[key] = item
+        self.counters["hits"] += 1
+        return item[1]
+
+    def set(self, key: bytes, claims: dict, expires_at: float | None) -> Mapping:
+        claims = MappingProxyType(claims)
+        if self.max_size <= 0 or expires_at is None:
+            return claims
+        self._items.pop(key, None)
+        if len(self._items) >= self.max_size:
+            del self._items[next(iter(self._items))]
+            self.counters["evictions"] += 1
+        self._items[key] = (expires_at, claims)
+        return claims
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def stats(self) -> dict:
+        hits, misses = self.counters["hits"], self.counters["misses"]
+        return {
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+            "expired": self.counters["expired"],
+            "evictions": self.counters["evictions"],
+        }
+
+
+access_token_cache = AccessTokenCache(max_size=settings.ACCESS_TOKEN_CACHE_SIZE)
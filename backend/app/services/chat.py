@@ -1,4 +1,5 @@
 import logging
+from collections import Counter
 from sqlalchemy.exc import IntegrityError
 
 from app.utils.unit_of_work import IUnitOfWork
@@ -6,12 +7,32 @@ from app.app.schemas.users import UserSchemaRegister, UserSchemaFromBd
 from app.app.schemas.chats import (ChatCreateSchema, ChatParticipantSchema,
                                    ChatSchemaFromBd, ChatPrivateCreateSchema, ChatParticipantSchemaForAddUser,
                                    ChatSchemaFromBdWithLastMessage)
-from app.app.schemas.message import MessageFromDbSchema
+from app.app.schemas.message import MessageFromDbSchema, MessageSearchResultSchema
+from app.app.schemas.response import Paginator
 from app.db.models import ChatType, Message, Chat, ChatParticipant
+from app.repositories import ChatLoad
 from app.exceptions import NotAuthenticated, InaccessibleEntity, UnprocessableEntity, EntityError, DuplicateEntity, UnfoundEntity
+from app.utils.cursor import encode_cursor, decode_cursor
+from app.utils.search import build_tsquery
+from app.utils.membership_cache import membership_cache, invalidate_members
+from app.core.config import settings
+from app.services.read_watermarks import read_watermarks
 
 logger = logging.getLogger(__name__)
 
+# Итоги сверки поиска читателей по read_range со старым условием (READ_RANGE_VERIFY)
+read_range_verify: Counter = Counter()
+
+
+def _verify_read_range(query: str, rows: list, legacy_rows: list, **context) -> None:
+    read_range_verify["checks"] += 1
+    if sorted(map(tuple, rows)) != sorted(map(tuple, legacy_rows)):
+        read_range_verify["mismatches"] += 1
+        logger.warning(
+            f"READ_RANGE_VERIFY: {query} {context} расходится со старым запросом: "
+            f"read_range={len(rows)} строк, from_id/to_id={len(legacy_rows)} строк"
+        )
+
 class ChatService:
     def __init__(self, uow: IUnitOfWork):
         self.uow = uow
@@ -74,11 +95,13 @@ class ChatService:
             try:
                 chat_participant = await uow.chat_participant.add_one(info_for_add)
                 chat_participant_for_return = ChatParticipantSchema.model_validate(chat_participant)
+                await uow.chat_participant.refresh_unread_count(chat_id=chat_id, user_id=chat_participant.user_id)
                 await uow.commit()
             except IntegrityError:
                 raise DuplicateEntity(
                     detail="Пользователь уже состоит в чате"
                 )
+            await invalidate_members(chat_id)
             return chat_participant_for_return
 
     async def delete_user_from_chat(self, user_id: int, chat_id: int):
@@ -88,10 +111,22 @@ class ChatService:
 
             await uow.chat_participant.delete(chat_participant.id)
             await uow.commit()
+            await invalidate_members(chat_id)
 
             user = await uow.user.get_one_by(id=user_id)
             return user.username
 
+    async def reconcile_counters(self, chat_id: int | None = None) -> dict:
+        """
+        Пересобирает денормализованные счётчики (chats.message_count, указатель на последнее
+        сообщение, chat_participants.unread_count) по таблице messages.
+        """
+        async with self.uow as uow:
+            chats = await uow.chat.reconcile_counters(chat_id=chat_id)
+            participants = await uow.chat_participant.refresh_unread_count(chat_id=chat_id)
+            await uow.commit()
+            return {"chats": chats, "participants": participants}
+
     async def get_chat(self, chat_id: int, user_id: int):
         async with self.uow as uow:
             return await self._get_chat(chat_id, user_id, uow)
@@ -126,6 +161,7 @@ class ChatService:
             )
             if participant and to_id > participant.last_read_message_id:
                 participant.last_read_message_id = to_id
+                await uow.chat_participant.refresh_unread_count(chat_id=chat_id, user_id=user_id)
             await uow.commit()
 
     async def get_message_readers(
@@ -152,26 +188,77 @@ class ChatService:
                 message_id=message_id,
                 exclude_user_id=sender_id,
             )
+            if settings.READ_RANGE_VERIFY:
+                legacy_rows = await uow.message_read_batch.get_readers_for_message(
+                    chat_id=message.chat_id,
+                    message_id=message_id,
+                    exclude_user_id=sender_id,
+                    legacy=True,
+                )
+                _verify_read_range("get_readers_for_message", rows, legacy_rows, message_id=message_id)
 
-            result = []
-            for row in rows:
-                user = await uow.user.get_one(pk=row.user_id)
-                result.append({
+            return [
+                {
                     "user_id": row.user_id,
-                    "username": user.username if user else None,
-                    "email": user.email if user else None,
+                    "username": row.username,
+                    "email": row.email,
+                    "read_at": row.read_at,
+                }
+                for row in rows
+            ]
+
+    async def get_readers_for_range(
+            self,
+            chat_id: int,
+            from_id: int,
+            to_id: int,
+            requester_id: int,
+    ) -> list[dict]:
+        """
+        Читатели для всех сообщений чата с id из [from_id, to_id], чтобы отрисовать
+        отметки о прочтении для целой страницы одним запросом.
+        Возвращает [{"message_id", "readers": [...]}] по возрастанию message_id.
+        """
+        if from_id > to_id:
+            raise UnprocessableEntity(detail="from_id не может быть больше to_id")
+        if requester_id not in await self.get_member_ids(chat_id):
+            raise InaccessibleEntity(detail="Пользователь не состоит в чате")
+
+        async with self.uow as uow:
+            rows = await uow.message_read_batch.get_readers_for_range(
+                chat_id=chat_id,
+                from_id=from_id,
+                to_id=to_id,
+            )
+            if settings.READ_RANGE_VERIFY:
+                legacy_rows = await uow.message_read_batch.get_readers_for_range(
+                    chat_id=chat_id,
+                    from_id=from_id,
+                    to_id=to_id,
+                    legacy=True,
+                )
+                _verify_read_range("get_readers_for_range", rows, legacy_rows,
+                                   chat_id=chat_id, from_id=from_id, to_id=to_id)
+
+        result = []
+        for row in rows:
+            if not result or result[-1]["message_id"] != row.message_id:
+                result.append({"message_id": row.message_id, "readers": []})
+            if row.user_id is not None:
+                result[-1]["readers"].append({
+                    "user_id": row.user_id,
+                    "username": row.username,
+                    "email": row.email,
                     "read_at": row.read_at,
                 })
-            return result
+        return result
 
     async def check_user_in_chat(self, chat_id: int, user_id: int, return_role:bool=False):
         async with self.uow as uow:
-            chat = await uow.chat.get_one(pk=chat_id)
-            if not chat:
+            if not await uow.chat.exists(chat_id):
                 raise UnfoundEntity(detail="Чат не найден")
 
-            user = await uow.user.get_one_by(id=user_id)
-            if not user:
+            if not await uow.user.exists(user_id):
                 raise UnfoundEntity(detail="Такого пользователя нет")
 
             participant = await uow.chat_participant.get_one_by(chat_id=chat_id, user_id=user_id)
@@ -185,8 +272,7 @@ class ChatService:
         Переиспользуется в методах get_chat и add_user_in_chat,
         сделано чтоб при вызове внутри add_user_in_chat не дублировался uow из-за контекстного менеджера
         """
-        chat = await uow.chat.get_one(pk=chat_id)
-        if not chat:
+        if not await uow.chat.exists(chat_id):
             raise UnfoundEntity(detail="Чат не найден")
 
         chat_for_user = await uow.chat.get_one_for_user(chat_id, user_id)
@@ -207,50 +293,33 @@ class ChatService:
 
     async def get_all_for_user_with_last_message(self, user_id: int):
         async with self.uow as uow:
-            user = await uow.user.get_one_by(id=user_id)
-            if not user:
+            if not await uow.user.exists(user_id):
                 raise UnfoundEntity(detail="Такого пользователя нет")
 
-            chats = await uow.chat.get_all_for_user(user_id)
+            rows = await uow.chat.get_sidebar_for_user(user_id)
             chats_for_return = []
-            for chat in chats:
-                last_message = await uow.message.get_last_for_chat(chat.id)
-                chat_participant = await uow.chat_participant.get_one_by(chat_id=chat.id, user_id=user_id)
-                last_read_message_id = chat_participant.last_read_message_id
-                max_other_read_id = await uow.chat_participant.get_max_other_read_id(
-                    chat_id=chat.id, user_id=user_id)
-
-                chat = ChatSchemaFromBd.model_validate(chat)
-                chat = chat.model_dump()
+            for chat, last_read_message_id, last_message, max_other_read_id, cnt_unread_messages in rows:
+                chat = ChatSchemaFromBd.model_validate(chat).model_dump()
                 chat['last_message'] = last_message
                 chat['last_read_message_id'] = last_read_message_id
                 chat['max_other_read_id'] = max_other_read_id
-                cnt_unread_messages = await uow.message.get_unread_count(
-                            last_read_message_id=chat_participant.last_read_message_id,
-                            user_id=chat_participant.user_id,
-                            chat_id=chat_participant.chat_id,)
                 chat['cnt_unread_messages'] = int(cnt_unread_messages)
 
                 chats_for_return.append(ChatSchemaFromBdWithLastMessage.model_validate(chat))
-
-            def chat_sort_key(chat):
-                if chat.last_message:
-                    return max(chat.created_at, chat.last_message.created_at)
-                return chat.created_at
-
-            chats_for_return.sort(key=chat_sort_key, reverse=True)
             return chats_for_return
 
     async def update_last_message_read(self, user_id: int, message_id: int) -> None:
+        """
+        Отмечает, что пользователь прочитал чат до message_id. Запись в chat_participants
+        и событие автору сообщения откладываются и схлопываются (read_watermarks).
+        """
         async with self.uow as uow:
-            message = await uow.message.get_one(pk=message_id)
-            if not message:
-                raise UnfoundEntity(detail="Такое сообщение не найдено")
-            chat_participant = await uow.chat_participant.get_one_by(chat_id=message.chat_id, user_id=user_id)
-            if not chat_participant:
-                raise UnfoundEntity(detail = "Пользователь не состоит в этом чате")
-            chat_participant.last_read_message_id = message_id
-            await uow.commit()
+            message = await uow.message.get_chat_and_sender(message_id)
+        if not message:
+            raise UnfoundEntity(detail="Такое сообщение не найдено")
+        if user_id not in await self.get_member_ids(message.chat_id):
+            raise UnfoundEntity(detail = "Пользователь не состоит в этом чате")
+        await read_watermarks.mark(user_id, message.chat_id, message_id, message.sender_id)
 
     async def get_all_message_for_chat(self, *, chat_id: int):
         chat = await self.get_one_by(id=chat_id)
@@ -278,19 +347,131 @@ class ChatService:
             messages_for_return = [MessageFromDbSchema.model_validate(message) for message in messages]
             return messages_for_return
 
+    async def get_message_window_for_member(
+            self,
+            *,
+            chat_id: int,
+            member_id: int,
+            limit: int,
+            cursor: str | None = None,
+            before_id: int | None = None,
+            after_id: int | None = None,
+            around_id: int | None = None,
+    ) -> tuple[list[MessageFromDbSchema], Paginator]:
+        """
+        Окно истории чата по keyset-курсору вместо всей истории.
+        Курсор из paginator предыдущего ответа взаимоисключающ с before_id/after_id/around_id.
+        """
+        anchors = {"before_id": before_id, "after_id": after_id, "around_id": around_id}
+        if cursor is not None:
+            if any(value is not None for value in anchors.values()):
+                raise UnprocessableEntity(detail="Курсор нельзя передавать вместе с before_id/after_id/around_id")
+            decoded = decode_cursor(cursor)
+            anchors = {key: decoded.get(key) for key in anchors}
+            if not all(value is None or isinstance(value, int) for value in anchors.values()):
+                raise UnprocessableEntity(detail="Неверный курсор")
+        if sum(value is not None for value in anchors.values()) > 1:
+            raise UnprocessableEntity(detail="Можно передать только один из before_id, after_id, around_id")
+
+        chat = await self.get_one_by(id=chat_id)
+        if not chat:
+            raise UnfoundEntity(detail="Чат не найден")
+
+        user_in_chat = await self.check_user_in_chat(user_id=member_id, chat_id=chat_id)
+        if not user_in_chat:
+            raise InaccessibleEntity(detail="Пользователь не состоит в чате")
+
+        async with self.uow as uow:
+            messages, has_prev, has_next = await uow.message.get_window_for_chat(chat_id, limit=limit, **anchors)
+            messages_for_return = [MessageFromDbSchema.model_validate(message) for message in messages]
+
+        has_prev = has_prev and bool(messages_for_return)
+        has_next = has_next and bool(messages_for_return)
+        paginator = Paginator(
+            total=None,
+            has_prev=has_prev,
+            has_next=has_next,
+            prev_cursor=encode_cursor({"before_id": messages_for_return[0].id}) if has_prev else None,
+            next_cursor=encode_cursor({"after_id": messages_for_return[-1].id}) if has_next else None,
+        )
+        return messages_for_return, paginator
+
+    async def search_messages_for_member(
+            self,
+            *,
+            member_id: int,
+            q: str,
+            chat_id: int | None = None,
+            limit: int,
+            cursor: str | None = None,
+    ) -> tuple[list[MessageSearchResultSchema], Paginator]:
+        """
+        Поиск сообщений по тексту: в одном чате или во всех чатах участника.
+        Результаты от самых релевантных, следующая страница — по next_cursor из paginator.
+        Ищется только среди MESSAGE_SEARCH_MAX_CANDIDATES самых новых совпадений;
+        paginator.truncated — совпадений было больше.
+        """
+        query = build_tsquery(q)
+        after = None
+        if cursor is not None:
+            decoded = decode_cursor(cursor)
+            rank, last_id = decoded.get("rank"), decoded.get("id")
+            if not isinstance(rank, (int, float)) or not isinstance(last_id, int):
+                raise UnprocessableEntity(detail="Неверный курсор")
+            after = (float(rank), last_id)
+
+        if chat_id is not None:
+            chat = await self.get_one_by(id=chat_id)
+            if not chat:
+                raise UnfoundEntity(detail="Чат не найден")
+            user_in_chat = await self.check_user_in_chat(user_id=member_id, chat_id=chat_id)
+            if not user_in_chat:
+                raise InaccessibleEntity(detail="Пользователь не состоит в чате")
+
+        async with self.uow as uow:
+            rows, has_next, truncated = await uow.message.search(
+                query, user_id=member_id, chat_id=chat_id, limit=limit, after=after,
+                max_candidates=settings.MESSAGE_SEARCH_MAX_CANDIDATES,
+            )
+            results = []
+            for message, rank, snippet in rows:
+                result = MessageSearchResultSchema.model_validate(message)
+                result.rank = rank
+                result.snippet = snippet
+                results.append(result)
+
+        paginator = Paginator(
+            total=None,
+            has_prev=cursor is not None,
+            has_next=has_next,
+            next_cursor=encode_cursor({"rank": results[-1].rank, "id": results[-1].id}) if has_next else None,
+            truncated=truncated,
+        )
+        return results, paginator
+
     async def get_members(self, chat_id: int, *, return_id: bool = False):
+        if return_id:
+            return await self.get_member_ids(chat_id)
         chat = await self.get_one_by(id=chat_id)
         if not chat:
             raise UnfoundEntity(detail="Чат не найден")
         async with self.uow as uow:
             users = await uow.user.get_all_members_for_chat(chat_id=chat_id)
-
-            if return_id:
-                id_for_return = [user.id for user in users]
-                return id_for_return
             users_for_return = [UserSchemaFromBd.model_validate(user) for user in users]
             return users_for_return
 
+    async def get_member_ids(self, chat_id: int) -> frozenset[int]:
+        """id участников чата для рассылки, через кэш состава чатов."""
+        members_id = membership_cache.get(chat_id)
+        if members_id is not None:
+            return members_id
+        generation = membership_cache.generation
+        async with self.uow as uow:
+            if not await uow.chat.exists(chat_id):
+                raise UnfoundEntity(detail="Чат не найден")
+            members_id = await uow.chat_participant.get_member_ids(chat_id)
+        return membership_cache.set(chat_id, members_id, generation)
+
     async def get_members_for_member(self, chat_id: int, member_id: int):
         user_in_chat = await self.check_user_in_chat(user_id=member_id, chat_id=chat_id)
         if not user_in_chat:
@@ -307,18 +488,17 @@ class ChatService:
         if not participant:
             raise InaccessibleEntity(detail="Вы не состоите в этом чате")
         async with self.uow as uow:
-            chat_participants = await uow.chat_participant.get_many_by(chat_id=chat_id)
+            chat = await uow.chat.get_one(pk=chat_id, load=ChatLoad.WITH_PARTICIPANTS)
             result = []
-            for cp in chat_participants:
-                user = await uow.user.get_one(pk=cp.user_id)
-                if user:
-                    role_val = cp.role.value if hasattr(cp.role, "value") else str(cp.role)
-                    result.append({
-                        "id":       user.id,
-                        "username": user.username,
-                        "email":    user.email,
-                        "role":     role_val,
-                    })
+            for cp in chat.participants:
+                user = cp.user
+                role_val = cp.role.value if hasattr(cp.role, "value") else str(cp.role)
+                result.append({
+                    "id":       user.id,
+                    "username": user.username,
+                    "email":    user.email,
+                    "role":     role_val,
+                })
             return result
 
     async def get_my_role(self, chat_id: int, user_id: int) -> str:
@@ -361,7 +541,7 @@ class ChatService:
         Используется для отправки нового чата по WebSocket когда пользователя добавляют.
         """
         async with self.uow as uow:
-            chat = await uow.chat.get_one(pk=chat_id)
+            chat = await uow.chat.get_one(pk=chat_id, load=ChatLoad.WITH_LAST_MESSAGE)
             if not chat:
                 return None
 
@@ -369,18 +549,13 @@ class ChatService:
             if not chat_participant:
                 return None
 
-            last_message = await uow.message.get_last_for_chat(chat_id)
+            last_message = chat.last_message
             last_read_message_id = chat_participant.last_read_message_id
 
             chat_dict = ChatSchemaFromBd.model_validate(chat).model_dump()
             chat_dict['last_message'] = last_message
             chat_dict['last_read_message_id'] = last_read_message_id
             chat_dict['max_other_read_id'] = 0
-            cnt_unread = await uow.message.get_unread_count(
-                last_read_message_id=last_read_message_id,
-                user_id=user_id,
-                chat_id=chat_id,
-            )
-            chat_dict['cnt_unread_messages'] = int(cnt_unread)
+            chat_dict['cnt_unread_messages'] = int(chat_participant.unread_count)
 
             return ChatSchemaFromBdWithLastMessage.model_validate(chat_dict)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import BinaryIO
+from typing import AsyncIterable
 from uuid import uuid4
 from pathlib import Path
 from datetime import datetime
@@ -44,23 +44,40 @@ class FileService:
     def _create_url(self, file_id: int) -> str:
         return f"{settings.API_BASE_URL}/files/{file_id}/download/"
 
-    async def create(
+    async def store(
             self,
-            stream: BinaryIO,
-            message: schemas.MessageFromDbSchema | None = None,
+            stream: AsyncIterable[bytes],
             chat_id: int | None = None,
             filename: str | None = None,
-    ) -> schemas.FileGettingFromDbSchema:
+            max_size: int | None = None,
+    ) -> dict:
+        """
+        Записывает файл в хранилище за один проход по байтам, строку в БД не создаёт.
+        Возвращает {"path", "filename", "size", "sha256"} для create().
+        """
         path = self._create_path(
             filename=filename,
             chat_id=chat_id,
         )
+        saved = await self.storage.save(
+            stream=stream,
+            path=path,
+            max_size=max_size,
+        )
+        return {"path": str(path), "filename": filename, "size": saved["size"], "sha256": saved["sha256"]}
+
+    async def create(
+            self,
+            stored: dict,
+            message: schemas.MessageFromDbSchema | None = None,
+    ) -> schemas.FileGettingFromDbSchema:
+        """Создаёт строку для уже записанного файла; если строка не закоммитится, файл удаляется."""
         async with self.uow as uow:
+            uow.after_rollback(self.discard, stored)
             file_schema = schemas.FileCreateSchema.model_validate({
                 "message_id": message.id if message else None,
-                'path': str(path),
                 "url": "Null",
-                'filename': filename,
+                **stored,
             })
             file = await uow.file.add_one(file_schema.model_dump())
             url = self._create_url(file_id=file.id)
@@ -68,14 +85,11 @@ class FileService:
             file_for_return = schemas.FileGettingFromDbSchema.model_validate(file)
             await uow.commit()
 
-            await self.storage.save(
-                path=path,
-                stream=stream,
-                filename=filename,
-                chat_id=chat_id,
-            )
+        return file_for_return
 
-            return file_for_return
+    def discard(self, stored: dict) -> None:
+        """Удаляет файл, записанный store(), если строка для него так и не понадобилась."""
+        self.storage.delete(stored["path"])
 
     async def delete(
             self,
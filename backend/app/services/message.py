@@ -5,6 +5,8 @@ from app.utils.unit_of_work import IUnitOfWork
 from app.app.schemas.message import MessageCreateSchema, MessageFromDbSchema
 from app.exceptions import InaccessibleEntity, UnfoundEntity
 from app.utils.websocket import manager
+from app.core.config import settings
+from .message_writer import message_writer
 
 logger = logging.getLogger(__name__)
 
@@ -26,10 +28,11 @@ class MessageService:
 
             return message_for_return
 
-    async def create_message(self, *, chat_id: int, sender_id: int | None = None, data: str | None = None):
+    async def create_message(self, *, chat_id: int, sender_id: int | None = None, data: str | None = None,
+                             commit: bool = True):
+        """commit=False — сообщение остаётся в транзакции вызывающего (например, вместе со строкой файла)."""
         async with self.uow as uow:
-            chat = await uow.chat.get_one(pk=chat_id)
-            if not chat:
+            if not await uow.chat.exists(chat_id):
                 raise UnfoundEntity(detail="Чат не найден")
 
             if sender_id:
@@ -46,10 +49,30 @@ class MessageService:
 
             message = await uow.message.add_one({"chat_id":chat_id, 'sender_id':sender_id, 'content':data, 'file':None})
             message_for_return = MessageFromDbSchema.model_validate(message)
-            await uow.commit()
+            await uow.chat.register_message(chat_id, message.id, message.created_at)
+            if sender_id:
+                await uow.chat_participant.increment_unread(chat_id, sender_id)
+            if commit:
+                await uow.commit()
 
             return message_for_return
 
+    async def create_message_for_member(self, *, chat_id: int, sender_id: int, data: str | None):
+        """
+        Быстрый путь для сообщений из WebSocket: отправитель уже аутентифицирован, поэтому
+        проверка членства, вставка и счётчики — один запрос. Возвращает (id, created_at, updated_at).
+        При MESSAGE_GROUP_COMMIT сообщение уходит в общую пачку message_writer.
+        """
+        if settings.MESSAGE_GROUP_COMMIT:
+            return await message_writer.submit(chat_id, sender_id, data)
+        async with self.uow as uow:
+            message = await uow.message.insert_for_member(chat_id, sender_id, data)
+            if message is not None:
+                await uow.commit()
+        if message is None:
+            raise InaccessibleEntity(detail="Пользователь не состоит в чате")
+        return message
+
     async def update(self, pk: int, data: schemas.MessageUpdateSchema):
         async with self.uow as uow:
             await uow.message.update(pk, data)
@@ -58,4 +81,23 @@ class MessageService:
             message_for_return = MessageFromDbSchema.model_validate(message)
             await uow.commit()
 
-            return message_for_return
\ No newline at end of file
+            return message_for_return
+
+    async def delete(self, pk: int):
+        """Мягкое удаление сообщения вместе с обновлением счётчиков чата."""
+        async with self.uow as uow:
+            message = await uow.message.get_one(pk)
+            if not message:
+                raise UnfoundEntity(detail="Сообщение не найдено")
+
+            if not message.is_deleted:
+                await uow.message.update(pk, {"is_deleted": True})
+                await uow.chat.unregister_message(message.chat_id, pk)
+                if message.sender_id:
+                    await uow.chat_participant.decrement_unread(message.chat_id, pk, message.sender_id)
+            message = await uow.message.get_one(pk)
+
+            message_for_return = MessageFromDbSchema.model_validate(message)
+            await uow.commit()
+
+            return message_for_return
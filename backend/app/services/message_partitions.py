@@ -0,0 +1,139 @@
+import asyncio
+import logging
+from collections import Counter
+
+from app.core.config import settings
+from app.db.partitions import MESSAGES_OVERFLOW_PARTITION
+from app.utils.unit_of_work import UnitOfWork
+
+logger = logging.getLogger(__name__)
+
+
+class MessagePartitionMaintainer:
+    """
+    Фоновое создание секций messages: держит впереди текущего максимального id
+    не меньше ahead пустых секций по size id, чтобы новые сообщения не попадали
+    в messages_overflow. Проверка при старте и затем раз в interval секунд; воркеры
+    не мешают друг другу — проход делает тот, кто взял advisory-блокировку.
+    Новые секции встают между последней секцией и messages_overflow, поэтому пустая
+    messages_overflow на время прохода удаляется и создаётся заново выше них.
+    Если создание секций отстало и в messages_overflow уже есть строки, она отсоединяется
+    и подключается обычной секцией [её начало, max(id) + 1), а новые секции идут выше.
+    PostgreSQL не отсоединяет секцию, на строки которой ссылаются внешние ключи
+    (chats.last_message_id почти всегда ссылается на последние сообщения), поэтому
+    на время прохода ключи на messages снимаются и возвращаются как NOT VALID;
+    проверка старых строк (VALIDATE CONSTRAINT) идёт следующей транзакцией и не держит
+    эксклюзивную блокировку messages.
+    """
+
+    def __init__(self, interval: float, size: int, ahead: int, uow_factory=UnitOfWork):
+        self.interval = interval
+        self.size = size
+        self.ahead = ahead
+        self.uow_factory = uow_factory
+        self.counters: Counter = Counter()
+        self.partitions = 0
+        self.upper_bound: int | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.counters["errors"] += 1
+                logger.exception(e)
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> list[tuple[int, int]]:
+        """Создаёт недостающие секции. Возвращает созданные диапазоны [start, end)."""
+        created = []
+        promoted = None
+        fks = []
+        async with self.uow_factory() as uow:
+            if not await uow.message.try_lock_partitions():
+                return created
+            partitions = await uow.message.get_partitions()
+            max_id = await uow.message.get_max_id()
+            overflow_start = next(
+                (start for name, start, _ in partitions if name == MESSAGES_OVERFLOW_PARTITION), None
+            )
+            start = overflow_start if overflow_start is not None else max(
+                (end for _, _, end in partitions if end is not None), default=0
+            )
+            # messages_overflow — верхний диапазон: если в ней есть строки, максимальный id лежит в ней
+            overflow_max_id = max_id if overflow_start is not None and max_id >= overflow_start else None
+            if start <= max_id + self.ahead * self.size:
+                await uow.message.lock_for_partitioning()
+                if overflow_max_id is not None:
+                    fks = await uow.message.get_referencing_fks()
+                    for table, name, _ in fks:
+                        await uow.message.drop_fk(table, name)
+                if overflow_start is not None:
+                    await uow.message.detach_overflow()
+                if overflow_max_id is not None:
+                    await uow.message.attach_overflow(overflow_start, overflow_max_id + 1)
+                    promoted = (overflow_start, overflow_max_id + 1)
+                    start = overflow_max_id + 1
+                elif overflow_start is not None:
+                    await uow.message.drop_overflow()
+                while start <= max_id + self.ahead * self.size:
+                    await uow.message.create_partition(start, start + self.size)
+                    created.append((start, start + self.size))
+                    start += self.size
+                await uow.message.create_overflow(start)
+                for table, name, definition in fks:
+                    await uow.message.add_fk(table, name, definition)
+                await uow.commit()
+
+        if fks:
+            async with self.uow_factory() as uow:
+                for table, name, _ in fks:
+                    await uow.message.validate_fk(table, name)
+                await uow.commit()
+
+        self.counters["runs"] += 1
+        self.counters["created"] += len(created)
+        self.partitions = len(partitions) + len(created)
+        self.upper_bound = start
+        if promoted:
+            self.counters["promoted"] += 1
+            logger.warning(
+                f"Секции messages отстали: {MESSAGES_OVERFLOW_PARTITION} с сообщениями "
+                f"подключена секцией [{promoted[0]}, {promoted[1]})"
+            )
+        if created:
+            logger.info(f"Созданы секции messages: {', '.join(f'[{s}, {e})' for s, e in created)}")
+        return created
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.interval > 0,
+            "runs": self.counters["runs"],
+            "errors": self.counters["errors"],
+            "created": self.counters["created"],
+            "promoted": self.counters["promoted"],
+            "partitions": self.partitions,
+            "upper_bound": self.upper_bound,
+        }
+
+
+message_partition_maintainer = MessagePartitionMaintainer(
+    interval=settings.MESSAGES_PARTITION_CHECK_INTERVAL,
+    size=settings.MESSAGES_PARTITION_SIZE,
+    ahead=settings.MESSAGES_PARTITIONS_AHEAD,
+)
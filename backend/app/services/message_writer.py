@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from collections import Counter
+
+from app.core.config import settings
+from app.exceptions import InaccessibleEntity
+from app.utils.unit_of_work import UnitOfWork
+
+logger = logging.getLogger(__name__)
+
+
+class MessageGroupWriter:
+    """
+    Group commit для сообщений из WebSocket: копит сообщения со всех сокетов до max_delay_ms
+    или max_batch штук и вставляет их одним запросом (MessageRepository.insert_many_for_members).
+    Каждый отправитель ждёт свой future и получает (id, created_at, updated_at) или исключение.
+    Пачки пишутся по одной: сообщения, пришедшие во время записи, ждут в очереди и уходят
+    следующей пачкой сразу после неё, без max_delay_ms.
+    """
+
+    def __init__(self, max_delay_ms: float, max_batch: int, uow_factory=UnitOfWork):
+        self.max_delay = max_delay_ms / 1000
+        self.max_batch = max_batch
+        self.uow_factory = uow_factory
+        self.counters: Counter = Counter()
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    async def submit(self, chat_id: int, sender_id: int, content: str | None):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(((chat_id, sender_id, content), future))
+        return await future
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        queued = []
+        while not self._queue.empty():
+            queued.append(self._queue.get_nowait())
+        self._fail_stopped(queued)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = loop.time() + self.max_delay
+                while len(batch) < self.max_batch:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                await self._flush(batch)
+            finally:
+                # После _flush все future уже завершены; если же stop() отменил задачу посреди
+                # сбора или записи, отправители текущей пачки не должны ждать вечно
+                self._fail_stopped(batch)
+
+    @staticmethod
+    def _fail_stopped(batch: list):
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(RuntimeError("Запись сообщений остановлена"))
+
+    async def _flush(self, batch: list):
+        try:
+            async with self.uow_factory() as uow:
+                messages = await uow.message.insert_many_for_members([item for item, _ in batch])
+                await uow.commit()
+        except Exception as e:
+            logger.exception(e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.counters["batches"] += 1
+        self.counters["messages"] += len(messages)
+        self.counters["max_batch"] = max(self.counters["max_batch"], len(batch))
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            message = messages.get(index)
+            if message is None:
+                future.set_exception(InaccessibleEntity(detail="Пользователь не состоит в чате"))
+            else:
+                future.set_result(message)
+
+    def stats(self) -> dict:
+        batches = self.counters["batches"]
+        return {
+            "enabled": settings.MESSAGE_GROUP_COMMIT,
+            "batches": batches,
+            "messages": self.counters["messages"],
+            "avg_batch": round(self.counters["messages"] / batches, 2) if batches else None,
+            "max_batch": self.counters["max_batch"],
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+
+message_writer = MessageGroupWriter(
+    max_delay_ms=settings.MESSAGE_GROUP_COMMIT_DELAY_MS,
+    max_batch=settings.MESSAGE_GROUP_COMMIT_MAX_BATCH,
+)
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from collections import Counter
+
+from app.core.config import settings
+from app.utils.unit_of_work import UnitOfWork
+
+logger = logging.getLogger(__name__)
+
+
+class ReadBatchCompactor:
+    """
+    Фоновое сжатие message_read_batches: раз в interval секунд сводит диапазоны
+    прочтения тех пар (пользователь, чат), у которых появились новые батчи (merge_read_ranges).
+    Работает порциями по batch_pairs пар и помнит последний обработанный id батча,
+    поэтому каждый проход трогает только изменившиеся пары. Каждая пара сжимается
+    в своей короткой транзакции. Проход делает один воркер — тот, кто взял advisory-блокировку
+    (её держит отдельная транзакция до конца прохода), остальные его пропускают.
+    Отметка last_id живёт в памяти: после рестарта первый проход заново просматривает
+    все пары, дальше снова только изменившиеся.
+    """
+
+    def __init__(self, interval: float, batch_pairs: int, uow_factory=UnitOfWork):
+        self.interval = interval
+        self.batch_pairs = batch_pairs
+        self.uow_factory = uow_factory
+        self.last_id = 0
+        self.counters: Counter = Counter()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.exception(e)
+
+    async def run_once(self) -> dict:
+        """Сжимает все пары, изменившиеся с прошлого прохода. Возвращает итог прохода."""
+        result = Counter()
+        async with self.uow_factory() as lock_uow:
+            if not await lock_uow.message_read_batch.try_lock_compaction():
+                self.counters["skipped"] += 1
+                return {"pairs": 0, "rows_before": 0, "rows_after": 0}
+            while True:
+                async with self.uow_factory() as uow:
+                    pairs = await uow.message_read_batch.get_pairs_changed_since(self.last_id, self.batch_pairs)
+                for user_id, chat_id, max_id in pairs:
+                    async with self.uow_factory() as uow:
+                        before, after = await uow.message_read_batch.compact_pair(user_id, chat_id)
+                        await uow.commit()
+                    result["pairs"] += 1
+                    result["rows_before"] += before
+                    result["rows_after"] += after
+                    self.last_id = max_id
+                if len(pairs) < self.batch_pairs:
+                    break
+
+        self.counters["runs"] += 1
+        self.counters.update(result)
+        if result["rows_before"] != result["rows_after"]:
+            logger.info(
+                f"Сжатие батчей прочтения: пар {result['pairs']}, "
+                f"строк {result['rows_before']} -> {result['rows_after']}"
+            )
+        return {"pairs": result["pairs"], "rows_before": result["rows_before"], "rows_after": result["rows_after"]}
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.interval > 0,
+            "runs": self.counters["runs"],
+            "skipped": self.counters["skipped"],
+            "pairs": self.counters["pairs"],
+            "rows_removed": self.counters["rows_before"] - self.counters["rows_after"],
+            "last_id": self.last_id,
+        }
+
+
+read_batch_compactor = ReadBatchCompactor(
+    interval=settings.READ_BATCH_COMPACT_INTERVAL,
+    batch_pairs=settings.READ_BATCH_COMPACT_PAIRS,
+)
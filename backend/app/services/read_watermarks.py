@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from collections import Counter, defaultdict
+
+from app.core.config import settings
+from app.utils import manager
+from app.utils.unit_of_work import UnitOfWork
+from app.utils.read_replicas import mark_writes
+from app.utils.websocket import READ_MESSAGE
+
+logger = logging.getLogger(__name__)
+
+
+class ReadWatermarkBuffer:
+    """
+    Write-behind для last_read_message_id. При быстрой прокрутке клиент отмечает прочтение
+    по много раз в секунду; в памяти хранится только максимальный водяной знак на пару
+    (пользователь, чат), а раз в flush_ms все накопленные пары пишутся одним UPDATE
+    (ChatParticipantRepository.advance_read_watermarks). Откат назад отбрасывается и здесь,
+    и в самом UPDATE. Событие «прочитано» (type 4) уходит после записи, одно на
+    (чат, сообщение), а не на каждый вызов.
+    flush_ms <= 0 — писать сразу при каждом вызове.
+    Если воркер упадёт, теряются отметки не больше чем за flush_ms.
+    """
+
+    def __init__(self, flush_ms: float, uow_factory=UnitOfWork):
+        self.flush_interval = flush_ms / 1000
+        self.uow_factory = uow_factory
+        self.counters: Counter = Counter()
+        # (user_id, chat_id) -> (message_id, sender_id)
+        self._pending: dict[tuple[int, int], tuple[int, int | None]] = {}
+        self._task: asyncio.Task | None = None
+
+    async def mark(self, user_id: int, chat_id: int, message_id: int, sender_id: int | None) -> bool:
+        """Запоминает отметку о прочтении. False — если она не новее уже известной."""
+        key = (user_id, chat_id)
+        pending = self._pending.get(key)
+        if pending is not None and pending[0] >= message_id:
+            self.counters["regressions"] += 1
+            return False
+        self.counters["marked"] += 1
+        if pending is not None:
+            self.counters["coalesced"] += 1
+        self._pending[key] = (message_id, sender_id)
+
+        if self.flush_interval <= 0:
+            await self.flush()
+        elif self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return True
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        items = sorted(
+            ((user_id, chat_id, message_id) for (user_id, chat_id), (message_id, _) in pending.items()),
+            key=lambda item: (item[1], item[0]),
+        )
+        try:
+            async with self.uow_factory() as uow:
+                advanced = await uow.chat_participant.advance_read_watermarks(items)
+                await uow.commit()
+        except Exception as e:
+            logger.exception(e)
+            self.counters["failed_flushes"] += 1
+            # Возвращаем пачку в буфер, не затирая более свежие отметки
+            for key, value in pending.items():
+                current = self._pending.get(key)
+                if current is None or current[0] < value[0]:
+                    self._pending[key] = value
+            return
+
+        await mark_writes({user_id for user_id, _, _ in advanced})
+        self.counters["flushes"] += 1
+        self.counters["rows_updated"] += len(advanced)
+        self.counters["stale"] += len(items) - len(advanced)
+
+        # Автору важен только факт «сообщение прочитано» — одно событие на (чат, сообщение)
+        receivers = defaultdict(set)
+        for user_id, chat_id, message_id in advanced:
+            sender_id = pending[(user_id, chat_id)][1]
+            if sender_id is not None and sender_id != user_id:
+                receivers[(chat_id, message_id)].add(sender_id)
+        for (chat_id, message_id), senders_id in receivers.items():
+            try:
+                await manager.broadcast(type_of_message=READ_MESSAGE, message=None, chat_id=chat_id,
+                                        receivers_id=list(senders_id), last_read_message_id=message_id)
+            except Exception as e:
+                logger.exception(e)
+        self.counters["broadcasts"] += len(receivers)
+
+    def stats(self) -> dict:
+        return {
+            "flush_ms": self.flush_interval * 1000,
+            "pending": len(self._pending),
+            "marked": self.counters["marked"],
+            "coalesced": self.counters["coalesced"],
+            "regressions": self.counters["regressions"],
+            "flushes": self.counters["flushes"],
+            "failed_flushes": self.counters["failed_flushes"],
+            "rows_updated": self.counters["rows_updated"],
+            "stale": self.counters["stale"],
+            "broadcasts": self.counters["broadcasts"],
+        }
+
+
+read_watermarks = ReadWatermarkBuffer(flush_ms=settings.READ_WATERMARK_FLUSH_MS)
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from collections import Counter
+
+from app.core.config import settings
+from app.utils.unit_of_work import UnitOfWork
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshTokenReaper:
+    """
+    Фоновое удаление refresh-токенов: раз в interval секунд удаляет истёкшие и отозванные.
+    Сессия, которая больше не обновлялась, иначе так и оставалась бы в таблице навсегда.
+    Удаляет порциями по batch_size строк, каждая порция в своей короткой транзакции,
+    параллельные воркеры берут разные строки (SKIP LOCKED).
+    """
+
+    def __init__(self, interval: float, batch_size: int, uow_factory=UnitOfWork):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.uow_factory = uow_factory
+        self.counters: Counter = Counter()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.exception(e)
+
+    async def run_once(self) -> dict:
+        """Удаляет все истёкшие и отозванные токены на момент прохода. Возвращает итог прохода."""
+        deleted = batches = 0
+        while True:
+            async with self.uow_factory() as uow:
+                count = await uow.user.delete_expired_refresh_tokens(self.batch_size)
+                await uow.commit()
+            batches += 1
+            deleted += count
+            if count < self.batch_size:
+                break
+
+        self.counters["runs"] += 1
+        self.counters["batches"] += batches
+        self.counters["deleted"] += deleted
+        if deleted:
+            logger.info(f"Удалено истёкших refresh-токенов: {deleted} ({batches} порций)")
+        return {"deleted": deleted, "batches": batches}
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.interval > 0,
+            "runs": self.counters["runs"],
+            "batches": self.counters["batches"],
+            "deleted": self.counters["deleted"],
+        }
+
+
+refresh_token_reaper = RefreshTokenReaper(
+    interval=settings.REFRESH_TOKEN_REAP_INTERVAL,
+    batch_size=settings.REFRESH_TOKEN_REAP_BATCH,
+)
@@ -1,8 +1,13 @@
 from app.utils.unit_of_work import IUnitOfWork
 from app.app.schemas.users import UserSchemaRegister, UserSchemaFromBd, UserSchemaPatch, UserSchemaFromBdStatistic
 from app.security import security
+from app.security.password_hasher import password_hasher
 from app.db.models import ChatType, UserRole
-from app.exceptions import InaccessibleEntity, UnfoundEntity, DuplicateEntity
+from app.exceptions import InaccessibleEntity, UnfoundEntity, DuplicateEntity, UnprocessableEntity, NotAuthenticated
+from app.utils.user_search_cache import user_search_cache, invalidate_user_search
+
+# Максимум результатов автодополнения; из кэша отдаётся любой limit до этого значения
+USER_SEARCH_MAX_LIMIT = 50
 
 
 class UserService:
@@ -15,6 +20,24 @@ class UserService:
             users_for_return = [UserSchemaFromBd.model_validate(user_from_db) for user_from_db in users_from_db]
             return users_for_return
 
+    async def search(self, query: str, limit: int, exclude_id: int | None = None):
+        """Автодополнение для выбора пользователей: не больше limit найденных, кроме exclude_id."""
+        query = query.strip().lower()
+        if not query:
+            raise UnprocessableEntity(detail="Пустой поисковый запрос")
+        cacheable = user_search_cache.is_cacheable(query)
+        users = user_search_cache.get(query) if cacheable else None
+        if users is None:
+            generation = user_search_cache.generation
+            # Для кэша берём с запасом, чтобы запись подходила под любой limit и любого exclude_id
+            fetch = USER_SEARCH_MAX_LIMIT + 1 if cacheable else limit + 1
+            async with self.uow as uow:
+                users_from_db = await uow.user.search(query, fetch)
+                users = [UserSchemaFromBd.model_validate(user_from_db) for user_from_db in users_from_db]
+            if cacheable:
+                user_search_cache.set(query, users, generation)
+        return [user for user in users if user.id != exclude_id][:limit]
+
     async def get_by_id(self, user_id: int):
         async with self.uow as uow:
             user_from_db = await uow.user.get_one(user_id)
@@ -60,26 +83,25 @@ class UserService:
                 raise DuplicateEntity(detail="Пользователь с таким номером телефона уже существует")
 
         user_data = user.model_dump()
+        password = security.validate_password(user_data['password'])
+        user_data['password'] = await password_hasher.hash(password)
         async with self.uow as uow:
-            password = user_data['password']
-            password = security.validate_password(password)
-            user_data['password'] = security.get_string_hash(password)
-
             user_data['phone'] = security.validate_phone(user_data['phone'])
             user_data['username'] = security.validate_username(user_data['username'])
 
             user_from_db = await uow.user.add_one(user_data)
             user_for_return = UserSchemaFromBd.model_validate(user_from_db)
             await uow.commit()
-            return user_for_return
+        await invalidate_user_search()
+        return user_for_return
 
     async def patch(self, pk: int, data: UserSchemaPatch):
         async with self.uow as uow:
             user_from_db = await uow.user.update(pk, data)
             user_for_return = UserSchemaFromBd.model_validate(user_from_db)
             await uow.commit()
-
-            return user_for_return
+        await invalidate_user_search()
+        return user_for_return
 
     async def check_user_exists(self, user_data: UserSchemaRegister):
         async with self.uow as uow:
@@ -91,10 +113,46 @@ class UserService:
             user_for_return = UserSchemaFromBd.model_validate(existing_user) if existing_user is not None else None
             return user_for_return
 
+    async def _verify_credentials(self, username_or_email: str, input_password: str):
+        """
+        Учётные данные пользователя, если пароль верный, иначе None, и новый хеш, если старый
+        посчитан с другой стоимостью. Пока пароль проверяется в пуле, соединение с БД не держим.
+        """
+        async with self.uow as uow:
+            credentials = await uow.user.get_credentials(username_or_email=username_or_email)
+            await uow.rollback()
+        if credentials is None:
+            return None, None
+        valid, new_hash = await password_hasher.verify_and_update(input_password, credentials['password'])
+        return (credentials, new_hash) if valid else (None, None)
+
     async def check_credentials(self, username_or_email: str, input_password: str):
+        credentials, new_hash = await self._verify_credentials(username_or_email, input_password)
+        if new_hash is not None:
+            # Хеш посчитан с другой стоимостью — заменяем, пока пароль известен
+            async with self.uow as uow:
+                await uow.user.set_password_hash(credentials['user_id'], new_hash)
+                await uow.commit()
+        return credentials is not None
+
+    async def login(self, username_or_email: str, input_password: str):
+        """
+        Вход: один запрос за пользователем, проверка пароля в пуле, затем в одной транзакции
+        upsert refresh-токена новой сессии (и замена устаревшего хеша пароля).
+        """
+        credentials, new_hash = await self._verify_credentials(username_or_email, input_password)
+        if credentials is None:
+            raise NotAuthenticated(detail="Неверные данные")
         async with self.uow as uow:
-            res = await uow.user.check_credentials(username_or_email=username_or_email, input_password=input_password)
-            return res
+            if new_hash is not None:
+                await uow.user.set_password_hash(credentials['user_id'], new_hash)
+            tokens = await uow.user.issue_tokens(
+                user_id=credentials['user_id'],
+                username=credentials['username'],
+                is_superuser=credentials['is_superuser'],
+            )
+            await uow.commit()
+        return tokens
 
     async def get_by_email_or_username(self, username_or_email: str):
          async with self.uow as uow:
@@ -0,0 +1,9 @@
+from .base import BroadcastBackendABC
+from .memory import InMemoryBroadcast, InProcessBroker
+from .redis_broadcast import RedisBroadcast
+
+
+def create_broadcast_backend(settings) -> BroadcastBackendABC:
+    if settings.BROADCAST_BACKEND == "redis":
+        return RedisBroadcast(url=settings.REDIS_URL, prefix=settings.BROADCAST_CHANNEL_PREFIX)
+    return InMemoryBroadcast()
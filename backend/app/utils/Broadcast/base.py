@@ -0,0 +1,58 @@
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Iterable
+
+# Обработчик доставки: (user_id получателей, готовый JSON) -> отправка в локальные сокеты
+DeliveryHandler = Callable[[list[int], str], Awaitable[None]]
+# Обработчик служебных сообщений, общих для всех воркеров (например, сброс кэшей)
+ControlHandler = Callable[[str], Awaitable[None]]
+
+
+class BroadcastBackendABC(ABC):
+    """
+    Транспорт рассылки WebSocket-событий между воркерами.
+    У каждого пользователя свой канал: воркер подписывается на канал, пока у него
+    есть хотя бы одно соединение этого пользователя, а broadcast публикует
+    событие в каналы получателей. Событие передаётся уже сериализованным в JSON,
+    чтобы не кодировать его заново на каждого получателя.
+    Служебный канал доставляет сообщение всем воркерам, включая отправителя.
+    """
+
+    @abstractmethod
+    async def start(self) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def stop(self) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def subscribe(self, user_id: int, handler: DeliveryHandler) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def unsubscribe(self, user_id: int) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def publish(self, receivers_id: Iterable[int], data: str) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def set_control_handler(self, handler: ControlHandler) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def publish_control(self, data: str) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def presence_join(self, user_id: int) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def presence_leave(self, user_id: int) -> None:
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_online(self, users_id: Iterable[int]) -> set[int]:
+        raise NotImplementedError()
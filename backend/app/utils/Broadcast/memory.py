@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Iterable
+
+from .base import BroadcastBackendABC, DeliveryHandler, ControlHandler
+
+logger = logging.getLogger(__name__)
+
+
+class InProcessBroker:
+    """
+    Брокер в памяти процесса. Один экземпляр можно отдать нескольким
+    InMemoryBroadcast, чтобы в тестах изобразить несколько воркеров.
+    """
+
+    def __init__(self):
+        self.subscribers: dict[int, list[DeliveryHandler]] = defaultdict(list)
+        self.presence: dict[int, int] = defaultdict(int)
+        self.control_handlers: list[ControlHandler] = []
+
+
+class InMemoryBroadcast(BroadcastBackendABC):
+    def __init__(self, broker: InProcessBroker | None = None):
+        self.broker = broker or InProcessBroker()
+        self._handlers: dict[int, DeliveryHandler] = {}
+        self._control_handler: ControlHandler | None = None
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        for user_id in list(self._handlers):
+            await self.unsubscribe(user_id)
+        if self._control_handler in self.broker.control_handlers:
+            self.broker.control_handlers.remove(self._control_handler)
+
+    async def subscribe(self, user_id: int, handler: DeliveryHandler) -> None:
+        if user_id in self._handlers:
+            return
+        self._handlers[user_id] = handler
+        self.broker.subscribers[user_id].append(handler)
+
+    async def unsubscribe(self, user_id: int) -> None:
+        handler = self._handlers.pop(user_id, None)
+        if handler is None:
+            return
+        handlers = self.broker.subscribers.get(user_id, [])
+        if handler in handlers:
+            handlers.remove(handler)
+        if not handlers:
+            self.broker.subscribers.pop(user_id, None)
+
+    async def publish(self, receivers_id: Iterable[int], data: str) -> None:
+        # Получателей группируем по обработчику, чтобы каждый менеджер получил один вызов
+        by_handler: dict[DeliveryHandler, list[int]] = {}
+        for receiver_id in receivers_id:
+            for handler in self.broker.subscribers.get(receiver_id, ()):
+                by_handler.setdefault(handler, []).append(receiver_id)
+        if not by_handler:
+            return
+        results = await asyncio.gather(
+            *(handler(handler_receivers, data) for handler, handler_receivers in by_handler.items()),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.exception(result)
+
+    def set_control_handler(self, handler: ControlHandler) -> None:
+        if self._control_handler in self.broker.control_handlers:
+            self.broker.control_handlers.remove(self._control_handler)
+        self._control_handler = handler
+        self.broker.control_handlers.append(handler)
+
+    async def publish_control(self, data: str) -> None:
+        for handler in list(self.broker.control_handlers):
+            try:
+                await handler(data)
+            except Exception as e:
+                logger.exception(e)
+
+    async def presence_join(self, user_id: int) -> None:
+        self.broker.presence[user_id] += 1
+
+    async def presence_leave(self, user_id: int) -> None:
+        self.broker.presence[user_id] -= 1
+        if self.broker.presence[user_id] <= 0:
+            del self.broker.presence[user_id]
+
+    async def get_online(self, users_id: Iterable[int]) -> set[int]:
+        return {user_id for user_id in users_id if self.broker.presence.get(user_id, 0) > 0}
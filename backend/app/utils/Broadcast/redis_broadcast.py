@@ -0,0 +1,127 @@
+import asyncio
+import logging
+from typing import Iterable
+
+from .base import BroadcastBackendABC, DeliveryHandler, ControlHandler
+
+logger = logging.getLogger(__name__)
+
+
+class RedisBroadcast(BroadcastBackendABC):
+    """
+    Рассылка через Redis pub/sub: канал {prefix}:user:{user_id} на каждого пользователя,
+    присутствие — счётчик соединений в хэше {prefix}:presence.
+    Нужен пакет redis (redis.asyncio).
+    """
+
+    def __init__(self, url: str, prefix: str = "mychat"):
+        self.url = url
+        self.prefix = prefix
+        self._redis = None
+        self._pubsub = None
+        self._listener: asyncio.Task | None = None
+        self._handlers: dict[int, DeliveryHandler] = {}
+        self._control_handler: ControlHandler | None = None
+
+    def _channel(self, user_id: int) -> str:
+        return f"{self.prefix}:user:{user_id}"
+
+    @property
+    def _control_channel(self) -> str:
+        return f"{self.prefix}:control"
+
+    @property
+    def _presence_key(self) -> str:
+        return f"{self.prefix}:presence"
+
+    async def start(self) -> None:
+        try:
+            from redis import asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("Для BROADCAST_BACKEND=redis установите пакет redis")
+
+        self._redis = aioredis.from_url(self.url)
+        self._pubsub = self._redis.pubsub()
+        # Служебный канал к тому же держит pubsub в режиме подписки, пока нет ни одного пользователя
+        await self._pubsub.subscribe(self._control_channel)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        for user_id in list(self._handlers):
+            await self.presence_leave(user_id)
+        self._handlers.clear()
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def _listen(self) -> None:
+        channel_prefix = f"{self.prefix}:user:"
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    continue
+                channel = message["channel"].decode()
+                if channel == self._control_channel:
+                    if self._control_handler is not None:
+                        await self._control_handler(message["data"].decode())
+                    continue
+                if not channel.startswith(channel_prefix):
+                    continue
+                user_id = int(channel[len(channel_prefix):])
+                handler = self._handlers.get(user_id)
+                if handler is not None:
+                    await handler([user_id], message["data"].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(e)
+                await asyncio.sleep(1)
+
+    async def subscribe(self, user_id: int, handler: DeliveryHandler) -> None:
+        if user_id in self._handlers:
+            return
+        self._handlers[user_id] = handler
+        await self._pubsub.subscribe(self._channel(user_id))
+
+    async def unsubscribe(self, user_id: int) -> None:
+        if self._handlers.pop(user_id, None) is None:
+            return
+        await self._pubsub.unsubscribe(self._channel(user_id))
+
+    async def publish(self, receivers_id: Iterable[int], data: str) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for receiver_id in receivers_id:
+                pipe.publish(self._channel(receiver_id), data)
+            await pipe.execute()
+
+    def set_control_handler(self, handler: ControlHandler) -> None:
+        self._control_handler = handler
+
+    async def publish_control(self, data: str) -> None:
+        await self._redis.publish(self._control_channel, data)
+
+    async def presence_join(self, user_id: int) -> None:
+        await self._redis.hincrby(self._presence_key, str(user_id), 1)
+
+    async def presence_leave(self, user_id: int) -> None:
+        left = await self._redis.hincrby(self._presence_key, str(user_id), -1)
+        if left <= 0:
+            await self._redis.hdel(self._presence_key, str(user_id))
+
+    async def get_online(self, users_id: Iterable[int]) -> set[int]:
+        users_id = list(users_id)
+        if not users_id:
+            return set()
+        counters = await self._redis.hmget(self._presence_key, [str(user_id) for user_id in users_id])
+        return {user_id for user_id, counter in zip(users_id, counters) if counter and int(counter) > 0}
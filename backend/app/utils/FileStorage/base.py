@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import BinaryIO
+from typing import AsyncIterable
 from pathlib import Path
 
 class FileStorageABC(ABC):
@@ -11,9 +11,10 @@ class FileStorageABC(ABC):
     @abstractmethod
     async def save(
         self,
-        key: str,
-        stream: BinaryIO,
-    ) -> Path:
+        stream: AsyncIterable[bytes],
+        path: Path,
+        max_size: int | None = None,
+    ) -> dict:
         raise NotImplementedError()
 
     @abstractmethod
@@ -1,11 +1,18 @@
-from typing import BinaryIO
+import hashlib
+from typing import AsyncIterable
 from pathlib import Path
 
 import aiofiles
+import aiofiles.os
+from fastapi import status
 
 from app.core.config import settings
+from app.exceptions import EntityError
 from .base import FileStorageABC
 
+# Куски из сети мелкие (десятки КБ) — пишем на диск блоками не меньше этого размера
+WRITE_BLOCK_SIZE = 1024 * 1024
+
 
 class LocalFileStorage(FileStorageABC):
     def __init__(self, base_url: str):
@@ -19,20 +26,45 @@ class LocalFileStorage(FileStorageABC):
 
     async def save(
             self,
-            stream: BinaryIO,
+            stream: AsyncIterable[bytes],
             path: Path,
-            filename: str | None = None,
-            chat_id: int | None = None,
-    ) -> Path:
+            max_size: int | None = None,
+    ) -> dict:
+        """
+        Пишет поток во временный файл рядом с целевым, по ходу считая размер и sha256,
+        и переименовывает его на место только целиком записанным. Больше max_size байт —
+        запись прерывается с 413. При любой ошибке временный файл удаляется.
+        Возвращает {"path", "size", "sha256"}.
+        """
         path = self._resolve_path(path)
         path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.part")
+        digest = hashlib.sha256()
+        size = 0
+        block = bytearray()
+        try:
+            async with aiofiles.open(tmp_path, "wb") as f:
+                async for chunk in stream:
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise EntityError(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Размер файла превышает максимально допустимый ({max_size // (1024 * 1024)} МБ).",
+                        )
+                    digest.update(chunk)
+                    block += chunk
+                    if len(block) >= WRITE_BLOCK_SIZE:
+                        await f.write(block)
+                        block.clear()
+                if block:
+                    await f.write(block)
+            await aiofiles.os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
 
-        async with aiofiles.open(path, "wb") as f:
-            while chunk := stream.read(1024 * 1024):
-                await f.write(chunk)
-
-        return path
+        return {"path": path, "size": size, "sha256": digest.hexdigest()}
 
     def delete(self, url: str) -> None:
         path = self._resolve_path(url)
-        path.unlink(missing_ok=True)
\ No newline at end of file
+        path.unlink(missing_ok=True)
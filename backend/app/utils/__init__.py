@@ -1,2 +1,2 @@
 from .websocket import manager
-from .unit_of_work import get_unit_of_work
+from .unit_of_work import get_unit_of_work, get_read_unit_of_work
@@ -0,0 +1,22 @@
+import base64
+import json
+
+from app.exceptions import UnprocessableEntity
+
+
+def encode_cursor(data: dict) -> str:
+    """Непрозрачный курсор для keyset-пагинации: base64url от json без паддинга."""
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise UnprocessableEntity(detail="Неверный курсор")
+    # В курсорах только id и ранги; bool — подкласс int и иначе прошёл бы их проверки
+    if not isinstance(data, dict) or any(isinstance(value, bool) for value in data.values()):
+        raise UnprocessableEntity(detail="Неверный курсор")
+    return data
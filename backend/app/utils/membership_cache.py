@@ -0,0 +1,91 @@
+import time
+from collections import Counter
+
+from app.core.config import settings
+from app.utils.websocket import manager
+
+
+class MembershipCache:
+    """
+    Кэш состава чатов в памяти процесса: chat_id -> frozenset id участников.
+    Запись живёт ttl секунд и сбрасывается явно при изменении состава чата.
+    Загрузка, начатая до сброса, в кэш не попадает (см. generation).
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.counters: Counter = Counter()
+        self._items: dict[int, tuple[float, frozenset[int]]] = {}
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, chat_id: int) -> frozenset[int] | None:
+        item = self._items.get(chat_id)
+        if item is None or item[0] < time.monotonic():
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        return item[1]
+
+    def set(self, chat_id: int, members_id, generation: int | None = None) -> frozenset[int]:
+        members_id = frozenset(members_id)
+        if generation is not None and generation != self._generation:
+            return members_id
+        self._items.pop(chat_id, None)
+        if len(self._items) >= self.max_size:
+            # dict хранит порядок вставки — выкидываем самую старую запись
+            del self._items[next(iter(self._items))]
+        self._items[chat_id] = (time.monotonic() + self.ttl, members_id)
+        return members_id
+
+    def invalidate(self, chat_id: int) -> None:
+        self._generation += 1
+        self.counters["invalidations"] += 1
+        self._items.pop(chat_id, None)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self.counters["invalidations"] += 1
+        self._items.clear()
+
+    def stats(self) -> dict:
+        hits, misses = self.counters["hits"], self.counters["misses"]
+        return {
+            "size": len(self._items),
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+            "invalidations": self.counters["invalidations"],
+        }
+
+
+membership_cache = MembershipCache(ttl=settings.MEMBERSHIP_CACHE_TTL, max_size=settings.MEMBERSHIP_CACHE_SIZE)
+
+
+MEMBERSHIP_CONTROL = "membership"
+
+
+def _on_remote_invalidation(value: str) -> None:
+    if value == "*":
+        membership_cache.clear()
+    else:
+        membership_cache.invalidate(int(value))
+
+
+manager.add_control_handler(MEMBERSHIP_CONTROL, _on_remote_invalidation)
+
+
+async def invalidate_members(chat_id: int | None = None) -> None:
+    """
+    Сбрасывает состав чата (без chat_id — весь кэш) в этом воркере и рассылает сброс остальным.
+    Вызывать после commit, иначе другой воркер может успеть перечитать старый состав.
+    """
+    if chat_id is None:
+        membership_cache.clear()
+    else:
+        membership_cache.invalidate(chat_id)
+    await manager.publish_control(MEMBERSHIP_CONTROL, "*" if chat_id is None else str(chat_id))
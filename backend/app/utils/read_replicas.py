@@ -0,0 +1,131 @@
+import time
+from collections import Counter
+from typing import Iterable
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from app.core.config import settings
+from app.db.database import replica_engines
+from app.db.pool import pool_stats
+from app.utils.websocket import manager
+
+ROUND_ROBIN = "round_robin"
+LEAST_BUSY = "least_busy"
+
+
+class ReadReplicaRouter:
+    """
+    Выбирает реплику для UnitOfWork(read_only=True).
+    round_robin — по очереди, least_busy — реплика с наименьшим числом занятых соединений пула.
+    Пользователь, который недавно что-то закоммитил, sticky_window секунд читает из основной БД,
+    чтобы сразу видеть свои изменения несмотря на отставание реплик. Чужие изменения
+    на репликах могут появиться с задержкой репликации.
+    """
+
+    def __init__(self, engines: list, selection: str, sticky_window: float):
+        if selection not in (ROUND_ROBIN, LEAST_BUSY):
+            raise ValueError(f"Неизвестный способ выбора реплики: {selection}")
+        self.engines = engines
+        self.selection = selection
+        self.sticky_window = sticky_window
+        self.counters: Counter = Counter()
+        self._session_makers = [async_sessionmaker(engine, class_=AsyncSession) for engine in engines]
+        self._next = 0
+        # user_id -> момент (monotonic), до которого чтения идут в основную БД
+        self._sticky: dict[int, float] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.engines)
+
+    def session_factory(self, user_id: int | None = None) -> async_sessionmaker | None:
+        """Фабрика сессий реплики или None, если читать нужно из основной БД."""
+        if not self.engines:
+            return None
+        if user_id is not None and self.is_sticky(user_id):
+            self.counters["primary_sticky"] += 1
+            return None
+        index = self._pick()
+        self.counters[f"replica_{index}"] += 1
+        return self._session_makers[index]
+
+    def _pick(self) -> int:
+        count = len(self.engines)
+        start = self._next
+        self._next = (self._next + 1) % count
+        if self.selection == ROUND_ROBIN or count == 1:
+            return start
+        # При равной загрузке продолжаем по кругу, чтобы не нагружать всегда первую реплику
+        return min(
+            ((start + shift) % count for shift in range(count)),
+            key=lambda index: self.engines[index].sync_engine.pool.checkedout(),
+        )
+
+    def is_sticky(self, user_id: int) -> bool:
+        until = self._sticky.get(user_id)
+        if until is None:
+            return False
+        if until < time.monotonic():
+            del self._sticky[user_id]
+            return False
+        return True
+
+    def mark(self, users_id: Iterable[int]) -> list[int]:
+        """
+        Продлевает окно read-your-writes. Возвращает тех, о ком стоит сообщить другим воркерам:
+        у кого окна не было или оно прошло больше чем наполовину — так частые коммиты
+        одного пользователя не превращаются в поток служебных сообщений.
+        """
+        now = time.monotonic()
+        until = now + self.sticky_window
+        renewed = []
+        for user_id in users_id:
+            previous = self._sticky.get(user_id)
+            if previous is None or previous - now < self.sticky_window / 2:
+                renewed.append(user_id)
+            self._sticky[user_id] = until
+        if len(self._sticky) > 10000:
+            self._sticky = {user_id: until for user_id, until in self._sticky.items() if until >= now}
+        return renewed
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "selection": self.selection,
+            "sticky_window": self.sticky_window,
+            "sticky_users": sum(1 for until in self._sticky.values() if until >= now),
+            "primary_sticky": self.counters["primary_sticky"],
+            "replicas": [
+                {"reads": self.counters[f"replica_{index}"], "pool": pool_stats(engine)}
+                for index, engine in enumerate(self.engines)
+            ],
+        }
+
+
+read_replicas = ReadReplicaRouter(
+    replica_engines,
+    selection=settings.DB_REPLICA_SELECTION,
+    sticky_window=settings.DB_READ_YOUR_WRITES_WINDOW,
+)
+
+
+STICKY_CONTROL = "sticky"
+
+
+def _on_remote_write(value: str) -> None:
+    read_replicas.mark(int(user_id) for user_id in value.split(","))
+
+
+manager.add_control_handler(STICKY_CONTROL, _on_remote_write)
+
+
+async def mark_writes(users_id: Iterable[int]) -> None:
+    """
+    Включает read-your-writes для пользователей в этом воркере и рассылает остальным.
+    Вызывать после commit; без реплик ничего не делает.
+    """
+    if not read_replicas.enabled:
+        return
+    renewed = read_replicas.mark(users_id)
+    if renewed:
+        await manager.publish_control(STICKY_CONTROL, ",".join(map(str, renewed)))
@@ -0,0 +1,39 @@
+import re
+
+from app.exceptions import UnprocessableEntity
+
+# Каждое слово запроса — отдельный проход по GIN-индексу, поэтому их число ограничено
+SEARCH_MAX_TERMS = 16
+
+_TOKEN_RE = re.compile(r'"([^"]*)"?|(\S+)')
+_WORD_RE = re.compile(r"\w+")
+
+
+def build_tsquery(text: str) -> str:
+    """
+    Переводит поисковую строку пользователя в синтаксис to_tsquery.
+
+    - слова объединяются через И: отчёт квартал -> 'отчёт' & 'квартал'
+    - слово со звёздочкой ищется по префиксу: отч* -> 'отч':*
+    - текст в кавычках — фраза, слова подряд: "годовой отчёт" -> ('годовой' <-> 'отчёт')
+
+    Знаки препинания внутри слова делят его на фразу (e-mail -> ('e' <-> 'mail')).
+    Лексемы всегда в кавычках, так что операторы tsquery из ввода не проходят.
+    """
+    groups = []
+    terms = 0
+    for match in _TOKEN_RE.finditer(text):
+        phrase, word = match.groups()
+        words = _WORD_RE.findall(phrase if phrase is not None else word)
+        if not words:
+            continue
+        terms += len(words)
+        if terms > SEARCH_MAX_TERMS:
+            raise UnprocessableEntity(detail=f"В запросе больше {SEARCH_MAX_TERMS} слов")
+        lexemes = [f"'{word}'" for word in words]
+        if phrase is None and word.endswith("*"):
+            lexemes[-1] += ":*"
+        groups.append(lexemes[0] if len(lexemes) == 1 else f"({' <-> '.join(lexemes)})")
+    if not groups:
+        raise UnprocessableEntity(detail="Пустой поисковый запрос")
+    return " & ".join(groups)
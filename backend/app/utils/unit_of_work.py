@@ -1,8 +1,15 @@
+import logging
 from abc import ABC, abstractmethod
 
+from fastapi import Depends, Request
+from sqlalchemy import event
+
 import app.repositories as repo
 from app.db.database import async_session_maker
+from app.security import security
+from app.utils.read_replicas import read_replicas, mark_writes
 
+logger = logging.getLogger(__name__)
 
 class IUnitOfWork(ABC):
     @abstractmethod
@@ -26,13 +33,81 @@ class IUnitOfWork(ABC):
         raise NotImplemented
 
 
+def _mark_writes(session, *args):
+    session.info["has_writes"] = True
+
+
+def _mark_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["has_writes"] = True
+
+
+def _reset_writes(session, *args):
+    session.info["has_writes"] = False
+
+
 class UnitOfWork(IUnitOfWork):
-    def __init__(self):
+    """
+    Сессия БД для сервисов. Вложенный async with на том же объекте переиспользует
+    уже открытую сессию, а не создаёт новую.
+
+    request_scoped=False (по умолчанию) — сессия живёт до выхода из внешнего async with,
+    при выходе незакоммиченное откатывается. Так работают WebSocket и фоновые задачи.
+
+    request_scoped=True — одна сессия и одна транзакция на весь HTTP-запрос (get_unit_of_work).
+    Сервисные вызовы подряд делят общую identity map: повторная загрузка того же чата
+    или пользователя по id не идёт в БД. commit() внутри async with только сбрасывает
+    изменения в БД (flush) и отмечает транзакцию к коммиту; настоящий commit делает
+    finish() на границе запроса, если обработчик завершился без ошибки, иначе close()
+    всё откатывает. Внешний блок после такого commit() идёт в SAVEPOINT: вышел с ошибкой
+    или с записями без commit() — откатывается только он. Если блок что-то записал без
+    commit(), запись откатывается, как и раньше; если только читал и коммита в запросе
+    ещё не было — транзакция чтения завершается и соединение сразу возвращается в пул,
+    а не висит idle in transaction (например, пока принимается загружаемый файл).
+    Что должно случиться только после коммита (рассылка по WebSocket), передаётся
+    в after_commit, уборка при откате (записанный на диск файл) — в after_rollback.
+
+    read_only=True — только чтение: сессия открывается на реплике (см. read_replicas),
+    а если реплик нет или user_id недавно коммитил — на основной БД. commit() запрещён.
+    user_id — чей это UnitOfWork: после commit его чтения на время уходят в основную БД.
+    """
+
+    def __init__(self, request_scoped: bool = False, read_only: bool = False, user_id: int | None = None):
         self.session_factory = async_session_maker
         self.session = None
+        self.request_scoped = request_scoped
+        self.read_only = read_only
+        self.user_id = user_id
+        self._depth = 0
+        self._commit_requested = False
+        self._savepoint = None
+        self._after_commit = []
+        self._after_rollback = []
+        self._block_marks = (0, 0)
 
     async def __aenter__(self):
-        self.session = self.session_factory()
+        if self.session is None:
+            self._open()
+        if self._depth == 0 and self._commit_requested:
+            # В транзакции уже есть отложенный коммит — этот блок откатывается отдельно от него
+            self._savepoint = await self.session.begin_nested()
+            self._block_marks = (len(self._after_commit), len(self._after_rollback))
+        self._depth += 1
+        return self
+
+    def _open(self):
+        session_factory = self.session_factory
+        if self.read_only:
+            session_factory = read_replicas.session_factory(self.user_id) or session_factory
+        self.session = session_factory()
+        if self.request_scoped:
+            sync_session = self.session.sync_session
+            sync_session.expire_on_commit = False
+            sync_session.info["has_writes"] = False
+            event.listen(sync_session, "after_flush", _mark_writes)
+            event.listen(sync_session, "do_orm_execute", _mark_dml)
+            event.listen(sync_session, "after_commit", _reset_writes)
+            event.listen(sync_session, "after_rollback", _reset_writes)
 
         self.user = repo.UserRepository(self.session)
         self.chat = repo.ChatRepository(self.session)
@@ -43,18 +118,117 @@ class UnitOfWork(IUnitOfWork):
         self.task = repo.TaskRepository(self.session)
         self.task_assignment = repo.TaskAssignmentRepository(self.session)
         self.message_read_batch = repo.MessageReadBatchRepository(self.session)
-        return self
 
-    async def __aexit__(self, *args):
+    async def __aexit__(self, exc_type, *args):
+        self._depth -= 1
+        if self._depth > 0:
+            return
+        if not self.request_scoped:
+            await self.close()
+            return
+        savepoint, self._savepoint = self._savepoint, None
+        if exc_type is not None or self._has_uncommitted_writes():
+            if savepoint is not None:
+                await self._rollback_block(savepoint)
+            else:
+                await self.rollback()
+        elif savepoint is not None:
+            await savepoint.commit()
+        elif not self._commit_requested and self.session.in_transaction():
+            # Только чтение: коммит пустой транзакции отпускает соединение, identity map остаётся
+            await self.session.commit()
+
+    async def _rollback_block(self, savepoint):
+        await savepoint.rollback()
+        self.session.sync_session.info["has_writes"] = False
+        commit_mark, rollback_mark = self._block_marks
+        del self._after_commit[commit_mark:]
+        self._run_after_rollback(rollback_mark)
+
+    def _has_uncommitted_writes(self) -> bool:
+        session = self.session
+        return bool(session.new or session.dirty or session.deleted or session.sync_session.info.get("has_writes"))
+
+    async def close(self):
+        if self.session is None:
+            return
         await self.rollback()
         await self.session.close()
         self.session = None
+        self._depth = 0
 
     async def commit(self):
+        if self.read_only:
+            raise RuntimeError("UnitOfWork открыт только для чтения")
+        if self.request_scoped and self._depth > 0:
+            # Ошибки ограничений всплывают здесь, а коммит — в finish() на границе запроса
+            await self.session.flush()
+            self.session.sync_session.info["has_writes"] = False
+            self._commit_requested = True
+            return
+        await self._commit()
+
+    async def finish(self):
+        """Коммитит отложенные в запросе commit(); вызывается get_unit_of_work после обработчика."""
+        if self._commit_requested:
+            await self._commit()
+
+    async def _commit(self):
         await self.session.commit()
+        self._commit_requested = False
+        self._after_rollback.clear()
+        if self.user_id is not None:
+            await mark_writes((self.user_id,))
+        callbacks, self._after_commit = self._after_commit, []
+        for callback, args, kwargs in callbacks:
+            try:
+                await callback(*args, **kwargs)
+            except Exception as e:
+                logger.exception(e)
 
     async def rollback(self):
         await self.session.rollback()
+        self._commit_requested = False
+        self._savepoint = None
+        self._after_commit.clear()
+        self._run_after_rollback(0)
+
+    async def after_commit(self, callback, *args, **kwargs):
+        """await callback(...) после коммита: сразу, если отложенного commit() нет, иначе в finish()."""
+        if self._commit_requested:
+            self._after_commit.append((callback, args, kwargs))
+        else:
+            await callback(*args, **kwargs)
+
+    def after_rollback(self, callback, *args):
+        """callback(*args), если текущие изменения будут откачены, а не закоммичены."""
+        self._after_rollback.append((callback, args))
+
+    def _run_after_rollback(self, mark: int):
+        callbacks = self._after_rollback[mark:]
+        del self._after_rollback[mark:]
+        for callback, args in callbacks:
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.exception(e)
+
+async def get_unit_of_work(request: Request):
+    uow = UnitOfWork(request_scoped=True)
+    if read_replicas.enabled:
+        # Автор коммитов нужен только для read-your-writes, без реплик токен не разбираем
+        uow.user_id = security.get_user_id_from_authorization(request.headers.get("Authorization"))
+    try:
+        yield uow
+        await uow.finish()
+    finally:
+        await uow.close()
+
+async def get_read_unit_of_work(access_token = Depends(security.decode_jwt_access)):
+    """UnitOfWork только для чтения — для тяжёлых списков и статистики, которые можно читать с реплики."""
+    uow = UnitOfWork(request_scoped=True, read_only=True, user_id=access_token.get("user_id"))
+    try:
+        yield uow
+    finally:
+        await uow.close()
 
-async def get_unit_of_work():
-    return UnitOfWork()
\ No newline at end of file
@@ -0,0 +1,126 @@
+from typing import AsyncIterator
+
+from fastapi import Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+from python_multipart.exceptions import MultipartParseError
+
+from app.exceptions import UnprocessableEntity
+
+# Описание тела запроса для документации: эндпоинты с StreamingUpload читают Request сами,
+# поэтому FastAPI не знает о поле file
+UPLOAD_OPENAPI_EXTRA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                },
+            },
+        },
+    },
+}
+
+
+class StreamingUpload:
+    """
+    Файл из multipart/form-data, который читается прямо из тела запроса, без промежуточного
+    временного файла Starlette (UploadFile). open() разбирает тело до заголовков нужного поля —
+    после этого известны filename и content_type и файл можно проверить, ещё не читая его
+    содержимое; chunks() отдаёт содержимое по мере поступления из сети.
+    Остальные поля формы пропускаются.
+    """
+
+    def __init__(self, request: Request, field_name: str = "file"):
+        self.request = request
+        self.field_name = field_name
+        self.filename: str | None = None
+        self.content_type: str | None = None
+        self._body = request.stream()
+        self._parser: MultipartParser | None = None
+        self._header_name = b""
+        self._header_value = b""
+        self._headers: dict[bytes, bytes] = {}
+        self._in_file = False
+        self._found = False
+        self._done = False
+        self._pending: list[bytes] = []
+
+    async def open(self) -> "StreamingUpload":
+        content_type, params = parse_options_header(self.request.headers.get("Content-Type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise UnprocessableEntity(detail="Ожидается multipart/form-data")
+        self._parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+        while not self._found:
+            if not await self._feed():
+                raise UnprocessableEntity(detail=f"Файл не передан (поле '{self.field_name}')")
+        return self
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        while True:
+            if self._pending:
+                data = b"".join(self._pending)
+                self._pending.clear()
+                yield data
+            if self._done:
+                return
+            if not await self._feed():
+                raise UnprocessableEntity(detail="Тело запроса оборвалось до конца файла")
+
+    async def _feed(self) -> bool:
+        """Передаёт парсеру следующий кусок тела; False — тело закончилось."""
+        try:
+            chunk = await self._body.__anext__()
+        except StopAsyncIteration:
+            return False
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError:
+            raise UnprocessableEntity(detail="Некорректное тело multipart/form-data")
+        return True
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        self._in_file = not self._found and name == self.field_name and b"filename" in options
+        if self._in_file:
+            self._found = True
+            self.filename = options[b"filename"].decode("utf-8", "replace") or None
+            self.content_type = self._headers.get(b"content-type", b"").decode("latin-1") or None
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self._pending.append(data[start:end])
+
+    def _on_part_end(self) -> None:
+        if self._in_file:
+            self._in_file = False
+            self._done = True
+
+
+async def open_upload(request: Request, field_name: str = "file") -> StreamingUpload:
+    return await StreamingUpload(request, field_name).open()
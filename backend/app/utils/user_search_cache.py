@@ -0,0 +1,85 @@
+import time
+from collections import Counter
+
+from app.core.config import settings
+from app.utils.websocket import manager
+
+
+class UserSearchCache:
+    """
+    Кэш автодополнения пользователей в памяти процесса: короткий запрос -> список найденных.
+    Короткие префиксы набирают все, кто открывает выбор участников, и у них больше всего
+    совпадений, поэтому кэшируются только запросы до prefix_len символов.
+    Запись живёт ttl секунд; при изменении пользователей кэш сбрасывается целиком.
+    Поиск, начатый до сброса, в кэш не попадает (см. generation).
+    """
+
+    def __init__(self, ttl: float, max_size: int, prefix_len: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.prefix_len = prefix_len
+        self.counters: Counter = Counter()
+        self._items: dict[str, tuple[float, list]] = {}
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def is_cacheable(self, query: str) -> bool:
+        return self.ttl > 0 and len(query) <= self.prefix_len
+
+    def get(self, query: str) -> list | None:
+        item = self._items.get(query)
+        if item is None or item[0] < time.monotonic():
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        return item[1]
+
+    def set(self, query: str, users: list, generation: int | None = None) -> None:
+        if generation is not None and generation != self._generation:
+            return
+        self._items.pop(query, None)
+        if len(self._items) >= self.max_size:
+            # dict хранит порядок вставки — выкидываем самую старую запись
+            del self._items[next(iter(self._items))]
+        self._items[query] = (time.monotonic() + self.ttl, users)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self.counters["invalidations"] += 1
+        self._items.clear()
+
+    def stats(self) -> dict:
+        hits, misses = self.counters["hits"], self.counters["misses"]
+        return {
+            "size": len(self._items),
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+            "invalidations": self.counters["invalidations"],
+        }
+
+
+user_search_cache = UserSearchCache(
+    ttl=settings.USER_SEARCH_CACHE_TTL,
+    max_size=settings.USER_SEARCH_CACHE_SIZE,
+    prefix_len=settings.USER_SEARCH_CACHE_PREFIX_LEN,
+)
+
+
+USER_SEARCH_CONTROL = "user_search"
+
+
+def _on_remote_invalidation(value: str) -> None:
+    user_search_cache.clear()
+
+
+manager.add_control_handler(USER_SEARCH_CONTROL, _on_remote_invalidation)
+
+
+async def invalidate_user_search() -> None:
+    """Сбрасывает кэш автодополнения в этом воркере и у остальных. Вызывать после commit."""
+    user_search_cache.clear()
+    await manager.publish_control(USER_SEARCH_CONTROL, "*")
@@ -1,26 +1,281 @@
+import asyncio
+import json
 import logging
+import time
+from collections import Counter, deque
+from uuid import uuid4
 
 from fastapi import WebSocket
-from typing import Dict, Set
+from typing import Callable, Dict, Iterable
 from app.app import schemas
+from app.core.config import settings
+from app.utils.Broadcast import BroadcastBackendABC, create_broadcast_backend
 
 logger = logging.getLogger(__name__)
 
+# Типы событий с особой политикой при переполнении очереди
+TYPING_MESSAGE = 3
+READ_MESSAGE = 4
+
+# Перед JSON в канал уходит строка-заголовок с политикой доставки:
+# "" — обычное событие, "drop" — можно выбросить, "coalesce:<ключ>" — схлопывается по ключу.
+DROPPABLE_HEADER = "drop"
+COALESCE_PREFIX = "coalesce:"
+
+
+class _OutboundItem:
+    __slots__ = ("data", "key", "droppable", "enqueued_at")
+
+    def __init__(self, data: str, key: str | None, droppable: bool):
+        self.data = data
+        self.key = key
+        self.droppable = droppable
+        self.enqueued_at = time.monotonic()
+
+
+class OutboundQueue:
+    """
+    Исходящая очередь одного соединения со своей задачей-писателем.
+    Продюсер только кладёт событие в очередь и никогда не ждёт клиента.
+    При переполнении сначала выбрасываются события «печатает», отметки о прочтении
+    схлопываются по чату, а клиент, отставший больше чем на max_lag секунд, отключается.
+    """
+
+    def __init__(
+            self,
+            websocket: WebSocket,
+            user_id: int,
+            on_evict: Callable[["OutboundQueue", str], None],
+            max_size: int,
+            max_lag: float,
+            send_timeout: float,
+    ):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.max_size = max_size
+        self.max_lag = max_lag
+        self.send_timeout = send_timeout
+        self.counters: Counter = Counter()
+        self.closed = False
+        # Момент начала текущей отправки; зависшие отправки закрывает сторож менеджера
+        self.sending_since: float | None = None
+        self._on_evict = on_evict
+        self._items: deque[_OutboundItem] = deque()
+        self._pending_keys: dict[str, _OutboundItem] = {}
+        self._ready = asyncio.Event()
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, data: str, key: str | None = None, droppable: bool = False):
+        if self.closed:
+            return
+        if key is not None and (pending := self._pending_keys.get(key)) is not None:
+            pending.data = data
+            self.counters["coalesced"] += 1
+            return
+        if self._items and time.monotonic() - self._items[0].enqueued_at > self.max_lag:
+            self.evict(f"отстаёт больше чем на {self.max_lag} с")
+            return
+        if len(self._items) >= self.max_size:
+            if droppable:
+                self.counters["dropped"] += 1
+                return
+            if not self._drop_one_droppable():
+                self.evict(f"очередь переполнена ({self.max_size})")
+                return
+
+        item = _OutboundItem(data, key, droppable)
+        self._items.append(item)
+        if key is not None:
+            self._pending_keys[key] = item
+        self._ready.set()
+
+    def _drop_one_droppable(self) -> bool:
+        for item in self._items:
+            if item.droppable:
+                self._items.remove(item)
+                self.counters["dropped"] += 1
+                return True
+        return False
+
+    async def _write_loop(self):
+        try:
+            while True:
+                if not self._items:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                item = self._items.popleft()
+                if item.key is not None:
+                    self._pending_keys.pop(item.key, None)
+                self.sending_since = time.monotonic()
+                await self.websocket.send_text(item.data)
+                self.sending_since = None
+                self.counters["sent"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(e)
+            self.evict("ошибка отправки")
+
+    def check_stuck(self, now: float):
+        if self.sending_since is not None and now - self.sending_since > self.send_timeout:
+            self.evict(f"отправка не уложилась в {self.send_timeout} с")
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._items.clear()
+        self._pending_keys.clear()
+        if self._writer is not asyncio.current_task():
+            self._writer.cancel()
+
+    def evict(self, reason: str):
+        if self.closed:
+            return
+        self.counters["evicted"] += 1
+        self.close()
+        self._on_evict(self, reason)
+
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[int, list[WebSocket]] = {}
+    """
+    Держит WebSocket-соединения текущего воркера. Рассылка идёт через backend:
+    воркер подписан на каналы тех пользователей, у кого здесь есть соединения,
+    поэтому событие доходит до сокета независимо от того, какой воркер его отправил.
+    """
+
+    def __init__(self, backend: BroadcastBackendABC | None = None):
+        self.active_connections: Dict[int, list[OutboundQueue]] = {}
+        self.backend = backend or create_broadcast_backend(settings)
+        self.send_timeout = settings.WS_SEND_TIMEOUT
+        self.queue_size = settings.WS_SEND_QUEUE_SIZE
+        self.max_lag = settings.WS_MAX_LAG
+        # Счётчики уже закрытых очередей, чтобы метрики не обнулялись при отключениях
+        self._closed_counters: Counter = Counter()
+        self._background: set[asyncio.Task] = set()
+        self._watchdog: asyncio.Task | None = None
+        # Служебные сообщения между воркерами: "<worker_id>:<kind>:<value>"
+        self.worker_id = uuid4().hex
+        self._control_handlers: dict[str, Callable[[str], None]] = {}
+        self.backend.set_control_handler(self._on_control)
+
+    async def startup(self):
+        await self.backend.start()
+
+    async def shutdown(self):
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            self._watchdog = None
+        for queues in self.active_connections.values():
+            for queue in queues:
+                self._release(queue)
+        self.active_connections.clear()
+        await self.backend.stop()
 
     async def connect(self, websocket: WebSocket, user_id: int):
+        if self._watchdog is None or self._watchdog.done():
+            self._watchdog = asyncio.create_task(self._watch_stuck_sends())
         if user_id not in self.active_connections:
             self.active_connections[user_id] = []
-        self.active_connections[user_id].append(websocket)
+            await self.backend.subscribe(user_id, self._deliver_local)
+        self.active_connections[user_id].append(OutboundQueue(
+            websocket, user_id, self._on_evict,
+            max_size=self.queue_size, max_lag=self.max_lag, send_timeout=self.send_timeout,
+        ))
+        await self.backend.presence_join(user_id)
+
+    async def disconnect(self, websocket: WebSocket, user_id: int):
+        for queue in self.active_connections.get(user_id, ()):
+            if queue.websocket is websocket:
+                await self._remove(queue)
+                return
+
+    async def _remove(self, queue: OutboundQueue):
+        queues = self.active_connections.get(queue.user_id)
+        if not queues or queue not in queues:
+            return
+        queues.remove(queue)
+        self._release(queue)
+        await self.backend.presence_leave(queue.user_id)
+        if not queues:
+            self.active_connections.pop(queue.user_id, None)
+            await self.backend.unsubscribe(queue.user_id)
+
+    def _release(self, queue: OutboundQueue):
+        queue.close()
+        self._closed_counters.update(queue.counters)
+        queue.counters.clear()
+
+    async def _watch_stuck_sends(self):
+        # Один сторож на воркер вместо таймера на каждую отправку
+        interval = min(1.0, self.send_timeout / 2)
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for queues in list(self.active_connections.values()):
+                for queue in list(queues):
+                    queue.check_stuck(now)
+
+    def _on_evict(self, queue: OutboundQueue, reason: str):
+        logger.warning(f"WS: соединение пользователя {queue.user_id} закрыто: {reason}")
+        self._spawn(self._evict(queue))
 
-    def disconnect(self, websocket: WebSocket, user_id: int):
-        if user_id in self.active_connections:
-            if websocket in self.active_connections[user_id]:
-                self.active_connections[user_id].remove(websocket)
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
+    async def _evict(self, queue: OutboundQueue):
+        await self._remove(queue)
+        try:
+            await asyncio.wait_for(queue.websocket.close(), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def add_control_handler(self, kind: str, handler: Callable[[str], None]):
+        self._control_handlers[kind] = handler
+
+    async def publish_control(self, kind: str, value: str):
+        """Рассылает служебное сообщение остальным воркерам; свой воркер его пропускает."""
+        try:
+            await self.backend.publish_control(f"{self.worker_id}:{kind}:{value}")
+        except Exception as e:
+            logger.exception(e)
+
+    async def _on_control(self, data: str):
+        worker_id, _, rest = data.partition(":")
+        if worker_id == self.worker_id:
+            return
+        kind, _, value = rest.partition(":")
+        handler = self._control_handlers.get(kind)
+        if handler is not None:
+            handler(value)
+
+    async def get_online(self, users_id: Iterable[int]) -> set[int]:
+        return await self.backend.get_online(users_id)
+
+    def stats(self) -> dict:
+        counters = Counter(self._closed_counters)
+        depths = []
+        for queues in self.active_connections.values():
+            for queue in queues:
+                counters.update(queue.counters)
+                depths.append(len(queue))
+        return {
+            "users": len(self.active_connections),
+            "connections": len(depths),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "queue_size": self.queue_size,
+            "sent": counters["sent"],
+            "dropped": counters["dropped"],
+            "coalesced": counters["coalesced"],
+            "evicted": counters["evicted"],
+        }
 
     async def broadcast(
             self,
@@ -33,28 +288,44 @@ class ConnectionManager:
             sender_id: int | None = None,
             **kwargs
     ):
+        for_send_json = {
+            'type_of_message': type_of_message,
+            "message_id": message_id,
+            "text": message,
+            "chat_id": chat_id,
+            "sender_id": sender_id,
+            "file": file,
+        }
+        for_send_json.update(**kwargs)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(for_send_json)
+
+        if type_of_message == TYPING_MESSAGE:
+            header = DROPPABLE_HEADER
+        elif type_of_message == READ_MESSAGE:
+            header = f"{COALESCE_PREFIX}{READ_MESSAGE}:{chat_id}"
+        else:
+            header = ""
+
+        # Payload кодируется один раз; it_self отличается только у отправителя,
+        # поэтому готовим два варианта, дописывая поле в конец готового JSON.
+        data = json.dumps(for_send_json, separators=(",", ":"), ensure_ascii=False, default=str)
+        data_for_others = f'{header}\n{data[:-1]},"it_self":false}}'
+        others_id = [receiver_id for receiver_id in receivers_id if receiver_id != sender_id]
+        if sender_id is None or len(others_id) == len(receivers_id):
+            await self.backend.publish(others_id, data_for_others)
+            return
+        await asyncio.gather(
+            self.backend.publish([sender_id], f'{header}\n{data[:-1]},"it_self":true}}'),
+            self.backend.publish(others_id, data_for_others),
+        )
+
+    async def _deliver_local(self, receivers_id: list[int], frame: str):
+        header, _, data = frame.partition("\n")
+        key = header[len(COALESCE_PREFIX):] if header.startswith(COALESCE_PREFIX) else None
+        droppable = header == DROPPABLE_HEADER
         for receiver_id in receivers_id:
-            if receiver_id in self.active_connections:
-                for connection in list(self.active_connections[receiver_id]):
-                    try:
-                        for_send_json = {
-                            'type_of_message': type_of_message,
-                            "message_id": message_id,
-                            "text": message,
-                            "chat_id": chat_id,
-                            "sender_id": sender_id,
-                            "it_self": receiver_id == sender_id,
-                            "file": file,
-                        }
-                        for_send_json.update(**kwargs)
-                        logger.debug(for_send_json)
-
-                        await connection.send_json(for_send_json)
-                    except Exception as e:
-                        logger.exception(e)
-                        if connection in self.active_connections[receiver_id]:
-                            self.active_connections[receiver_id].remove(connection)
-                        if not self.active_connections[receiver_id]:
-                            del self.active_connections[receiver_id]
+            for queue in self.active_connections.get(receiver_id, ()):
+                queue.put(data, key=key, droppable=droppable)
 
 manager = ConnectionManager()
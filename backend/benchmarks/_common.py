@@ -0,0 +1,68 @@
+"""
+Общие помощники для бенчмарков.
+
+Бенчмарки работают с тестовой БД (settings.ASYNC_TEST_DATABASE_URL) — та же,
+что используется в tests/conftest.py. Схема пересоздаётся при каждом запуске.
+"""
+import argparse
+import statistics
+import time
+from contextlib import asynccontextmanager
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from app.core.config import settings
+from app.db.database import Base
+from app.utils.unit_of_work import UnitOfWork
+
+
+def make_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--database-url", default=settings.ASYNC_TEST_DATABASE_URL)
+    parser.add_argument("--repeat", type=int, default=20, help="Сколько раз повторить замер")
+    return parser
+
+
+async def reset_schema(engine) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+def make_uow_factory(engine):
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    def factory() -> UnitOfWork:
+        uow = UnitOfWork()
+        uow.session_factory = session_maker
+        return uow
+
+    return factory
+
+
+@asynccontextmanager
+async def bench_engine(database_url: str):
+    engine = create_async_engine(database_url)
+    try:
+        yield engine
+    finally:
+        await engine.dispose()
+
+
+async def measure(label: str, func, repeat: int) -> list[float]:
+    """Прогревает func один раз и печатает p50/p95/max по repeat запускам (в мс)."""
+    await func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return report(label, timings)
+
+
+def report(label: str, timings: list[float]) -> list[float]:
+    """Печатает p50/p95/max для уже снятых замеров (в мс)."""
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{label:<40} p50={statistics.median(timings):8.2f} ms  p95={p95:8.2f} ms  max={timings[-1]:8.2f} ms")
+    return timings
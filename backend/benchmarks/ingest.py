@@ -0,0 +1,84 @@
+"""
+Бенчмарк приёма сообщений из WebSocket.
+
+--sockets конкурентных «сокетов» отправляют по --messages сообщений подряд, каждый
+ждёт подтверждения записи перед следующим. Сравниваются:
+- MessageService.create_message_for_member — запрос на каждое сообщение;
+- MessageGroupWriter — group commit пачками до --delay-ms мс / --max-batch сообщений.
+
+Запуск (из каталога backend):
+  python -m benchmarks.ingest --sockets 200 --messages 20
+"""
+import asyncio
+import time
+
+from sqlalchemy import insert
+
+from app.db.models import User, Chat, ChatParticipant, ChatType
+from app.services import MessageService, ChatService
+from app.services.message_writer import MessageGroupWriter
+from ._common import make_parser, reset_schema, make_uow_factory, bench_engine, report
+
+CHAT_SIZE = 10
+
+
+async def seed(engine, users: int) -> list[tuple[int, int]]:
+    """Пользователи по CHAT_SIZE в групповом чате; возвращает (chat_id, user_id) для каждого сокета."""
+    chats = (users + CHAT_SIZE - 1) // CHAT_SIZE
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [
+            {"username": f"bench{i}", "email": f"bench{i}@bench.ru", "password": "x"} for i in range(users)
+        ])
+        await conn.execute(insert(Chat), [{"chat_type": ChatType.GROUP, "title": f"chat {i}"} for i in range(chats)])
+        await conn.execute(insert(ChatParticipant), [
+            {"chat_id": user_id // CHAT_SIZE + 1, "user_id": user_id + 1} for user_id in range(users)
+        ])
+    return [(user_id // CHAT_SIZE + 1, user_id + 1) for user_id in range(users)]
+
+
+async def run(label: str, send, senders: list[tuple[int, int]], messages: int):
+    latencies = []
+
+    async def socket(chat_id: int, user_id: int):
+        for n in range(messages):
+            started = time.perf_counter()
+            await send(chat_id, user_id, f"message {n}")
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(socket(chat_id, user_id) for chat_id, user_id in senders))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<40} {len(latencies) / elapsed:10.0f} msg/s")
+    report("  задержка подтверждения", latencies)
+
+
+async def main():
+    parser = make_parser(__doc__)
+    parser.add_argument("--sockets", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=20, help="Сообщений на сокет")
+    parser.add_argument("--delay-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=500)
+    args = parser.parse_args()
+
+    async with bench_engine(args.database_url) as engine:
+        await reset_schema(engine)
+        senders = await seed(engine, args.sockets)
+        uow_factory = make_uow_factory(engine)
+        print(f"sockets={args.sockets} messages/socket={args.messages} chat_size={CHAT_SIZE}")
+
+        async def send_direct(chat_id, user_id, text):
+            await MessageService(uow_factory()).create_message_for_member(chat_id=chat_id, sender_id=user_id,
+                                                                         data=text)
+
+        writer = MessageGroupWriter(max_delay_ms=args.delay_ms, max_batch=args.max_batch, uow_factory=uow_factory)
+
+        await run("запрос на сообщение", send_direct, senders, args.messages)
+        await run(f"group commit ({args.delay_ms} мс / {args.max_batch})", writer.submit, senders, args.messages)
+        await writer.stop()
+        print("  пачек:", writer.stats())
+
+        print("сверка счётчиков:", await ChatService(uow_factory()).reconcile_counters())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+"""
+Бенчмарк проверки access-токена на запрос.
+
+На каждый HTTP-запрос токен проверяется дважды: в middleware (get_user_id_from_authorization,
+для read-your-writes) и в зависимости decode_jwt_access. Замеряется время этой пары на запрос
+без кэша и с access_token_cache; запросы идут от --tokens пользователей по очереди.
+БД не нужна.
+
+Запуск (из каталога backend):
+  python -m benchmarks.jwt_auth --tokens 1000 --requests 200000
+"""
+import asyncio
+import time
+
+from app.security import security
+from app.security.token_cache import access_token_cache
+from ._common import make_parser
+
+
+async def run(label: str, tokens: list[str], requests: int) -> None:
+    access_token_cache.clear()
+    started = time.perf_counter()
+    for n in range(requests):
+        token = tokens[n % len(tokens)]
+        security.get_user_id_from_authorization(f"Bearer {token}")
+        await security.decode_jwt_access(token)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<25} {elapsed / requests * 1e6:8.2f} мкс на запрос  ({requests / elapsed:,.0f} запросов/с)")
+
+
+async def main():
+    parser = make_parser(__doc__)
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200000)
+    args = parser.parse_args()
+
+    tokens = [
+        security.create_jwt_tokens({"user_id": n, "username": f"bench{n}", "session_id": "bench"})["access_token"]
+        for n in range(args.tokens)
+    ]
+    max_size = access_token_cache.max_size
+
+    access_token_cache.max_size = 0
+    await run("без кэша", tokens, args.requests)
+    access_token_cache.max_size = max_size
+    await run(f"кэш на {max_size} токенов", tokens, args.requests)
+    print(f"  {access_token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
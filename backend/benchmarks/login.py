@@ -0,0 +1,65 @@
+"""
+Бенчмарк входа: POST /users/login/ через ASGI-приложение без сети.
+
+Замеряется задержка входа и сколько на один вход приходится SQL-запросов,
+коммитов и выдач соединения из пула. Пароли хешируются со стоимостью из настроек —
+чтобы на фоне bcrypt была видна работа с БД, запускать с низкой стоимостью:
+
+  PASSWORD_HASH_ROUNDS=4 python -m benchmarks.login --users 1000 --repeat 500
+"""
+import asyncio
+from collections import Counter
+
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import event, insert
+
+from app.main import app
+from app.db.models import User
+from app.security.security import pwd_context
+from app.utils import get_unit_of_work
+from ._common import make_parser, reset_schema, make_uow_factory, bench_engine, measure
+
+
+async def main():
+    parser = make_parser(__doc__)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    async with bench_engine(args.database_url) as engine:
+        await reset_schema(engine)
+        password_hash = pwd_context.hash("Qwas12345")
+        async with engine.begin() as conn:
+            await conn.execute(insert(User), [
+                {"username": f"bench{i}", "email": f"bench{i}@bench.ru", "password": password_hash}
+                for i in range(args.users)
+            ])
+
+        uow_factory = make_uow_factory(engine)
+        app.dependency_overrides[get_unit_of_work] = uow_factory
+
+        counters = Counter()
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda *a: counters.update(["statements"]))
+        event.listen(engine.sync_engine, "commit", lambda *a: counters.update(["commits"]))
+        event.listen(engine.sync_engine.pool, "checkout", lambda *a: counters.update(["checkouts"]))
+
+        calls = 0
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            async def login():
+                nonlocal calls
+                calls += 1
+                user = f"bench{calls % args.users}"
+                response = await client.post("/users/login/", json={"username_or_email": user, "password": "Qwas12345"})
+                assert response.status_code == 200, response.text
+
+            await login()
+            counters.clear()
+            calls_before = calls
+            await measure("POST /users/login/", login, args.repeat)
+            logins = calls - calls_before
+        print("на один вход: " + ", ".join(f"{name}={counters[name] / logins:.1f}"
+                                           for name in ("statements", "commits", "checkouts")))
+        app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
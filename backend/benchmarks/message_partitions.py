@@ -0,0 +1,114 @@
+"""
+Бенчмарк секционирования messages.
+
+Таблица наполняется --messages сообщениями, секции по --partition-size id создаёт
+MessagePartitionMaintainer по мере роста. Рядом строится несекционированная копия
+messages_flat с теми же индексами. На обеих замеряются горячие запросы —
+последняя и глубокая страница истории, последнее сообщение и число непрочитанных —
+и для секционированной печатается, сколько секций реально прочитано (остальные
+отсечены при планировании или выполнении) и сколько буферов затронуто.
+
+Запуск (из каталога backend):
+  python -m benchmarks.message_partitions --messages 2000000 --partition-size 200000
+"""
+import asyncio
+import re
+
+from sqlalchemy import insert, text
+
+from app.core.config import settings
+from app.db.models import User, Chat, ChatType
+from app.services.message_partitions import MessagePartitionMaintainer
+from ._common import make_parser, reset_schema, make_uow_factory, bench_engine, measure
+
+USERS = 200
+
+QUERIES = [
+    ("история: последняя страница",
+     "SELECT id FROM {table} WHERE chat_id = :chat_id ORDER BY id DESC LIMIT 51"),
+    ("история: глубокая страница",
+     "SELECT id FROM {table} WHERE chat_id = :chat_id AND id < :old_id ORDER BY id DESC LIMIT 51"),
+    ("последнее сообщение",
+     "SELECT id FROM {table} WHERE chat_id = :chat_id AND is_deleted = false ORDER BY id DESC LIMIT 1"),
+    ("непрочитанные",
+     "SELECT count(*) FROM {table} WHERE chat_id = :chat_id AND id > :last_read_id "
+     "AND sender_id != :user_id AND is_deleted = false"),
+]
+
+
+async def seed(engine, maintainer, chats: int, count: int, chunk: int) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [
+            {"username": f"bench{i}", "email": f"bench{i}@bench.ru", "password": "x"} for i in range(USERS)
+        ])
+        await conn.execute(insert(Chat), [{"chat_type": ChatType.GROUP, "title": f"chat{i}"} for i in range(chats)])
+    for start in range(0, count, chunk):
+        # Секции создаются заранее, как это делает фоновая задача в приложении
+        await maintainer.run_once()
+        async with engine.begin() as conn:
+            await conn.execute(
+                text(
+                    "INSERT INTO messages (chat_id, sender_id, content) "
+                    "SELECT 1 + (random() * (:chats - 1))::int, 1 + (random() * (:users - 1))::int, 'сообщение ' || g "
+                    "FROM generate_series(1, :n) g"
+                ),
+                {"chats": chats, "users": USERS, "n": min(chunk, count - start)},
+            )
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP TABLE IF EXISTS messages_flat"))
+        await conn.execute(text("CREATE TABLE messages_flat AS SELECT * FROM messages"))
+        await conn.execute(text("ALTER TABLE messages_flat ADD PRIMARY KEY (id)"))
+        await conn.execute(text("CREATE INDEX ON messages_flat (chat_id, id)"))
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE messages"))
+        await conn.execute(text("VACUUM ANALYZE messages_flat"))
+
+
+def summarize_plan(lines: list[str], partitions: int) -> str:
+    scanned = {m.group(1) for line in lines if "never executed" not in line
+               for m in [re.search(r" on (messages_(?:p\d+|default))", line)] if m}
+    removed = sum(int(m.group(1)) for line in lines for m in [re.search(r"Subplans Removed: (\d+)", line)] if m)
+    buffers = next((line.strip() for line in lines if "Buffers:" in line), "")
+    return f"прочитано секций: {len(scanned)} из {partitions}, отсечено при выполнении: {removed}, {buffers}"
+
+
+async def main():
+    parser = make_parser(__doc__)
+    parser.add_argument("--messages", type=int, default=2_000_000)
+    parser.add_argument("--chats", type=int, default=2000)
+    parser.add_argument("--partition-size", type=int, default=200_000)
+    args = parser.parse_args()
+
+    # Начальные секции при create_all тоже создаются этого размера
+    settings.MESSAGES_PARTITION_SIZE = args.partition_size
+    async with bench_engine(args.database_url) as engine:
+        await reset_schema(engine)
+        maintainer = MessagePartitionMaintainer(interval=0, size=args.partition_size, ahead=1,
+                                                uow_factory=make_uow_factory(engine))
+        await seed(engine, maintainer, args.chats, args.messages, args.partition_size)
+        async with engine.connect() as conn:
+            chat_id, user_id, max_id = (await conn.execute(text(
+                "SELECT chat_id, min(sender_id), max(id) FROM messages GROUP BY chat_id ORDER BY count(*) DESC LIMIT 1"
+            ))).one()
+        params = {"chat_id": chat_id, "user_id": user_id,
+                  "old_id": max_id // 4, "last_read_id": max_id - args.partition_size // 2}
+        print(f"messages={args.messages} chats={args.chats} partitions={maintainer.partitions} "
+              f"partition_size={args.partition_size}")
+
+        for label, sql in QUERIES:
+            for table in ("messages", "messages_flat"):
+                statement = text(sql.format(table=table))
+
+                async def run():
+                    async with engine.connect() as conn:
+                        await conn.execute(statement, params)
+
+                await measure(f"  {label} [{table}]", run, args.repeat)
+            async with engine.connect() as conn:
+                plan = await conn.execute(text("EXPLAIN (ANALYZE, BUFFERS) " + sql.format(table="messages")), params)
+                print(f"    {summarize_plan(list(plan.scalars()), maintainer.partitions)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
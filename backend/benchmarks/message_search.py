@@ -0,0 +1,122 @@
+"""
+Бенчмарк поиска по сообщениям.
+
+Таблица messages наращивается шагами (--steps), на каждом шаге замеряется
+MessageRepository.search — по всем чатам пользователя и в одном чате, на частом
+и редком слове, по префиксу и фразе — и для сравнения ILIKE '%слово%' по тем же чатам.
+Поиск через GIN не должен заметно замедляться с ростом таблицы, ILIKE растёт линейно.
+
+Запуск (из каталога backend):
+  python -m benchmarks.message_search --chats 500 --steps 200000,800000
+"""
+import asyncio
+import random
+
+from sqlalchemy import insert, select, text
+
+from app.core.config import settings
+from app.db.models import User, Chat, ChatParticipant, Message, ChatType
+from app.utils.search import build_tsquery
+from ._common import make_parser, reset_schema, make_uow_factory, bench_engine, measure
+
+USERS = 200
+MEMBERS_PER_CHAT = 10
+
+# Частые слова встречаются в большинстве сообщений, редкое — примерно в одном из 20 000
+COMMON_WORDS = ["привет", "сегодня", "задача", "отчёт", "встреча", "проект", "вопрос", "сделать", "завтра", "время"]
+FILLER_WORDS = [f"слово{n}" for n in range(5000)]
+RARE_WORD = "квазар"
+
+
+def random_content() -> str:
+    words = random.sample(COMMON_WORDS, 3) + random.choices(FILLER_WORDS, k=random.randint(3, 12))
+    if random.random() < 0.00005:
+        words.append(RARE_WORD)
+    random.shuffle(words)
+    return " ".join(words)
+
+
+async def seed_chats(engine, chats: int) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [
+            {"username": f"bench{i}", "email": f"bench{i}@bench.ru", "password": "x"} for i in range(USERS)
+        ])
+        await conn.execute(insert(Chat), [{"chat_type": ChatType.GROUP, "title": f"chat{i}"} for i in range(chats)])
+        participants = []
+        for chat_id in range(1, chats + 1):
+            for user_id in random.sample(range(1, USERS + 1), MEMBERS_PER_CHAT):
+                participants.append({"chat_id": chat_id, "user_id": user_id, "last_read_message_id": 0})
+        await conn.execute(insert(ChatParticipant), participants)
+
+
+async def grow_messages(engine, chats: int, count: int) -> None:
+    for start in range(0, count, 5000):
+        rows = [
+            {"chat_id": random.randint(1, chats), "sender_id": random.randint(1, USERS), "content": random_content()}
+            for _ in range(min(5000, count - start))
+        ]
+        async with engine.begin() as conn:
+            await conn.execute(insert(Message), rows)
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE messages"))
+
+
+async def measure_step(uow_factory, user_id: int, chat_id: int, repeat: int) -> None:
+    cases = [
+        ("по всем чатам, частое слово", "отчёт", None),
+        ("по всем чатам, редкое слово", RARE_WORD, None),
+        ("по всем чатам, префикс", "встр*", None),
+        ("по всем чатам, фраза", '"привет сегодня"', None),
+        ("в одном чате, частое слово", "отчёт", chat_id),
+    ]
+    for label, q, in_chat in cases:
+        query = build_tsquery(q)
+
+        async def search():
+            async with uow_factory() as uow:
+                await uow.message.search(query, user_id=user_id, chat_id=in_chat, limit=20,
+                                         max_candidates=settings.MESSAGE_SEARCH_MAX_CANDIDATES)
+
+        await measure(f"  search: {label}", search, repeat)
+
+    async def ilike():
+        async with uow_factory() as uow:
+            chats_of_user = select(ChatParticipant.chat_id).where(ChatParticipant.user_id == user_id)
+            stmt = (
+                select(Message.id)
+                .where(Message.chat_id.in_(chats_of_user), Message.content.ilike(f"%{RARE_WORD}%"))
+                .order_by(Message.id.desc())
+                .limit(20)
+            )
+            await uow.session.execute(stmt)
+
+    await measure("  ILIKE по всем чатам, редкое слово", ilike, repeat)
+
+
+async def main():
+    parser = make_parser(__doc__)
+    parser.add_argument("--chats", type=int, default=500)
+    parser.add_argument("--steps", default="200000,800000", help="Размеры таблицы messages через запятую")
+    args = parser.parse_args()
+    steps = sorted(int(step) for step in args.steps.split(","))
+
+    async with bench_engine(args.database_url) as engine:
+        await reset_schema(engine)
+        await seed_chats(engine, args.chats)
+        uow_factory = make_uow_factory(engine)
+        async with engine.connect() as conn:
+            user_id, chat_id = (await conn.execute(
+                select(ChatParticipant.user_id, ChatParticipant.chat_id).limit(1)
+            )).one()
+
+        total = 0
+        for step in steps:
+            await grow_messages(engine, args.chats, step - total)
+            total = step
+            print(f"messages={total} chats={args.chats}")
+            await measure_step(uow_factory, user_id, chat_id, args.repeat)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
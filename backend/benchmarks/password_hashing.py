@@ -0,0 +1,65 @@
+"""
+Бенчмарк проверки паролей при шторме входов.
+
+Одновременно запускается --logins проверок bcrypt — прямо в event loop, как раньше,
+и через PasswordHasher. Рядом крутится задача, которая просыпается каждые 5 мс:
+её задержки — это то, насколько в это время опаздывает доставка сообщений по WebSocket.
+БД не нужна.
+
+Запуск (из каталога backend):
+  python -m benchmarks.password_hashing --logins 20 --workers 2
+"""
+import asyncio
+import time
+
+from app.core.config import settings
+from app.security.password_hasher import PasswordHasher
+from app.security.security import pwd_context
+from ._common import make_parser, report
+
+TICK = 0.005
+
+
+async def ticker(stop: asyncio.Event, lags: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - started - TICK) * 1000)
+
+
+async def storm(label: str, verify, logins: int, password_hash: str) -> None:
+    stop, lags = asyncio.Event(), []
+    task = asyncio.create_task(ticker(stop, lags))
+    await asyncio.sleep(TICK * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*[verify("Qwas12345", password_hash) for _ in range(logins)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await task
+    print(f"{label}: {logins} проверок за {elapsed:.2f} с")
+    report("  задержка event loop", lags)
+
+
+async def main():
+    parser = make_parser(__doc__)
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=settings.PASSWORD_HASH_WORKERS)
+    args = parser.parse_args()
+
+    password_hash = pwd_context.hash("Qwas12345")
+    print(f"bcrypt rounds={settings.PASSWORD_HASH_ROUNDS}")
+
+    async def inline(password, hashed):
+        return pwd_context.verify(password, hashed)
+
+    await storm("в event loop", inline, args.logins, password_hash)
+
+    hasher = PasswordHasher(pwd_context, workers=args.workers, max_pending=0)
+    await storm(f"пул из {args.workers} потоков", hasher.verify, args.logins, password_hash)
+    stats = hasher.stats()
+    print(f"  ожидание в очереди p95={stats['wait_p95_ms']} ms  max={stats['wait_max_ms']} ms")
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
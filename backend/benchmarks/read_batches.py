@@ -0,0 +1,127 @@
+"""
+Бенчмарк сжатия message_read_batches.
+
+Засевает несколько чатов с общими участниками, где каждый участник присылал батчи
+прочтения подряд раз в минуту (как фронт), часть батчей — с повторами и пересечениями.
+id сообщений общие для всех чатов, поэтому диапазон одного чата накрывает и id других. Печатает размер таблицы
+и время запросов «кто прочитал сообщение» / «читатели диапазона» до и после
+ReadBatchCompactor.run_once — старым условием from_id/to_id (b-tree) и через
+read_range @> id (GiST). После сжатия таблица перепаковывается VACUUM FULL,
+чтобы размер на диске отражал число строк.
+
+Запуск (из каталога backend):
+  python -m benchmarks.read_batches --users 50 --chats 20 --batches 200
+"""
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, text
+
+from app.db.models import User, Chat, ChatParticipant, Message, MessageReadBatch, ChatType
+from app.services.read_batch_compactor import ReadBatchCompactor
+from ._common import make_parser, reset_schema, make_uow_factory, bench_engine, measure
+
+BATCH_SIZE = 20
+
+
+async def seed(engine, users: int, chats: int, batches: int) -> None:
+    # id сообщений общие для всех чатов: сообщения чатов идут вперемешку,
+    # n-е сообщение чата c имеет id n * chats + c
+    started = datetime.now(timezone.utc) - timedelta(minutes=batches)
+    rows = []
+    for chat_id in range(1, chats + 1):
+        for user_id in range(1, users + 1):
+            for n in range(batches):
+                first = n * BATCH_SIZE
+                read_at = started + timedelta(minutes=n, seconds=user_id)
+                # Батч заканчивается перед первым сообщением следующего: подряд идущие батчи стыкуются,
+                # но прочитаны в разное время и после сжатия остаются отдельными строками
+                rows.append({"user_id": user_id, "chat_id": chat_id, "from_id": message_id(first, chat_id, chats),
+                             "to_id": message_id(first + BATCH_SIZE, chat_id, chats) - 1, "read_at": read_at})
+                if random.random() < 0.1:
+                    # Повторная отправка с перекрытием (другая вкладка, переподключение):
+                    # сжатие режет её и следующий батч, у каждого сообщения остаётся ранний read_at
+                    rows.append({"user_id": user_id, "chat_id": chat_id,
+                                 "from_id": message_id(first + BATCH_SIZE // 2, chat_id, chats),
+                                 "to_id": message_id(first + BATCH_SIZE * 2 - 1, chat_id, chats),
+                                 "read_at": read_at + timedelta(seconds=30)})
+    random.shuffle(rows)
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [
+            {"username": f"bench{i}", "email": f"bench{i}@bench.ru", "password": "x"} for i in range(users)
+        ])
+        await conn.execute(insert(Chat), [{"chat_type": ChatType.GROUP, "title": f"chat{i}"} for i in range(chats)])
+        await conn.execute(insert(ChatParticipant), [
+            {"chat_id": chat_id, "user_id": user_id, "last_read_message_id": 0}
+            for chat_id in range(1, chats + 1) for user_id in range(1, users + 1)
+        ])
+        messages = [{"chat_id": n % chats + 1, "sender_id": 1, "content": f"message {n}"}
+                    for n in range(batches * BATCH_SIZE * chats)]
+        for start in range(0, len(messages), 5000):
+            await conn.execute(insert(Message), messages[start:start + 5000])
+        for start in range(0, len(rows), 5000):
+            await conn.execute(insert(MessageReadBatch), rows[start:start + 5000])
+
+
+def message_id(n: int, chat_id: int, chats: int) -> int:
+    """id n-го сообщения чата chat_id (при засеве сообщения чатов чередуются)."""
+    return n * chats + chat_id
+
+
+async def report_table(engine, label: str) -> None:
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE message_read_batches"))
+        rows = await conn.scalar(text("SELECT count(*) FROM message_read_batches"))
+        size = await conn.scalar(text("SELECT pg_size_pretty(pg_total_relation_size('message_read_batches'))"))
+    print(f"{label}: строк={rows} размер (с индексами)={size}")
+
+
+async def measure_queries(uow_factory, target_id: int, span: int, repeat: int) -> None:
+    for legacy, label in ((True, "from_id/to_id"), (False, "read_range @>")):
+        async def readers_for_message():
+            async with uow_factory() as uow:
+                await uow.message_read_batch.get_readers_for_message(1, target_id, exclude_user_id=0, legacy=legacy)
+
+        async def readers_for_range():
+            async with uow_factory() as uow:
+                await uow.message_read_batch.get_readers_for_range(1, target_id, target_id + span, legacy=legacy)
+
+        await measure(f"  readers_for_message [{label}]", readers_for_message, repeat)
+        await measure(f"  readers_for_range 50 id [{label}]", readers_for_range, repeat)
+
+
+async def main():
+    parser = make_parser(__doc__)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--batches", type=int, default=200, help="Батчей на пользователя в каждом чате")
+    args = parser.parse_args()
+
+    async with bench_engine(args.database_url) as engine:
+        await reset_schema(engine)
+        await seed(engine, args.users, args.chats, args.batches)
+        uow_factory = make_uow_factory(engine)
+        # Ближе к концу истории: старому условию from_id <= M приходится пройти почти всё
+        target_id = message_id(args.batches * BATCH_SIZE * 9 // 10, 1, args.chats)
+        # 50 сообщений чата 1 подряд
+        span = 49 * args.chats
+
+        print(f"users={args.users} chats={args.chats} batches/user/chat={args.batches}")
+        await report_table(engine, "до сжатия")
+        await measure_queries(uow_factory, target_id, span, args.repeat)
+
+        compactor = ReadBatchCompactor(interval=0, batch_pairs=1000, uow_factory=uow_factory)
+        result = await compactor.run_once()
+        print(f"сжатие: пар={result['pairs']} строк {result['rows_before']} -> {result['rows_after']}")
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("VACUUM FULL message_read_batches"))
+
+        await report_table(engine, "после сжатия")
+        await measure_queries(uow_factory, target_id, span, args.repeat)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+"""
+Бенчмарк отметок о прочтении (POST /messages/read/{message_id}/).
+
+--clients клиентов «прокручивают» свой чат: каждый отмечает --reads сообщений подряд
+с паузой --pause-ms между отметками. Сравниваются:
+- старый путь — сообщение + участник + UPDATE + commit + повторная загрузка сообщения на каждый вызов;
+- ChatService.update_last_message_read с записью сразу (READ_WATERMARK_FLUSH_MS=0);
+- он же с write-behind буфером (--flush-ms).
+Печатается пропускная способность, задержка вызова и сколько строк chat_participants
+реально обновила БД (pg_stat_user_tables.n_tup_upd).
+
+Запуск (из каталога backend):
+  python -m benchmarks.read_watermarks --clients 100 --reads 50 --flush-ms 500
+"""
+import asyncio
+import time
+
+from sqlalchemy import insert, text
+
+from app.db.models import User, Chat, ChatParticipant, Message, ChatType
+from app.services import ChatService
+from app.services.read_watermarks import read_watermarks
+from ._common import make_parser, reset_schema, make_uow_factory, bench_engine, report
+
+CHAT_SIZE = 10
+
+
+async def seed(engine, clients: int, reads: int) -> list[tuple[int, list[int]]]:
+    """Клиенты по CHAT_SIZE в чате; возвращает (user_id, id сообщений его чата по порядку)."""
+    chats = (clients + CHAT_SIZE - 1) // CHAT_SIZE
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [
+            {"username": f"bench{i}", "email": f"bench{i}@bench.ru", "password": "x"} for i in range(clients)
+        ])
+        await conn.execute(insert(Chat), [{"chat_type": ChatType.GROUP, "title": f"chat {i}"} for i in range(chats)])
+        await conn.execute(insert(ChatParticipant), [
+            {"chat_id": user_id // CHAT_SIZE + 1, "user_id": user_id + 1, "last_read_message_id": 0}
+            for user_id in range(clients)
+        ])
+        await conn.execute(insert(Message), [
+            {"chat_id": chat_id, "sender_id": (chat_id - 1) * CHAT_SIZE + 1, "content": f"message {n}"}
+            for chat_id in range(1, chats + 1) for n in range(reads)
+        ])
+    # Сообщения вставлены чат за чатом, id идут подряд
+    return [
+        (user_id + 1, [(user_id // CHAT_SIZE) * reads + n + 1 for n in range(reads)])
+        for user_id in range(clients)
+    ]
+
+
+async def legacy_read(uow, user_id: int, message_id: int):
+    async with uow:
+        message = await uow.message.get_one(pk=message_id)
+        chat_participant = await uow.chat_participant.get_one_by(chat_id=message.chat_id, user_id=user_id)
+        chat_participant.last_read_message_id = message_id
+        await uow.chat_participant.refresh_unread_count(chat_id=message.chat_id, user_id=user_id)
+        await uow.commit()
+    async with uow:
+        await uow.message.get_one(pk=message_id)
+
+
+async def updated_rows(engine) -> int:
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT pg_stat_force_next_flush()"))
+        await conn.commit()
+    await asyncio.sleep(0.5)
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT pg_stat_clear_snapshot()"))
+        return await conn.scalar(text(
+            "SELECT n_tup_upd FROM pg_stat_user_tables WHERE relname = 'chat_participants'"
+        ))
+
+
+async def run(label: str, engine, read, clients: list, pause: float, flush=None):
+    await engine.dispose()
+    async with engine.begin() as conn:
+        await conn.execute(text("UPDATE chat_participants SET last_read_message_id = 0"))
+    before = await updated_rows(engine)
+    latencies = []
+
+    async def client(user_id: int, message_ids: list[int]):
+        for message_id in message_ids:
+            started = time.perf_counter()
+            await read(user_id, message_id)
+            latencies.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(pause)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(user_id, message_ids) for user_id, message_ids in clients))
+    if flush is not None:
+        await flush()
+    elapsed = time.perf_counter() - started
+    # Сбрасываем и UPDATE подготовки: он обновил по строке на клиента
+    updated = await updated_rows(engine) - before
+    print(f"{label:<40} {len(latencies) / elapsed:8.0f} отметок/с  строк обновлено: {updated}")
+    report("  задержка вызова", latencies)
+
+
+async def main():
+    parser = make_parser(__doc__)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--reads", type=int, default=50, help="Отметок на клиента")
+    parser.add_argument("--pause-ms", type=float, default=20.0, help="Пауза между отметками клиента")
+    parser.add_argument("--flush-ms", type=float, default=500.0)
+    args = parser.parse_args()
+
+    async with bench_engine(args.database_url) as engine:
+        await reset_schema(engine)
+        clients = await seed(engine, args.clients, args.reads)
+        uow_factory = make_uow_factory(engine)
+        read_watermarks.uow_factory = uow_factory
+        pause = args.pause_ms / 1000
+        print(f"clients={args.clients} reads/client={args.reads} pause={args.pause_ms} мс")
+
+        async def read_service(user_id, message_id):
+            await ChatService(uow_factory()).update_last_message_read(user_id=user_id, message_id=message_id)
+
+        await run("старый путь", engine, lambda u, m: legacy_read(uow_factory(), u, m), clients, pause)
+        read_watermarks.flush_interval = 0
+        await run("запись сразу", engine, read_service, clients, pause)
+        read_watermarks.flush_interval = args.flush_ms / 1000
+        read_watermarks.counters.clear()
+        await run(f"write-behind ({args.flush_ms} мс)", engine, read_service, clients, pause,
+                  flush=read_watermarks.stop)
+        print("  буфер:", read_watermarks.stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""
+Бенчмарк списка чатов (GET /chats/).
+
+Сравнивает старый путь — по 4 запроса на каждый чат пользователя
+(get_last_for_chat, chat_participant.get_one_by, get_max_other_read_id,
+get_unread_count) — с ChatRepository.get_sidebar_for_user, который отдаёт
+весь сайдбар одним запросом.
+
+Запуск (из каталога backend):
+  python -m benchmarks.sidebar --chats 300 --messages 50
+"""
+import asyncio
+
+from sqlalchemy import insert
+
+from app.db.models import User, Chat, ChatParticipant, Message, ChatType
+from app.services import ChatService
+from ._common import make_parser, reset_schema, make_uow_factory, bench_engine, measure
+
+
+async def seed(engine, chats: int, messages: int) -> int:
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [
+            {"username": f"bench{i}", "email": f"bench{i}@bench.ru", "password": "x"} for i in range(2)
+        ])
+        await conn.execute(insert(Chat), [
+            {"chat_type": ChatType.GROUP, "title": f"chat {i}"} for i in range(chats)
+        ])
+        await conn.execute(insert(ChatParticipant), [
+            {"chat_id": chat_id, "user_id": user_id, "last_read_message_id": 0}
+            for chat_id in range(1, chats + 1) for user_id in (1, 2)
+        ])
+        await conn.execute(insert(Message), [
+            {"chat_id": chat_id, "sender_id": 1 + (n % 2), "content": f"message {n}"}
+            for chat_id in range(1, chats + 1) for n in range(messages)
+        ])
+    return 1
+
+
+async def legacy_sidebar(uow, user_id: int) -> int:
+    async with uow:
+        chats = await uow.chat.get_all_for_user(user_id)
+        for chat in chats:
+            await uow.message.get_last_for_chat(chat.id)
+            chat_participant = await uow.chat_participant.get_one_by(chat_id=chat.id, user_id=user_id)
+            await uow.chat_participant.get_max_other_read_id(chat_id=chat.id, user_id=user_id)
+            await uow.message.get_unread_count(
+                last_read_message_id=chat_participant.last_read_message_id,
+                user_id=user_id,
+                chat_id=chat.id,
+            )
+        return len(chats)
+
+
+async def single_query_sidebar(uow, user_id: int) -> int:
+    async with uow:
+        return len(await uow.chat.get_sidebar_for_user(user_id))
+
+
+async def main():
+    parser = make_parser(__doc__)
+    parser.add_argument("--chats", type=int, default=300)
+    parser.add_argument("--messages", type=int, default=50, help="Сообщений в каждом чате")
+    args = parser.parse_args()
+
+    async with bench_engine(args.database_url) as engine:
+        await reset_schema(engine)
+        user_id = await seed(engine, args.chats, args.messages)
+        uow_factory = make_uow_factory(engine)
+        await ChatService(uow_factory()).reconcile_counters()
+
+        print(f"chats={args.chats} messages/chat={args.messages}")
+        await measure("legacy (4 запроса на чат)", lambda: legacy_sidebar(uow_factory(), user_id), args.repeat)
+        await measure("get_sidebar_for_user (1 запрос)", lambda: single_query_sidebar(uow_factory(), user_id),
+                      args.repeat)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
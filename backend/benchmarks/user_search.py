@@ -0,0 +1,95 @@
+"""
+Бенчмарк автодополнения пользователей.
+
+Сравнивает старый POST /users/get_all_users/ (вся таблица, время и размер ответа)
+с UserService.search на запросах в 1, 2 и 3 символа и на поиске по вхождению —
+без кэша и с кэшем коротких запросов. Печатает план запроса по вхождению,
+чтобы было видно, что используются триграммные индексы.
+
+Запуск (из каталога backend):
+  python -m benchmarks.user_search --users 100000
+"""
+import asyncio
+import json
+import random
+import string
+
+from sqlalchemy import insert, text
+
+from app.db.models import User
+from app.services import UserService
+from app.utils.user_search_cache import user_search_cache
+from ._common import make_parser, reset_schema, make_uow_factory, bench_engine, measure
+
+SYLLABLES = ["al", "ex", "an", "dr", "ma", "ri", "ko", "va", "se", "ny", "ol", "ga", "ti", "mu", "ber", "son"]
+QUERIES = [
+    ("1 символ", "a"),
+    ("2 символа", "al"),
+    ("3 символа", "ale"),
+    ("вхождение", "riko"),
+    ("почта", "mail.ru"),
+]
+
+
+def random_username(i: int) -> str:
+    name = "".join(random.choices(SYLLABLES, k=random.randint(2, 4)))
+    return f"{name}_{i}" if random.random() < 0.5 else f"{name}{i}"
+
+
+async def seed_users(engine, count: int) -> None:
+    for start in range(0, count, 10000):
+        rows = []
+        for i in range(start, min(start + 10000, count)):
+            username = random_username(i)
+            domain = random.choice(["mail.ru", "gmail.com", "yandex.ru", "".join(random.choices(string.ascii_lowercase, k=6)) + ".org"])
+            rows.append({"username": username, "email": f"{username}@{domain}",
+                         "phone": f"+79{i * 7919 % 10**9:09d}", "password": "x"})
+        async with engine.begin() as conn:
+            await conn.execute(insert(User), rows)
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE users"))
+
+
+async def main():
+    parser = make_parser(__doc__)
+    parser.add_argument("--users", type=int, default=100000)
+    args = parser.parse_args()
+
+    async with bench_engine(args.database_url) as engine:
+        await reset_schema(engine)
+        await seed_users(engine, args.users)
+        uow_factory = make_uow_factory(engine)
+        print(f"users={args.users}")
+
+        async def get_all():
+            users = await UserService(uow_factory()).get_all(exception_id=1)
+            return json.dumps([user.model_dump(mode="json") for user in users])
+
+        payload = await get_all()
+        await measure(f"get_all_users ({len(payload) // 1024} КБ)", get_all, max(1, args.repeat // 5))
+
+        cache_ttl = user_search_cache.ttl
+        for cached in (False, True):
+            user_search_cache.ttl = cache_ttl if cached else 0
+            user_search_cache.clear()
+            print("с кэшем" if cached else "без кэша")
+            for label, query in QUERIES:
+                async def search():
+                    users = await UserService(uow_factory()).search(query, 20, exclude_id=1)
+                    return json.dumps([user.model_dump(mode="json") for user in users])
+
+                payload = await search()
+                await measure(f"  search: {label} ({len(payload) // 1024} КБ)", search, args.repeat)
+        user_search_cache.ttl = cache_ttl
+
+        async with engine.connect() as conn:
+            plan = await conn.execute(text(
+                "EXPLAIN ANALYZE SELECT id FROM users "
+                "WHERE lower(username) LIKE '%riko%' OR lower(email) LIKE '%riko%' LIMIT 21"
+            ))
+            print("\n".join(plan.scalars()))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
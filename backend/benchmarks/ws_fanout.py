@@ -0,0 +1,146 @@
+"""
+Бенчмарк рассылки WebSocket-событий (ConnectionManager.broadcast).
+
+Сравнивает прежнюю рассылку — последовательный send_json в каждый сокет
+со сборкой и сериализацией payload на каждое соединение — с текущей:
+JSON кодируется один раз и раскладывается по исходящим очередям соединений,
+а в сокеты пишут их собственные задачи-писатели.
+
+Замеряется задержка доставки: время от вызова broadcast до получения события
+последним «быстрым» клиентом. Сокеты поддельные: отправка кодирует данные так же,
+как Starlette, и ждёт --latency секунд (0 — только отдаёт управление циклу событий).
+--slow добавляет медленных клиентов, которые отвечают через --slow-delay секунд;
+в задержку доставки они не входят.
+
+Запуск (из каталога backend, БД не нужна):
+  python -m benchmarks.ws_fanout --recipients 10 1000 10000 --slow 1
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from app.utils.websocket import ConnectionManager
+from app.utils.Broadcast import InMemoryBroadcast
+from ._common import report
+
+logger = logging.getLogger(__name__)
+
+SENDER = {
+    "id": 1, "username": "bench", "email": "bench@bench.ru",
+    "created_at": "2026-01-01T00:00:00+00:00", "updated_at": "2026-01-01T00:00:00+00:00",
+}
+EXTRA = dict(created_at="2026-01-01T00:00:00+00:00", updated_at="2026-01-01T00:00:00+00:00", sender=SENDER)
+
+
+class Countdown:
+    def __init__(self, count: int):
+        self.count = count
+        self.done = asyncio.Event()
+
+    def tick(self):
+        self.count -= 1
+        if self.count <= 0:
+            self.done.set()
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0, countdown: Countdown | None = None):
+        self.delay = delay
+        self.countdown = countdown
+        self.received_at: float | None = None
+
+    async def _write(self):
+        await asyncio.sleep(self.delay)
+        self.received_at = time.perf_counter()
+        if self.countdown is not None:
+            self.countdown.tick()
+
+    async def send_json(self, data: dict):
+        json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+        await self._write()
+
+    async def send_text(self, data: str):
+        await self._write()
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def legacy_broadcast(active_connections: dict, receivers_id: list[int], sender_id: int, **kwargs):
+    for receiver_id in receivers_id:
+        if receiver_id in active_connections:
+            for connection in list(active_connections[receiver_id]):
+                for_send_json = {
+                    'type_of_message': 0,
+                    "message_id": 1,
+                    "text": "текст сообщения",
+                    "chat_id": 1,
+                    "sender_id": sender_id,
+                    "it_self": receiver_id == sender_id,
+                    "file": None,
+                }
+                for_send_json.update(**kwargs)
+                logger.debug(for_send_json)
+                await connection.send_json(for_send_json)
+
+
+def make_sockets(recipients: int, args, countdown: Countdown | None = None) -> dict[int, FakeWebSocket]:
+    return {
+        user_id: FakeWebSocket(args.slow_delay, None) if user_id <= args.slow else FakeWebSocket(args.latency, countdown)
+        for user_id in range(1, recipients + 1)
+    }
+
+
+def fanout_ms(sockets: dict[int, FakeWebSocket], started: float, args) -> float:
+    fast = [socket.received_at for user_id, socket in sockets.items() if user_id > args.slow]
+    return (max(fast) - started) * 1000
+
+
+async def run_legacy(recipients: int, args) -> float:
+    sockets = make_sockets(recipients, args)
+    connections = {user_id: [socket] for user_id, socket in sockets.items()}
+    started = time.perf_counter()
+    await legacy_broadcast(connections, list(sockets), 1, **EXTRA)
+    return fanout_ms(sockets, started, args)
+
+
+async def run_current(recipients: int, args) -> float:
+    countdown = Countdown(recipients - args.slow)
+    sockets = make_sockets(recipients, args, countdown)
+    manager = ConnectionManager(InMemoryBroadcast())
+    if args.send_timeout is not None:
+        manager.send_timeout = args.send_timeout
+    await manager.startup()
+    for user_id, socket in sockets.items():
+        await manager.connect(socket, user_id)
+
+    started = time.perf_counter()
+    await manager.broadcast(type_of_message=0, message="текст сообщения", chat_id=1,
+                            receivers_id=list(sockets), message_id=1, sender_id=1, **EXTRA)
+    await countdown.done.wait()
+    result = fanout_ms(sockets, started, args)
+    await manager.shutdown()
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--recipients", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=10, help="Сколько раз повторить замер")
+    parser.add_argument("--latency", type=float, default=0, help="Задержка отправки у обычного клиента, с")
+    parser.add_argument("--slow", type=int, default=0, help="Сколько медленных клиентов среди получателей")
+    parser.add_argument("--slow-delay", type=float, default=0.5)
+    parser.add_argument("--send-timeout", type=float, default=None, help="По умолчанию settings.WS_SEND_TIMEOUT")
+    args = parser.parse_args()
+
+    for recipients in args.recipients:
+        print(f"recipients={recipients} latency={args.latency}s slow={args.slow} slow_delay={args.slow_delay}s")
+        for label, run in (("legacy (последовательно)", run_legacy), ("broadcast (конкурентно)", run_current)):
+            await run(recipients, args)
+            report(label, [await run(recipients, args) for _ in range(args.repeat)])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
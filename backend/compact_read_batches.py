@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+compact_read_batches.py — сжатие таблицы message_read_batches.
+
+Разрезает пересекающиеся диапазоны прочтения каждой пары (пользователь, чат)
+и склеивает соседние с одинаковым read_at, сохраняя для каждого сообщения самый ранний read_at.
+То же самое делает фоновое сжатие в приложении (READ_BATCH_COMPACT_INTERVAL);
+скрипт нужен для разового прохода, например после заливки данных или при выключенном фоне.
+
+Запуск:
+  python compact_read_batches.py
+"""
+import asyncio
+
+from app.core.config import settings
+from app.services.read_batch_compactor import ReadBatchCompactor
+
+
+async def main() -> None:
+    compactor = ReadBatchCompactor(interval=0, batch_pairs=settings.READ_BATCH_COMPACT_PAIRS)
+    result = await compactor.run_once()
+    print(f"Обработано пар: {result['pairs']}, строк: {result['rows_before']} -> {result['rows_after']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
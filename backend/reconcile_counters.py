@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+reconcile_counters.py — пересчёт денормализованных счётчиков чатов.
+
+Пересобирает с нуля по таблице messages:
+  - chats.message_count, chats.last_message_id, chats.last_message_at
+  - chat_participants.unread_count
+
+Нужен после ручных правок БД, заливки данных в обход сервисов (например seed_db.py)
+или если счётчики разошлись с реальностью.
+
+Запуск:
+  python reconcile_counters.py               # все чаты
+  python reconcile_counters.py --chat-id 42  # один чат
+"""
+import argparse
+import asyncio
+
+from app.services import ChatService
+from app.utils.unit_of_work import UnitOfWork
+
+
+async def main(chat_id: int | None) -> None:
+    result = await ChatService(UnitOfWork()).reconcile_counters(chat_id=chat_id)
+    print(f"Обновлено чатов: {result['chats']}, участников: {result['participants']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пересчёт денормализованных счётчиков чатов")
+    parser.add_argument("--chat-id", type=int, default=None, help="Пересчитать только этот чат")
+    args = parser.parse_args()
+    asyncio.run(main(args.chat_id))
@@ -1,13 +1,17 @@
 import pytest_asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from httpx import AsyncClient, ASGITransport
+from fastapi import Depends
 from sqlalchemy.pool import NullPool
 
 from app.main import app
 from app.db.database import Base
 from app.core.config import settings
-from app.app.endpoints.users import get_unit_of_work
+from app.app.endpoints.users import get_unit_of_work, get_read_unit_of_work
+from app.security import security
 from app.utils.unit_of_work import UnitOfWork
+from app.db.models import User
+from sqlalchemy import select
 
 @pytest_asyncio.fixture(scope='module')
 async def engine():
@@ -31,13 +35,40 @@ async def db_session(async_session_maker):
 @pytest_asyncio.fixture
 async def client(async_session_maker):
     async def override_uow():
-        uow = UnitOfWork()
+        uow = UnitOfWork(request_scoped=True)
         uow.session_factory = async_session_maker
-        return uow
+        try:
+            yield uow
+            await uow.finish()
+        finally:
+            await uow.close()
+
+    async def override_read_uow(access_token = Depends(security.decode_jwt_access)):
+        uow = UnitOfWork(request_scoped=True, read_only=True, user_id=access_token.get("user_id"))
+        uow.session_factory = async_session_maker
+        try:
+            yield uow
+        finally:
+            await uow.close()
 
     app.dependency_overrides[get_unit_of_work] = override_uow
+    app.dependency_overrides[get_read_unit_of_work] = override_read_uow
 
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://testserver") as ac:
         yield ac
 
     app.dependency_overrides.clear()
+
+@pytest_asyncio.fixture
+async def admin_headers(client, async_session_maker):
+    # Регистрация закрыта: пользователей создаёт суперпользователь
+    async with async_session_maker() as session:
+        exists = await session.scalar(select(User.id).where(User.username == "test_admin"))
+        if exists is None:
+            session.add(User(username="test_admin", email="admin@mail.ru", phone="+79945250900",
+                             password=security.get_string_hash("Qwas1234"), is_superuser=True))
+            await session.commit()
+
+    response = await client.post('/users/login/', json={"username_or_email": "test_admin", "password": "Qwas1234"})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['data']['access_token']}"}
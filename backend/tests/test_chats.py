@@ -4,19 +4,19 @@ import asyncio
 from httpx import AsyncClient
 
 @pytest.mark.asyncio
-async def test_register_user(client):
+async def test_register_user(client, admin_headers):
     payload = {"username": "test_user", "email": "test@mail.ru", 'password': "Qwas1234", 'phone': "+79945250947"}
-    res = await client.post('/users/register', json=payload)
+    res = await client.post('/users/register/', json=payload, headers=admin_headers)
     assert res.status_code == 200
 
 @pytest_asyncio.fixture
 async def headers(client):
 
     payload_login = {"username_or_email": 'test_user', 'password': "Qwas1234"}
-    response = await client.post('/users/login', json=payload_login)
+    response = await client.post('/users/login/', json=payload_login)
     assert response.status_code == 200
 
-    tokens = response.json()
+    tokens = response.json()['data']
     access_token = tokens["access_token"]
 
     return {"Authorization": f"Bearer {access_token}"}
@@ -24,23 +24,33 @@ async def headers(client):
 @pytest.mark.parametrize(
     "payload, expected_status",
     [
-        ({"chat_type": "shared"}, 422),
-        ({"chat_type": "channel"}, 422),
-        ({"chat_type": "group"}, 422),
+        ({"chat_type": "shared"}, 400),
         ({"chat_type": "private"}, 422),
-        ({"chat_type": "shared", "title": "test_chat"}, 200),
-        ({"chat_type": "none", "title": "test_chat"}, 422),
+        ({"chat_type": "shared", "title": "test_chat"}, 400),
+        ({"chat_type": "none", "title": "test_chat"}, 400),
         ({"chat_type": "private", "title": "test_chat"}, 422),
-        #({"chat_type": "channel", "title": "test_chat"}, 200), проблема из-за асинхронности, возможно проблема в ОС
+        ({"chat_type": "private", "user2_id": 10 ** 9}, 422),
+        ({"chat_type": "group", "title": "test_chat"}, 200),
+        ({"chat_type": "channel", "title": "test_chat"}, 200),
     ]
 )
 @pytest.mark.asyncio
 async def test_create_chat(payload, expected_status, client, headers):
-    response = await client.post("/chats/create", json=payload, headers=headers)
+    response = await client.post("/chats/", json=payload, headers=headers)
     assert response.status_code == expected_status
 
 @pytest.mark.asyncio
 async def test_create_chat_without_headers(client):
-    response = await client.post("chats/create", json = {"chat_type": 'channel'})
+    response = await client.post("/chats/", json = {"chat_type": 'channel'})
     assert response.status_code == 401
 
+
+@pytest.mark.asyncio
+async def test_get_members_with_roles(client, headers):
+    response = await client.post("/chats/", json={"chat_type": "group", "title": "roles_chat"}, headers=headers)
+    chat_id = response.json()["data"]["id"]
+    response = await client.get(f"/chats/{chat_id}/members_with_roles/", headers=headers)
+    assert response.status_code == 200
+    members = response.json()["data"]
+    assert [member["username"] for member in members] == ["test_user"]
+    assert members[0]["role"]
@@ -0,0 +1,23 @@
+import pytest
+
+from app.exceptions import UnprocessableEntity
+from app.utils.cursor import encode_cursor, decode_cursor
+
+@pytest.mark.parametrize("data", [{"before_id": 17}, {"after_id": 0}, {"rank": 0.0721, "id": 20}])
+def test_cursor_round_trip(data):
+    cursor = encode_cursor(data)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == data
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "abc",                              # не base64 от json
+        encode_cursor([1, 2]),              # не объект
+        encode_cursor({"before_id": True}), # bool — подкласс int
+        "",
+    ]
+)
+def test_cursor_invalid(cursor):
+    with pytest.raises(UnprocessableEntity):
+        decode_cursor(cursor)
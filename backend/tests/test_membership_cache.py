@@ -0,0 +1,30 @@
+from app.utils.membership_cache import MembershipCache
+
+def test_membership_cache_get_set_invalidate():
+    cache = MembershipCache(ttl=60, max_size=10)
+    assert cache.get(1) is None
+    assert cache.set(1, [1, 2, 2]) == frozenset({1, 2})
+    assert cache.get(1) == frozenset({1, 2})
+    cache.invalidate(1)
+    assert cache.get(1) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+def test_membership_cache_skips_load_started_before_invalidation():
+    cache = MembershipCache(ttl=60, max_size=10)
+    generation = cache.generation
+    cache.invalidate(2)
+    cache.set(1, [1, 2], generation=generation)
+    assert cache.get(1) is None
+    cache.set(1, [1, 2], generation=cache.generation)
+    assert cache.get(1) == frozenset({1, 2})
+
+def test_membership_cache_ttl_and_size():
+    cache = MembershipCache(ttl=-1, max_size=10)
+    cache.set(1, [1])
+    assert cache.get(1) is None
+
+    cache = MembershipCache(ttl=60, max_size=2)
+    for chat_id in (1, 2, 3):
+        cache.set(chat_id, [chat_id])
+    assert cache.get(1) is None
+    assert cache.get(2) == frozenset({2}) and cache.get(3) == frozenset({3})
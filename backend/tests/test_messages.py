@@ -0,0 +1,75 @@
+import pytest
+import pytest_asyncio
+import asyncio
+import itertools
+from sqlalchemy import select
+
+from app.db.models import User, Chat, ChatParticipant, ChatType
+from app.repositories.message import MessageRepository
+from app.services.message_writer import MessageGroupWriter
+
+_fixture_ids = itertools.count()
+
+@pytest_asyncio.fixture
+async def chat_with_members(async_session_maker):
+    n = next(_fixture_ids)
+    async with async_session_maker() as session:
+        users = [User(username=f"sender_{n}_{i}", email=f"sender_{n}_{i}@mail.ru", phone=f"+799452510{n}{i}",
+                      password="x") for i in range(5)]
+        session.add_all(users)
+        chat = Chat(chat_type=ChatType.GROUP, title="test_chat")
+        session.add(chat)
+        await session.flush()
+        session.add_all([ChatParticipant(chat_id=chat.id, user_id=user.id, last_read_message_id=0) for user in users])
+        await session.commit()
+        return chat.id, [user.id for user in users]
+
+@pytest.mark.asyncio
+async def test_insert_for_member_concurrent_senders(async_session_maker, chat_with_members):
+    # Параллельные отправители в один чат: строка чата блокируется раньше участников, deadlock быть не должно
+    chat_id, user_ids = chat_with_members
+
+    connections = asyncio.Semaphore(40)
+
+    async def send(sender_id):
+        async with connections, async_session_maker() as session:
+            row = await MessageRepository(session).insert_for_member(chat_id, sender_id, "hello")
+            await session.commit()
+            return row
+
+    rows = await asyncio.gather(*(send(user_ids[i % len(user_ids)]) for i in range(300)))
+    assert all(row is not None for row in rows)
+
+    async with async_session_maker() as session:
+        chat = await session.get(Chat, chat_id)
+        assert chat.message_count == 300
+        assert chat.last_message_id == max(row.id for row in rows)
+        unread = (await session.execute(
+            select(ChatParticipant.unread_count).where(ChatParticipant.chat_id == chat_id)
+        )).scalars().all()
+        assert sum(unread) == 300 * (len(user_ids) - 1)
+
+@pytest.mark.asyncio
+async def test_insert_for_member_not_a_member(async_session_maker, chat_with_members):
+    chat_id, _ = chat_with_members
+    async with async_session_maker() as session:
+        assert await MessageRepository(session).insert_for_member(chat_id, 10 ** 9, "hello") is None
+
+class _HangingUnitOfWork:
+    async def __aenter__(self):
+        await asyncio.Event().wait()
+
+    async def __aexit__(self, *exc):
+        return False
+
+@pytest.mark.asyncio
+async def test_message_writer_stop_fails_in_flight_batch():
+    writer = MessageGroupWriter(max_delay_ms=0, max_batch=10, uow_factory=_HangingUnitOfWork)
+    sent = asyncio.create_task(writer.submit(1, 1, "hello"))
+    await asyncio.sleep(0.01)
+    queued = asyncio.create_task(writer.submit(1, 1, "hello"))
+    await asyncio.sleep(0)
+    await writer.stop()
+    for task in (sent, queued):
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(task, 1)
@@ -0,0 +1,37 @@
+import pytest
+
+from app.db.partitions import (parse_bound, is_messages_partition, create_partition_sql,
+                               create_overflow_partition_sql, initial_partitions_sql)
+
+@pytest.mark.parametrize(
+    "bound, expected",
+    [
+        ("FOR VALUES FROM (MINVALUE) TO (5000000)", (None, 5000000)),
+        ("FOR VALUES FROM (5000000) TO (10000000)", (5000000, 10000000)),
+        ("FOR VALUES FROM (15000000) TO (MAXVALUE)", (15000000, None)),
+        ("FOR VALUES FROM ('5000000') TO ('10000000')", (5000000, 10000000)),
+        ("FOR VALUES FROM ('15000000') TO (MAXVALUE)", (15000000, None)),
+        ("DEFAULT", None),
+    ]
+)
+def test_parse_bound(bound, expected):
+    assert parse_bound(bound) == expected
+
+def test_partition_sql():
+    assert create_partition_sql(0, 100) == "CREATE TABLE messages_p0 PARTITION OF messages FOR VALUES FROM (MINVALUE) TO (100)"
+    assert create_partition_sql(100, 200) == "CREATE TABLE messages_p100 PARTITION OF messages FOR VALUES FROM (100) TO (200)"
+    assert create_overflow_partition_sql(300) == (
+        "CREATE TABLE messages_overflow PARTITION OF messages FOR VALUES FROM (300) TO (MAXVALUE)"
+    )
+    assert initial_partitions_sql(100, 2) == [
+        create_partition_sql(0, 100), create_partition_sql(100, 200), create_partition_sql(200, 300),
+        create_overflow_partition_sql(300),
+    ]
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [("messages_p0", True), ("messages_p5000000", True), ("messages_overflow", True),
+     ("messages_legacy", False), ("messages_pX", False)]
+)
+def test_is_messages_partition(name, expected):
+    assert is_messages_partition(name) is expected
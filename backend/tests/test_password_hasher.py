@@ -0,0 +1,36 @@
+import pytest
+import asyncio
+import threading
+
+from app.exceptions import EntityError
+from app.security.password_hasher import PasswordHasher
+
+class _BlockingContext:
+    """hash ждёт release — так все потоки заняты, пока тест не отпустит их."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def hash(self, password: str) -> str:
+        self.release.wait(5)
+        return password
+
+@pytest.mark.asyncio
+async def test_max_pending_counts_only_queued_work():
+    context = _BlockingContext()
+    hasher = PasswordHasher(context, workers=2, max_pending=1)
+    try:
+        running = [asyncio.create_task(hasher.hash(str(i))) for i in range(2)]
+        await asyncio.sleep(0.05)
+        assert (hasher.pending, hasher.queued) == (2, 0)
+        queued = asyncio.create_task(hasher.hash("queued"))
+        await asyncio.sleep(0.05)
+        assert hasher.queued == 1
+        with pytest.raises(EntityError):
+            await hasher.hash("rejected")
+        context.release.set()
+        assert await asyncio.gather(*running, queued) == ["0", "1", "queued"]
+        assert hasher.stats()["rejected"] == 1
+    finally:
+        context.release.set()
+        hasher.shutdown()
@@ -0,0 +1,33 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.db.pool import instrument_pool, pool_stats
+
+@pytest.mark.asyncio
+async def test_pool_stats_counts_checkouts_and_overflow():
+    engine = create_async_engine(settings.ASYNC_TEST_DATABASE_URL, pool_size=1, max_overflow=1)
+    instrument_pool(engine, max_overflow=1)
+    try:
+        async with engine.connect() as first, engine.connect() as second:
+            await first.execute(text("SELECT 1"))
+            await second.execute(text("SELECT 1"))
+            stats = pool_stats(engine)
+            assert (stats["in_use"], stats["overflow"], stats["max_connections"]) == (2, 1, 2)
+        stats = pool_stats(engine)
+        assert stats["checkouts"] == 2 and stats["overflow_events"] == 1
+        assert stats["saturated_checkouts"] == 1
+        assert stats["in_use"] == 0 and stats["hold_max_ms"] > 0
+    finally:
+        await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_pool_stats_unbounded_overflow():
+    engine = create_async_engine(settings.ASYNC_TEST_DATABASE_URL, pool_size=1, max_overflow=-1)
+    instrument_pool(engine, max_overflow=-1)
+    try:
+        stats = pool_stats(engine)
+        assert stats["max_overflow"] is None and stats["max_connections"] is None
+    finally:
+        await engine.dispose()
@@ -0,0 +1,57 @@
+import pytest
+import random
+from datetime import datetime, timedelta, timezone
+
+from app.repositories.message_read_batch import merge_read_ranges
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def at(minutes: float) -> datetime:
+    return T0 + timedelta(minutes=minutes)
+
+@pytest.mark.parametrize(
+    "rows, expected",
+    [
+        ([], []),
+        # соседние с одинаковым read_at — склеиваются
+        ([(1, 10, at(0)), (11, 20, at(0))], [(1, 20, at(0))]),
+        # соседние, прочитаны в разное время — время прочтения не сдвигается
+        ([(1, 10, at(0)), (11, 20, at(1))], [(1, 10, at(0)), (11, 20, at(1))]),
+        # пересечение прочитано позже — остаётся только хвост
+        ([(1, 10, at(0)), (5, 15, at(60))], [(1, 10, at(0)), (11, 15, at(60))]),
+        # уже покрыт более ранним прочтением
+        ([(1, 20, at(0)), (5, 10, at(60))], [(1, 20, at(0))]),
+        # внутренний диапазон прочитан раньше — внешний режется вокруг него
+        ([(1, 20, at(60)), (5, 10, at(0))], [(1, 4, at(60)), (5, 10, at(0)), (11, 20, at(60))]),
+        # куски одного прочтения склеиваются в один диапазон
+        ([(1, 4, at(60)), (11, 20, at(60)), (5, 10, at(60))], [(1, 20, at(60))]),
+        # порядок на входе не важен
+        ([(26, 30, at(60)), (5, 25, at(50)), (11, 20, at(1)), (1, 10, at(0))],
+         [(1, 10, at(0)), (11, 20, at(1)), (21, 25, at(50)), (26, 30, at(60))]),
+    ]
+)
+def test_merge_read_ranges(rows, expected):
+    assert merge_read_ranges(rows) == expected
+
+def test_merge_read_ranges_is_idempotent():
+    rows = [(1, 10, at(0)), (5, 25, at(50)), (11, 20, at(1)), (26, 30, at(60))]
+    merged = merge_read_ranges(rows)
+    assert merge_read_ranges(merged) == merged
+
+def test_merge_read_ranges_keeps_earliest_read_at():
+    rnd = random.Random(12)
+    for _ in range(200):
+        rows = []
+        for _ in range(rnd.randint(1, 8)):
+            from_id = rnd.randint(1, 40)
+            rows.append((from_id, from_id + rnd.randint(0, 15), at(rnd.randint(0, 5))))
+        earliest = {}
+        for from_id, to_id, read_at in rows:
+            for message_id in range(from_id, to_id + 1):
+                earliest[message_id] = min(read_at, earliest.get(message_id, read_at))
+        merged = merge_read_ranges(rows)
+        assert {message_id: read_at for from_id, to_id, read_at in merged
+                for message_id in range(from_id, to_id + 1)} == earliest
+        assert all(prev[1] < cur[0] for prev, cur in zip(merged, merged[1:]))
+        assert all(prev[2] != cur[2] for prev, cur in zip(merged, merged[1:]) if prev[1] + 1 == cur[0])
+
@@ -0,0 +1,56 @@
+import pytest
+
+from app.services.read_watermarks import ReadWatermarkBuffer
+
+class _FakeUnitOfWork:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.flushed = []
+        self.chat_participant = self
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        pass
+
+    async def advance_read_watermarks(self, items):
+        if self.fail:
+            raise RuntimeError("БД недоступна")
+        self.flushed.append(items)
+        return items
+
+@pytest.mark.asyncio
+async def test_read_watermarks_keep_max_per_pair():
+    uow = _FakeUnitOfWork()
+    buffer = ReadWatermarkBuffer(flush_ms=60_000, uow_factory=uow)
+    assert await buffer.mark(1, 10, 5, None)
+    assert await buffer.mark(1, 10, 7, None)
+    assert not await buffer.mark(1, 10, 6, None)
+    assert await buffer.mark(2, 10, 3, None)
+    assert await buffer.mark(1, 9, 4, None)
+    await buffer.stop()
+
+    assert uow.flushed == [[(1, 9, 4), (1, 10, 7), (2, 10, 3)]]
+    stats = buffer.stats()
+    assert (stats["marked"], stats["coalesced"], stats["regressions"], stats["pending"]) == (4, 1, 1, 0)
+
+@pytest.mark.asyncio
+async def test_read_watermarks_failed_flush_keeps_newer_marks():
+    uow = _FakeUnitOfWork(fail=True)
+    buffer = ReadWatermarkBuffer(flush_ms=60_000, uow_factory=uow)
+    await buffer.mark(1, 10, 5, None)
+    await buffer.mark(2, 10, 5, None)
+    await buffer.flush()
+    assert buffer.stats()["failed_flushes"] == 1
+
+    await buffer.mark(1, 10, 8, None)
+    uow.fail = False
+    await buffer.stop()
+    assert uow.flushed == [[(1, 10, 8), (2, 10, 5)]]
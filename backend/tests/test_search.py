@@ -0,0 +1,22 @@
+import pytest
+
+from app.exceptions import UnprocessableEntity
+from app.utils.search import build_tsquery, SEARCH_MAX_TERMS
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("отчёт квартал", "'отчёт' & 'квартал'"),
+        ("отч*", "'отч':*"),
+        ('"годовой отчёт"', "('годовой' <-> 'отчёт')"),
+        ('"годовой отчёт', "('годовой' <-> 'отчёт')"),
+        ("e-mail", "('e' <-> 'mail')"),
+        ("отчёт | !годовой & ('x", "'отчёт' & 'годовой' & 'x'"),
+    ]
+)
+def test_build_tsquery(text, expected):
+    assert build_tsquery(text) == expected
+
+@pytest.mark.parametrize("text", ["", "!!! | &", " ".join(["слово"] * (SEARCH_MAX_TERMS + 1))])
+def test_build_tsquery_invalid(text):
+    with pytest.raises(UnprocessableEntity):
+        build_tsquery(text)
@@ -0,0 +1,42 @@
+import pytest
+import time
+
+from app.security.token_cache import AccessTokenCache
+
+def test_access_token_cache_hit_and_read_only_claims():
+    cache = AccessTokenCache(max_size=10)
+    key = cache.key("token")
+    assert cache.get(key) is None
+    claims = cache.set(key, {"user_id": 1}, time.time() + 60)
+    assert cache.get(key) is claims
+    with pytest.raises(TypeError):
+        claims["user_id"] = 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_access_token_cache_expiry():
+    cache = AccessTokenCache(max_size=10)
+    key = cache.key("token")
+    cache.set(key, {"user_id": 1}, time.time() - 1)
+    assert cache.get(key) is None
+    assert cache.stats()["expired"] == 1 and cache.stats()["size"] == 0
+    # Токен без exp не кэшируется
+    cache.set(key, {"user_id": 1}, None)
+    assert cache.get(key) is None
+
+def test_access_token_cache_evicts_least_recently_used():
+    cache = AccessTokenCache(max_size=2)
+    a, b, c = cache.key("a"), cache.key("b"), cache.key("c")
+    expires_at = time.time() + 60
+    cache.set(a, {"user_id": 1}, expires_at)
+    cache.set(b, {"user_id": 2}, expires_at)
+    cache.get(a)
+    cache.set(c, {"user_id": 3}, expires_at)
+    assert cache.get(b) is None
+    assert cache.get(a)["user_id"] == 1 and cache.get(c)["user_id"] == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_access_token_cache_disabled():
+    cache = AccessTokenCache(max_size=0)
+    key = cache.key("token")
+    assert cache.set(key, {"user_id": 1}, time.time() + 60)["user_id"] == 1
+    assert cache.get(key) is None
@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import select, func
+
+from app.db.models import Chat, ChatType
+from app.utils.unit_of_work import UnitOfWork
+
+def make_uow(async_session_maker):
+    uow = UnitOfWork(request_scoped=True)
+    uow.session_factory = async_session_maker
+    return uow
+
+async def count_chats(async_session_maker, title):
+    async with async_session_maker() as session:
+        return await session.scalar(select(func.count()).select_from(Chat).where(Chat.title == title))
+
+@pytest.mark.asyncio
+async def test_request_scoped_commit_waits_for_finish(async_session_maker):
+    uow = make_uow(async_session_maker)
+    events = []
+
+    async def notify():
+        events.append(await count_chats(async_session_maker, "deferred"))
+
+    try:
+        async with uow:
+            uow.session.add(Chat(chat_type=ChatType.GROUP, title="deferred"))
+            await uow.commit()
+        await uow.after_commit(notify)
+        assert await count_chats(async_session_maker, "deferred") == 0
+        assert events == []
+        await uow.finish()
+    finally:
+        await uow.close()
+    # Рассылка после коммита уже видит запись
+    assert events == [1]
+    assert await count_chats(async_session_maker, "deferred") == 1
+
+@pytest.mark.asyncio
+async def test_request_scoped_failed_block_rolls_back_only_itself(async_session_maker):
+    uow = make_uow(async_session_maker)
+    discarded = []
+    try:
+        async with uow:
+            uow.session.add(Chat(chat_type=ChatType.GROUP, title="kept"))
+            await uow.commit()
+        with pytest.raises(ValueError):
+            async with uow:
+                uow.after_rollback(discarded.append, "file")
+                uow.session.add(Chat(chat_type=ChatType.GROUP, title="dropped"))
+                await uow.commit()
+                raise ValueError
+        async with uow:
+            uow.session.add(Chat(chat_type=ChatType.GROUP, title="dropped"))
+        await uow.finish()
+    finally:
+        await uow.close()
+    assert discarded == ["file"]
+    assert await count_chats(async_session_maker, "kept") == 1
+    assert await count_chats(async_session_maker, "dropped") == 0
+
+@pytest.mark.asyncio
+async def test_request_scoped_without_finish_rolls_back(async_session_maker):
+    uow = make_uow(async_session_maker)
+    discarded = []
+    try:
+        async with uow:
+            uow.after_rollback(discarded.append, "file")
+            uow.session.add(Chat(chat_type=ChatType.GROUP, title="unfinished"))
+            await uow.commit()
+    finally:
+        await uow.close()
+    assert discarded == ["file"]
+    assert await count_chats(async_session_maker, "unfinished") == 0
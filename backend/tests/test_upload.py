@@ -0,0 +1,54 @@
+import pytest
+from starlette.requests import Request
+
+from app.exceptions import UnprocessableEntity
+from app.utils.upload import open_upload
+
+BOUNDARY = b"XyZ"
+
+def make_request(body: bytes, chunk_size: int = 7,
+                 content_type: bytes = b"multipart/form-data; boundary=" + BOUNDARY) -> Request:
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b""]
+
+    async def receive():
+        chunk = chunks.pop(0)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": [(b"content-type", content_type)]}
+    return Request(scope, receive)
+
+def part(headers: str, content: bytes) -> bytes:
+    return b"--" + BOUNDARY + b"\r\n" + headers.encode() + b"\r\n\r\n" + content + b"\r\n"
+
+FILE_CONTENT = b"hello\r\n--not a boundary\r\n" * 50
+
+@pytest.mark.asyncio
+async def test_streaming_upload_reads_file_field():
+    body = (
+        part('Content-Disposition: form-data; name="note"', b"skip me")
+        + part('Content-Disposition: form-data; name="file"; filename="report.txt"\r\nContent-Type: text/plain',
+               FILE_CONTENT)
+        + b"--" + BOUNDARY + b"--\r\n"
+    )
+    upload = await open_upload(make_request(body))
+    assert (upload.filename, upload.content_type) == ("report.txt", "text/plain")
+    assert b"".join([chunk async for chunk in upload.chunks()]) == FILE_CONTENT
+
+@pytest.mark.asyncio
+async def test_streaming_upload_missing_field():
+    body = part('Content-Disposition: form-data; name="note"', b"no file") + b"--" + BOUNDARY + b"--\r\n"
+    with pytest.raises(UnprocessableEntity):
+        await open_upload(make_request(body))
+
+@pytest.mark.asyncio
+async def test_streaming_upload_not_multipart():
+    with pytest.raises(UnprocessableEntity):
+        await open_upload(make_request(b"{}", content_type=b"application/json"))
+
+@pytest.mark.asyncio
+async def test_streaming_upload_truncated_body():
+    body = part('Content-Disposition: form-data; name="file"; filename="a.bin"', FILE_CONTENT)[:-40]
+    upload = await open_upload(make_request(body))
+    with pytest.raises(UnprocessableEntity):
+        async for _ in upload.chunks():
+            pass
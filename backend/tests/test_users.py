@@ -6,38 +6,49 @@ from app.security import security
     "payload, expected_status",
     [
         ({"username": "test_user", "email": "test@mail.ru", 'password': "Qwas1234", 'phone': "+79945250944"}, 200),
-        ({"username": "user2", "email": "invalid-email", 'password': "Qwas1234", 'phone': "+79945250944"}, 422),
+        ({"username": "user2", "email": "invalid-email", 'password': "Qwas1234", 'phone': "+79945250945"}, 400),
         ({"username": "user-with-invalid-phone", "email": "goose@mail.ru", 'password': "Qwas1234", 'phone': "+7994525094"}, 422),
-        ({"username": "", "email": "goose@mail.ru", 'password': "Qwas1234", 'phone': "+79945250944"}, 422),
-        ({"username": "user3", "email": "goose@mail.ru", 'password': "1234", 'phone': "+79945250944"}, 422),
-        ({"username": "user@3", "email": "goose@mail.ru", 'password': "Qwas1234", 'phone': "+79945250944"}, 422),
-        ({"invalid_data": 'test@mail.ru'}, 422),
+        ({"username": "", "email": "goose@mail.ru", 'password': "Qwas1234", 'phone': "+79945250945"}, 400),
+        ({"username": "user3", "email": "goose@mail.ru", 'password': "1234", 'phone': "+79945250945"}, 422),
+        ({"username": "user@3", "email": "goose@mail.ru", 'password': "Qwas1234", 'phone': "+79945250945"}, 422),
+        ({"invalid_data": 'test@mail.ru'}, 400),
     ]
 )
 @pytest.mark.asyncio
-async def test_register(payload, expected_status, client):
-    response = await client.post('/users/register', json=payload)
+async def test_register(payload, expected_status, client, admin_headers):
+    response = await client.post('/users/register/', json=payload, headers=admin_headers)
     assert response.status_code == expected_status
-    data = response.json()
+    data = response.json()['data']
     if expected_status == 200:
         assert 'id' in data
         assert data['username'] == payload['username']
 
+@pytest.mark.asyncio
+async def test_register_only_superuser(client):
+    payload = {"username": "not_admin", "email": "not_admin@mail.ru", 'password': "Qwas1234", 'phone': "+79945250946"}
+    response = await client.post('/users/register/', json=payload)
+    assert response.status_code == 401
+
+    login = await client.post('/users/login/', json={"username_or_email": "test_user", "password": "Qwas1234"})
+    headers = {"Authorization": f"Bearer {login.json()['data']['access_token']}"}
+    response = await client.post('/users/register/', json=payload, headers=headers)
+    assert response.status_code == 403
+
 @pytest.mark.parametrize(
     "payload, expected_status, detail",
     [
-        ({"username": "test_user", "email": "test@mail.ru", 'password': "Qwas1234", 'phone': "+79945250944"}, 409, 'User with this email already exists'),
-        ({"username": "test_user", "email": "test_new@mail.ru", 'password': "Qwas1234", 'phone': "+79945250944"}, 409, 'User with this username already exists'),
-        ({"username": "test_new_user", "email": "test@mail.ru", 'password': "Qwas1234", 'phone': "+79945250944"}, 409, 'User with this email already exists'),
-        ({"username": "test_new_user", "email": "test_new@mail.ru", 'password': "Qwas1234", 'phone': "+79945250944"}, 409, 'User with this phone already exists'),
-        ({"username": "test_new_user", "email": "test_new@mail.ru", 'password': "Qwas1234", 'phone': "+79945250941"}, 200, None),
+        ({"username": "test_user", "email": "test@mail.ru", 'password': "Qwas1234", 'phone': "+79945250944"}, 409, 'Пользователь с таким емейлом уже существует'),
+        ({"username": "test_user", "email": "test_new@mail.ru", 'password': "Qwas1234", 'phone': "+79945250944"}, 409, 'Пользователь с таким логином уже существует'),
+        ({"username": "test_new_user", "email": "test@mail.ru", 'password': "Qwas1234", 'phone': "+79945250944"}, 409, 'Пользователь с таким емейлом уже существует'),
+        ({"username": "test_new_user", "email": "test_new@mail.ru", 'password': "Qwas1234", 'phone': "+79945250944"}, 409, 'Пользователь с таким номером телефона уже существует'),
+        ({"username": "test_new_user", "email": "test_new@mail.ru", 'password': "Qwas1234", 'phone': "+79945250941"}, 200, 'Выполнено'),
     ]
 )
 @pytest.mark.asyncio
-async def test_register_conflict_user(payload, expected_status, detail, client):
+async def test_register_conflict_user(payload, expected_status, detail, client, admin_headers):
 
-    res = await client.post('/users/register', json=payload)
-    assert res.json().get('detail') == detail
+    res = await client.post('/users/register/', json=payload, headers=admin_headers)
+    assert res.json().get('description') == detail
     assert res.status_code == expected_status
 
 @pytest.mark.parametrize(
@@ -46,40 +57,40 @@ async def test_register_conflict_user(payload, expected_status, detail, client):
         ({"username_or_email": 'test_user', 'password': "Qwas1234"}, 200),
         ({"username_or_email": 'test@mail.ru', 'password': "Qwas1234"}, 200),
         ({"username_or_email": 'test@mail.ru', 'password': "invalid_password"}, 401),
-        ({"invalid_data": 'test@mail.ru'}, 422),
+        ({"invalid_data": 'test@mail.ru'}, 400),
     ]
 )
 @pytest.mark.asyncio
 async def test_login(payload, expected_status, client):
-    response = await client.post('/users/login', json=payload)
+    response = await client.post('/users/login/', json=payload)
     assert response.status_code == expected_status
 
 @pytest.mark.asyncio
-async def test_refresh_token_success_and_fail(client: AsyncClient):
+async def test_refresh_token_success_and_fail(client: AsyncClient, admin_headers):
     reg_payload = {"username": "refresh_user", "email": "refresh@mail.ru", "password": "Qwas1234", "phone": "+79915250941"}
-    res = await client.post("/users/register", json=reg_payload)
+    res = await client.post("/users/register/", json=reg_payload, headers=admin_headers)
     assert res.status_code == 200
 
     login_payload = {"username_or_email": "refresh_user", "password": "Qwas1234"}
-    res = await client.post("/users/login", json=login_payload)
+    res = await client.post("/users/login/", json=login_payload)
     assert res.status_code == 200
-    tokens = res.json()
+    tokens = res.json()['data']
     refresh_token = tokens["refresh_token"]
     access_token = tokens["access_token"]
 
     headers = {"Authorization": f"Bearer {refresh_token}"}
-    res_refresh = await client.post("/users/refresh_token", headers=headers)
+    res_refresh = await client.post("/users/refresh_token/", headers=headers)
     assert res_refresh.status_code == 200
-    new_tokens = res_refresh.json()
+    new_tokens = res_refresh.json()['data']
     assert "access_token" in new_tokens
     assert "refresh_token" in new_tokens
 
     headers = {"Authorization": f"Bearer {access_token}"}
-    res_wrong = await client.post("/users/refresh_token", headers=headers)
+    res_wrong = await client.post("/users/refresh_token/", headers=headers)
     assert res_wrong.status_code == 401
-    assert res_wrong.json()["detail"] == "Not correct type token"
+    assert res_wrong.json()["description"] == "Неверный тип токена"
 
-    fake_token = security.create_jwt_tokens({"user_id": 999, "username_or_email": "ghost", "session_id": "abc"})["access_token"]
+    fake_token = security.create_jwt_tokens({"user_id": 999, "username_or_email": "ghost", "session_id": "abc"})["refresh_token"]
     headers = {"Authorization": f"Bearer {fake_token}"}
-    res_fake = await client.post("/users/refresh_token", headers=headers)
-    assert res_fake.status_code == 401
\ No newline at end of file
+    res_fake = await client.post("/users/refresh_token/", headers=headers)
+    assert res_fake.status_code == 401
@@ -0,0 +1,50 @@
+import pytest
+import asyncio
+
+from app.utils.websocket import OutboundQueue
+
+class _SlowWebSocket:
+    """Отправка ждёт release — так очередь копится, пока клиент «не читает»."""
+
+    def __init__(self):
+        self.sent = []
+        self.release = asyncio.Event()
+
+    async def send_text(self, data: str):
+        await self.release.wait()
+        self.sent.append(data)
+
+def make_queue(websocket, evicted, max_size=3):
+    return OutboundQueue(websocket, user_id=1, on_evict=lambda queue, reason: evicted.append(reason),
+                         max_size=max_size, max_lag=60, send_timeout=5)
+
+@pytest.mark.asyncio
+async def test_outbound_queue_sends_in_order_and_coalesces():
+    websocket, evicted = _SlowWebSocket(), []
+    queue = make_queue(websocket, evicted)
+    queue.put("first")
+    await asyncio.sleep(0)  # писатель забрал first и ждёт клиента
+    queue.put("read 5", key="read:10")
+    queue.put("message")
+    queue.put("read 7", key="read:10")
+    websocket.release.set()
+    await asyncio.sleep(0.01)
+    assert websocket.sent == ["first", "read 7", "message"]
+    assert queue.counters["coalesced"] == 1 and evicted == []
+    queue.close()
+
+@pytest.mark.asyncio
+async def test_outbound_queue_overflow_drops_typing_then_evicts():
+    websocket, evicted = _SlowWebSocket(), []
+    queue = make_queue(websocket, evicted, max_size=2)
+    queue.put("first")
+    await asyncio.sleep(0)
+    queue.put("typing", droppable=True)
+    queue.put("a")
+    queue.put("typing again", droppable=True)   # очередь полна — печатание выбрасывается
+    queue.put("b")                              # вытесняет первое «печатает»
+    assert len(queue) == 2 and queue.counters["dropped"] == 2
+    queue.put("c")                              # выбросить нечего — клиент отключается
+    assert queue.closed and len(evicted) == 1
+    queue.put("d")
+    assert len(queue) == 0